@@ -0,0 +1,93 @@
+# benchmarks/bench_dispatch.py
+# Накладные расходы выбора обработчика нажатия: обычный обход роутеров aiogram
+# и дерево префиксов callback data. Обработчики заменены пустыми, чтобы мерить только выбор
+# Запуск из корня проекта: python -m benchmarks.bench_dispatch
+
+import argparse
+import asyncio
+import random
+import time
+
+from aiogram import Dispatcher
+from aiogram.types import CallbackQuery
+
+from handlers import setup_routers
+from handlers.buying import BuyingStates
+from handlers.profile import ProfileStates
+from middlewares.callback_dispatch import CallbackTrieMiddleware
+
+# Нажатия из разных разделов бота и состояние FSM, в котором они обычно приходят
+CALLBACKS = [
+    ("buy_esim", None),
+    ("region_asia", None),
+    ("page_asia_2", BuyingStates.selecting_country),
+    ("country_🇨🇳 Китай", BuyingStates.selecting_country),
+    ("packages_page_CN_2", BuyingStates.selecting_package),
+    ("package_3", BuyingStates.selecting_package),
+    ("select_days_3_7", BuyingStates.selecting_days),
+    ("confirm_purchase", BuyingStates.confirming_purchase),
+    ("profile", None),
+    ("profile_older_1700000000_B240101", ProfileStates.viewing_profile),
+    ("esim_B240101", ProfileStates.viewing_profile),
+    ("setup", None),
+    ("questions", None),
+    ("qa_1", None),
+    ("feedback_yes", None),
+    ("partner", None),
+    ("back_to_main", None)
+]
+
+
+async def noop(*args, **kwargs):
+    return None
+
+
+def make_dispatcher() -> Dispatcher:
+    dp = Dispatcher()
+    dp.include_router(setup_routers())
+    for router in dp.chain_tail:
+        for handler in router.callback_query.handlers:
+            handler.callback = noop
+            handler.awaitable = True
+            handler.params = set()
+            handler.varkw = True
+    return dp
+
+
+async def measure(dp: Dispatcher, events: list) -> float:
+    started = time.perf_counter()
+    for event, raw_state in events:
+        await dp.propagate_event("callback_query", event, raw_state=raw_state)
+    return (time.perf_counter() - started) / len(events)
+
+
+async def main(total: int):
+    random.seed(1)
+    events = []
+    for n in range(total):
+        data, state = random.choice(CALLBACKS)
+        event = CallbackQuery.model_validate({
+            "id": str(n), "chat_instance": "1", "data": data,
+            "from": {"id": n, "is_bot": False, "first_name": "user"}
+        })
+        events.append((event, state.state if state else None))
+
+    print(f"=== ВЫБОР ОБРАБОТЧИКА: {total} нажатий ===")
+    # Роутеры подключаются к диспетчеру один раз, дерево добавляется после первого замера
+    dp = make_dispatcher()
+    results = {}
+    for name, trie in (("обход роутеров", False), ("дерево префиксов", True)):
+        if trie:
+            dp.callback_query.outer_middleware(CallbackTrieMiddleware(dp))
+        await measure(dp, events[:1000])  # прогрев
+        results[name] = await measure(dp, events)
+        print(f"{name}: {results[name] * 1e6:.1f} мкс на нажатие")
+    print(f"Ускорение: x{results['обход роутеров'] / results['дерево префиксов']:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Накладные расходы выбора обработчика callback query")
+    parser.add_argument("--total", type=int, default=50000, help="Количество нажатий")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.total))
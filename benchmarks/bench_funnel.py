@@ -0,0 +1,193 @@
+# benchmarks/bench_funnel.py
+# Пропускная способность бота на полном сценарии покупки: локальные заглушки Bot API и eSIM Access
+# с настраиваемой задержкой, N пользователей проходят /start → buy_esim → регион → страна →
+# тариф → дни → подтверждение → show_esim_details
+# Запуск из корня проекта: python -m benchmarks.bench_funnel --users 200
+# На записанных ответах eSIM Access вместо заглушки:
+#   python -m benchmarks.bench_funnel --esim-fixtures data/esim_fixtures.jsonl.gz --replay-speed 1
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.base import StorageKey
+
+from benchmarks.fake_esim import FakeESIMAccess
+from benchmarks.fake_telegram import FakeTelegram
+from config import REGIONS, COUNTRY_CODES
+from handlers.buying import BuyingStates
+from main import create_dispatcher
+from middlewares import setup_session_middlewares
+from utils import catalog, checkout
+from utils.analytics import analytics, rollup, format_rollup, event_files
+from utils.currency import currency_converter
+from utils.esim_cache import esim_cache
+from utils.esim_fixtures import ReplayTransport
+from utils.fulfillment import fulfillment_queue
+from utils.media_cache import media_cache
+from utils.metrics import metrics
+from utils.order_journal import order_journal
+from utils.order_storage import order_repository, SQLiteOrderRepository
+from utils.tracing import tracer
+
+STEPS = ["start", "buy_esim", "region", "country", "package", "days", "confirm", "show_esim_details"]
+
+
+def countries() -> List[tuple]:
+    """Пары (регион, страна в callback data) для всех стран каталога с кодом"""
+    result = []
+    for region_key, region in REGIONS.items():
+        names = list(region["countries"])
+        for page in range(2, 6):
+            names.extend(region.get(f"countries_page{page}", []))
+        for name in names:
+            name = name.split(" ", 1)[1] if " " in name else name
+            if name in COUNTRY_CODES:
+                result.append((region_key, name))
+    return result
+
+
+async def user_funnel(dp: Dispatcher, bot: Bot, telegram: FakeTelegram, chat_id: int, region: str, country: str,
+                      times: Dict[str, List[float]], think: float) -> int:
+    """Один пользователь проходит сценарий покупки; возвращает количество обновлений"""
+    key = StorageKey(bot_id=bot.id, chat_id=chat_id, user_id=chat_id)
+    steps = [
+        ("start", None), ("buy_esim", "buy_esim"), ("region", f"region_{region}"),
+        ("country", f"country_{country}"), ("package", "package_0"), ("days", "select_days_0_7"),
+        ("confirm", "confirm_purchase"), ("show_esim_details", "show_esim_details")
+    ]
+    updates = 0
+    for step, data in steps:
+        # Посуточный тариф ведет на выбор дней, остальные - сразу к подтверждению
+        if step == "days" and await dp.storage.get_state(key) != BuyingStates.selecting_days.state:
+            continue
+        if data is None:
+            update = telegram.message_update(chat_id, "/start")
+        else:
+            update = telegram.callback_update(chat_id, data, telegram.last_message_ids.get(chat_id, 1))
+
+        started = time.perf_counter()
+        await dp.feed_raw_update(bot, update)
+        times[step].append(time.perf_counter() - started)
+        updates += 1
+        if think:
+            await asyncio.sleep(random.uniform(0, 2 * think))
+    return updates
+
+
+def percentile(values: List[float], q: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+async def main(users: int, concurrency: int, telegram_latency: str, esim_latency: str, packages: int,
+               ready_after: float, think: float, esim_fixtures: Optional[str] = None, replay_speed: float = 1.0,
+               trace_path: Optional[str] = None):
+    random.seed(1)
+    telegram = FakeTelegram(latency=telegram_latency)
+    esim = FakeESIMAccess(latency=esim_latency, packages=packages, ready_after=ready_after)
+    await telegram.start()
+    await esim.start()
+
+    # Клиенты eSIM Access бота обращаются к заглушке или получают записанные ответы
+    replay = ReplayTransport(esim_fixtures, replay_speed) if esim_fixtures else None
+    for client in (catalog.esim_client, checkout.esim_client, esim_cache.client):
+        client.base_url = esim.base_url
+        if replay is not None:
+            client.transport = replay
+    # Курс уже получен фоновой синхронизацией, как в работающем боте
+    currency_converter._last_update = time.time()
+
+    bot = Bot(telegram.token, session=telegram.session())
+    dp = create_dispatcher()
+    setup_session_middlewares(bot)
+
+    with tempfile.TemporaryDirectory() as directory:
+        order_journal.path = os.path.join(directory, "orders.journal")
+        # file_id заглушки Telegram не должны попасть в кэш изображений работающего бота
+        media_cache.path = os.path.join(directory, "media_cache.json")
+        media_cache.load(bot.id)
+        # Спаны пишутся, как в работающем боте (во временный каталог); с --trace - все обновления в файл
+        tracer.path = trace_path or os.path.join(directory, "traces.jsonl")
+        if trace_path:
+            tracer.sample_rate = 1.0
+        tracer.start()
+        analytics.directory = os.path.join(directory, "analytics")
+        analytics.start()
+        if isinstance(order_repository, SQLiteOrderRepository):
+            order_repository.db_path = os.path.join(directory, "orders.db")
+        await order_repository.start()
+        await order_journal.start()
+        fulfillment_queue.start(bot)
+
+        catalog_countries = countries()
+        times: Dict[str, List[float]] = {step: [] for step in STEPS}
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(n: int) -> int:
+            async with semaphore:
+                region, country = random.choice(catalog_countries)
+                return await user_funnel(dp, bot, telegram, 300000 + n, region, country, times, think)
+
+        started = time.perf_counter()
+        total_updates = sum(await asyncio.gather(*(limited(n) for n in range(users))))
+        elapsed = time.perf_counter() - started
+
+        # Выдача eSIM идет в фоне после оплаты: ждем ее, чтобы шаг fulfilled попал в воронку
+        await fulfillment_queue.wait(timeout=ready_after + 30)
+        await fulfillment_queue.close()
+        await order_journal.close()
+        await order_repository.close()
+        await tracer.close()
+        await analytics.close()
+        funnel = format_rollup(rollup(event_files(analytics.directory, 1), "region"), "region")
+
+    await bot.session.close()
+    await telegram.close()
+    await esim.close()
+
+    print(f"=== СЦЕНАРИЙ ПОКУПКИ: {users} пользователей, {concurrency} одновременно ===")
+    if replay is not None:
+        print(f"Bot API: {telegram_latency}, eSIM Access: записи {esim_fixtures} (скорость x{replay_speed})")
+    else:
+        print(f"Задержка Bot API: {telegram_latency}, eSIM Access: {esim_latency}, пакетов в стране: {packages}")
+    print(f"Обновлений: {total_updates} за {elapsed:.1f} с ({total_updates / elapsed:.0f} обн/с), "
+          f"покупок в секунду: {users / elapsed:.1f}")
+    print(f"{'шаг':<20}{'count':>7}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}")
+    for step in STEPS:
+        values = sorted(times[step])
+        if values:
+            print(f"{step:<20}{len(values):>7}{percentile(values, 0.5) * 1000:>10.1f}"
+                  f"{percentile(values, 0.95) * 1000:>10.1f}{percentile(values, 0.99) * 1000:>10.1f}")
+
+    print("Запросы к Bot API:", ", ".join(f"{m} {c}" for m, c in sorted(telegram.calls.items())))
+    if replay is not None:
+        print(f"Ответов eSIM Access из записи: {replay.served}, без записи: {replay.missed}")
+    else:
+        print("Запросы к eSIM Access:", ", ".join(f"{e} {c}" for e, c in sorted(esim.calls.items())))
+    print(f"Воронка по событиям аналитики:\n{funnel}")
+    errors = [line for line in metrics.render().splitlines()
+              if line.startswith("esim_bot_outbound_errors_total") and not line.endswith(" 0")]
+    print("Ошибки внешних запросов:", "; ".join(errors) if errors else "нет")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочная проверка сценария покупки")
+    parser.add_argument("--users", type=int, default=200, help="Количество пользователей")
+    parser.add_argument("--concurrency", type=int, default=50, help="Пользователей одновременно")
+    parser.add_argument("--telegram-latency", default="lognormal:0.05:0.5", help="Задержка Bot API")
+    parser.add_argument("--esim-latency", default="lognormal:0.3:0.5", help="Задержка eSIM Access")
+    parser.add_argument("--packages", type=int, default=300, help="Пакетов в каждой стране")
+    parser.add_argument("--ready-after", type=float, default=0.0, help="Через сколько секунд eSIM готова")
+    parser.add_argument("--think", type=float, default=0.0, help="Средняя пауза пользователя между шагами (с)")
+    parser.add_argument("--esim-fixtures", help="Файл записей eSIM Access вместо заглушки (utils.esim_fixtures)")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="Множитель времени записанных ответов")
+    parser.add_argument("--trace", help="Сохранить спаны трассировки в файл (разбор: python -m utils.tracing)")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.users, args.concurrency, args.telegram_latency, args.esim_latency, args.packages,
+                     args.ready_after, args.think, args.esim_fixtures, args.replay_speed, args.trace))
\ No newline at end of file
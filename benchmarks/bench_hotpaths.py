@@ -0,0 +1,183 @@
+# benchmarks/bench_hotpaths.py
+# Микробенчмарки горячих участков: клавиатуры тарифов и стран, дедупликация и фильтрация
+# пакетов, расчет цены. Данные реалистичного размера (300 пакетов в стране)
+# Запуск из корня проекта:
+#   python -m benchmarks.bench_hotpaths            - замер
+#   python -m benchmarks.bench_hotpaths --save     - замер и сохранение в benchmarks/baseline.json
+#   python -m benchmarks.bench_hotpaths --compare  - сравнение с baseline.json (код 1 при регрессии)
+#   python -m benchmarks.bench_hotpaths --fixtures data/esim_fixtures.jsonl.gz --country JP
+#                                                  - на записанном каталоге страны (utils.esim_fixtures)
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+from typing import Callable, Dict, Optional
+
+from benchmarks.fake_esim import make_packages
+from config import REGIONS, ESIM_ACCESS_CODE
+from keyboards.inline import (
+    deduplicate_packages, format_package_button_text, get_countries_keyboard, get_packages_keyboard
+)
+from utils.currency import currency_converter
+from utils.esim_client import ESIMAccessClient
+from utils.esim_fixtures import ReplayTransport
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def cases(packages_per_country: int, fixtures: Optional[str] = None,
+          country_code: str = "CN") -> Dict[str, Callable[[], object]]:
+    """
+    Замеряемые вызовы: имя -> функция без аргументов
+
+    :param packages_per_country: Размер сгенерированного каталога страны
+    :param fixtures: Файл записей eSIM Access - вместо сгенерированного берется записанный каталог
+    :param country_code: Страна записанного каталога
+    """
+    # Курс уже получен фоновой синхронизацией, как в работающем боте
+    currency_converter._last_update = time.time()
+    rate = currency_converter.usd_to_rub_rate
+
+    client = ESIMAccessClient(ESIM_ACCESS_CODE)
+    raw = ReplayTransport(fixtures, speed=0).packages(country_code) if fixtures else None
+    if raw is None:
+        if fixtures:
+            print(f"Нет записи package/list для {country_code}, каталог сгенерирован")
+        country_code = "CN"
+        raw = make_packages(country_code, packages_per_country)
+    packages = client.select_country_packages(raw, country_code)
+    unique = deduplicate_packages(packages)
+    asia = REGIONS["asia"]
+    countries = list(asia["countries"])
+    for page in range(2, 6):
+        countries.extend(asia.get(f"countries_page{page}", []))
+
+    return {
+        "select_country_packages": lambda: client.select_country_packages(raw, country_code),
+        "deduplicate_packages": lambda: deduplicate_packages(packages),
+        "format_package_button_text": lambda: [format_package_button_text(p, "Китай", rate) for p in unique],
+        "get_packages_keyboard": lambda: get_packages_keyboard(packages, country_code, "Китай", 1),
+        "get_packages_keyboard_last_page": lambda: get_packages_keyboard(packages, country_code, "Китай", 1000),
+        "get_countries_keyboard": lambda: get_countries_keyboard("asia", countries, 1),
+        "calculate_esim_price": lambda: currency_converter.calculate_esim_price(12.5)
+    }
+
+
+def reference():
+    """Эталонная нагрузка на чистом Python: по ней сравнение поправляется на скорость машины"""
+    data = [{"volume": n * 7919 % 1000, "duration": n % 30, "name": f"CN {n}"} for n in range(300)]
+    data.sort(key=lambda x: (x["duration"], x["volume"]))
+    return "".join(item["name"].lower() for item in data)
+
+
+def measure(func: Callable[[], object], repeat: int, target: float) -> float:
+    """Лучшее время одного вызова (секунды) из repeat серий по ~target секунд (без сборщика мусора, как timeit)"""
+    gc.collect()
+    gc.disable()
+    try:
+        return _measure(func, repeat, target)
+    finally:
+        gc.enable()
+
+
+def _measure(func: Callable[[], object], repeat: int, target: float) -> float:
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= target / 10 or number >= 1 << 20:
+            break
+        number *= 2
+    number = max(1, int(number * target / max(elapsed, 1e-9)))
+
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> bool:
+    """Таблица сравнения с базовой линией; True, если регрессий нет"""
+    ok = True
+    print(f"{'случай':<34}{'база, мкс':>12}{'сейчас, мкс':>13}{'изменение':>11}")
+    for name, value in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<34}{'-':>12}{value * 1e6:>13.1f}{'новый':>11}")
+            continue
+        change = value / base - 1
+        flag = ""
+        if change > threshold:
+            flag = "  РЕГРЕССИЯ"
+            ok = False
+        print(f"{name:<34}{base * 1e6:>12.1f}{value * 1e6:>13.1f}{change:>+10.0%}{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарки горячих участков бота")
+    parser.add_argument("--packages", type=int, default=300, help="Пакетов в стране")
+    parser.add_argument("--repeat", type=int, default=5, help="Серий на случай (берется лучшая)")
+    parser.add_argument("--target", type=float, default=0.2, help="Длительность одной серии (с)")
+    parser.add_argument("--save", action="store_true", help="Сохранить результат как базовую линию")
+    parser.add_argument("--compare", action="store_true", help="Сравнить с базовой линией")
+    parser.add_argument("--threshold", type=float, default=0.3, help="Допустимое замедление (доля)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Файл базовой линии")
+    parser.add_argument("--only", nargs="*", help="Запустить только эти случаи")
+    parser.add_argument("--fixtures", help="Файл записей eSIM Access (каталог страны вместо сгенерированного)")
+    parser.add_argument("--country", default="CN", help="Страна записанного каталога")
+    args = parser.parse_args()
+
+    results = {}
+    speed = measure(reference, args.repeat, args.target)
+    for name, func in cases(args.packages, args.fixtures, args.country).items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = measure(func, args.repeat, args.target)
+        if not args.compare:
+            print(f"{name:<34}{results[name] * 1e6:>10.1f} мкс")
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "packages": args.packages,
+                "reference": speed,
+                "seconds_per_call": results
+            }, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"Базовая линия сохранена: {args.baseline}")
+
+    if args.compare:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("packages") != args.packages:
+            print(f"Внимание: базовая линия снята на {baseline.get('packages')} пакетах")
+        # Базовая линия приводится к скорости машины сейчас (по эталонной нагрузке)
+        scale = speed / baseline["reference"] if baseline.get("reference") else 1.0
+        expected = {name: value * scale for name, value in baseline["seconds_per_call"].items()}
+        print(f"Скорость машины относительно базовой линии: x{1 / scale:.2f}")
+
+        # Подозрение на регрессию перепроверяется более длинным замером, чтобы отсеять шум
+        all_cases = cases(args.packages, args.fixtures, args.country)
+        for name, value in results.items():
+            base = expected.get(name)
+            if base is not None and value / base - 1 > args.threshold:
+                results[name] = min(value, measure(all_cases[name], args.repeat * 2, args.target))
+        if not compare(results, expected, args.threshold):
+            print(f"Замедление больше {args.threshold:.0%} относительно базовой линии")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,59 @@
+# benchmarks/bench_order_journal.py
+# Нагрузочная проверка журнала заказов: пропускная способность и задержка записи
+# Запуск из корня проекта: python -m benchmarks.bench_order_journal
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from utils.order_journal import OrderJournal, INTENT, ORDERED
+
+
+async def checkout(journal: OrderJournal, n: int, latencies: list):
+    """Одна покупка: намерение и результат, как в place_order"""
+    started = time.perf_counter()
+    await journal.append(INTENT, id=f"WWS-{n:08x}", user_id=n, chat_id=n, package_code="CKH491",
+                         price=18000, count=1, period_num=None, country="Китай", package_name="China 1GB 7Days")
+    latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await journal.append(ORDERED, id=f"WWS-{n:08x}", order_no=f"B{n:014d}")
+    latencies.append(time.perf_counter() - started)
+
+
+async def run(total: int, concurrency: int):
+    with tempfile.TemporaryDirectory() as directory:
+        journal = OrderJournal(os.path.join(directory, "orders.journal"))
+        await journal.start()
+
+        latencies = []
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(n):
+            async with semaphore:
+                await checkout(journal, n, latencies)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(limited(n) for n in range(total)))
+        elapsed = time.perf_counter() - started
+        await journal.close()
+
+    latencies.sort()
+    stats = journal.stats()
+    print(f"=== ЖУРНАЛ ЗАКАЗОВ: {total} покупок, {concurrency} одновременно ===")
+    print(f"Записей в секунду: {stats['appended'] / elapsed:.0f}")
+    print(f"Записей на один fsync: {stats['records_per_fsync']:.1f}")
+    print(f"Задержка записи p50: {latencies[len(latencies) // 2] * 1000:.2f} мс")
+    print(f"Задержка записи p99: {latencies[int(len(latencies) * 0.99)] * 1000:.2f} мс")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочная проверка журнала заказов")
+    parser.add_argument("--total", type=int, default=5000, help="Количество покупок")
+    parser.add_argument("--concurrency", type=int, default=100, help="Одновременных покупок")
+    args = parser.parse_args()
+
+    for concurrency in sorted({1, args.concurrency}):
+        asyncio.run(run(args.total if concurrency > 1 else min(args.total, 500), concurrency))
\ No newline at end of file
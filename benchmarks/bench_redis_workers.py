@@ -0,0 +1,143 @@
+# benchmarks/bench_redis_workers.py
+# Пропускная способность бота в нескольких процессах с общим состоянием в Redis
+# Запуск из корня проекта: python -m benchmarks.bench_redis_workers [--redis-url redis://localhost:6379/0]
+# Без --redis-url поднимается локальный fakeredis (pip install -r requerements-dev.txt) - он однопоточный
+# и работает в этом же процессе, поэтому годится только для проверки работоспособности.
+# Рост с числом процессов можно ожидать только с настоящим Redis и ядрами не меньше,
+# чем процессов: на одном ядре процессы делят один процессор
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+
+from benchmarks.fake_esim import make_packages
+from keyboards.inline import get_packages_keyboard
+from utils.currency import currency_converter
+from utils.esim_client import ESIMAccessClient
+from utils.order_storage import RedisOrderRepository
+from utils.shared_cache import RedisCache, create_redis
+
+USERS = 1000
+COUNTRY_CODE = "CN"
+
+
+async def seed(url: str):
+    """Общие данные: список пакетов в кэше и по три заказа у каждого пользователя"""
+    redis = create_redis(url)
+    await redis.flushdb()
+    # Пакеты страны после отбора клиентом, как их кэширует бот
+    packages = ESIMAccessClient("").select_country_packages(make_packages(COUNTRY_CODE, 60), COUNTRY_CODE)
+    await RedisCache(redis).set(f"packages:{COUNTRY_CODE}", packages, 3600)
+
+    repository = RedisOrderRepository(redis)
+    for user_id in range(USERS):
+        for n in range(3):
+            repository.save_order(user_id, f"B{user_id:08d}{n}", "Китай", "China 1GB 7Days")
+    await repository.flush()
+    await redis.aclose()
+
+
+async def handle_update(storage: RedisStorage, cache: RedisCache, repository: RedisOrderRepository,
+                        bot_id: int, user_id: int, n: int):
+    """Одно обновление: состояние FSM, общий кэш, заказы и отрисовка клавиатуры"""
+    key = StorageKey(bot_id=bot_id, chat_id=user_id, user_id=user_id)
+    await storage.get_state(key)
+    data = await storage.get_data(key)
+
+    if n % 4 == 0:
+        # Профиль пользователя
+        await repository.get_user_orders(user_id)
+    else:
+        # Листание пакетов страны
+        packages = await cache.get(f"packages:{COUNTRY_CODE}")
+        page = data.get("page", 0) % 4 + 1
+        get_packages_keyboard(packages, COUNTRY_CODE, "Китай", page)
+        await storage.set_data(key, {"country_code": COUNTRY_CODE, "page": page})
+
+
+async def worker_main(url: str, worker_id: int, updates: int, concurrency: int):
+    # Курс берется из кэша процесса, без запросов к API
+    currency_converter._last_update = time.time()
+
+    redis = create_redis(url)
+    storage = RedisStorage(redis=redis)
+    cache = RedisCache(redis)
+    repository = RedisOrderRepository(redis)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(n):
+        async with semaphore:
+            await handle_update(storage, cache, repository, 1, (worker_id * updates + n) % USERS, n)
+
+    await asyncio.gather(*(limited(n) for n in range(updates)))
+    await redis.aclose()
+
+
+def worker(url: str, worker_id: int, updates: int, concurrency: int, start):
+    start.wait()
+    asyncio.run(worker_main(url, worker_id, updates, concurrency))
+
+
+def run(url: str, workers: int, updates: int, concurrency: int) -> float:
+    asyncio.run(seed(url))
+
+    context = multiprocessing.get_context("spawn")
+    start = context.Event()
+    processes = [
+        context.Process(target=worker, args=(url, worker_id, updates, concurrency, start))
+        for worker_id in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    # Даем процессам импортировать модули, чтобы не учитывать время запуска
+    time.sleep(2)
+    started = time.perf_counter()
+    start.set()
+    for process in processes:
+        process.join()
+    return workers * updates / (time.perf_counter() - started)
+
+
+def start_fake_redis() -> str:
+    try:
+        from fakeredis import TcpFakeServer
+    except ImportError:
+        sys.exit("Без --redis-url нужен fakeredis: pip install -r requerements-dev.txt")
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"redis://127.0.0.1:{port}/0"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пропускная способность процессов бота с общим Redis")
+    parser.add_argument("--redis-url", default="", help="Адрес Redis (по умолчанию - локальный fakeredis)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Количество процессов")
+    parser.add_argument("--updates", type=int, default=2000, help="Обновлений на процесс")
+    parser.add_argument("--concurrency", type=int, default=50, help="Одновременных обновлений в процессе")
+    args = parser.parse_args()
+
+    url = args.redis_url or start_fake_redis()
+    cores = os.cpu_count() or 1
+    print(f"=== ПРОЦЕССЫ БОТА С ОБЩИМ REDIS: {url}, ядер: {cores} ===")
+    if not args.redis_url:
+        print("fakeredis однопоточный: результаты не показывают масштабирование, нужен --redis-url")
+    if max(args.workers) > cores:
+        print(f"Процессов больше, чем ядер ({cores}): рост сверх числа ядер не ожидается")
+    baseline = None
+    for workers in args.workers:
+        rate = run(url, workers, args.updates, args.concurrency)
+        baseline = baseline or rate
+        print(f"Процессов: {workers}, обновлений в секунду: {rate:.0f} (x{rate / baseline:.2f})")
\ No newline at end of file
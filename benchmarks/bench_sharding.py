@@ -0,0 +1,92 @@
+# benchmarks/bench_sharding.py
+# Пропускная способность бота с разным количеством процессов-воркеров:
+# принимающий процесс (long polling) распределяет обновления по воркерам по id пользователя
+# Запуск из корня проекта: python -m benchmarks.bench_sharding [--workers 1 2 4 8]
+# Заглушка Bot API и принимающий процесс работают в процессе замера, поэтому рост
+# упирается в них и в количество ядер машины
+
+import argparse
+import asyncio
+import os
+import time
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from benchmarks.fake_telegram import FakeTelegram, TOKEN
+from handlers import setup_routers
+from middlewares import setup_middlewares
+from utils.sharding import ShardRouter, start_workers, run_worker, run_front_polling
+
+
+def bench_worker(index: int, port: int, base_url: str):
+    """Воркер, отправляющий ответы в заглушку Bot API"""
+    async def run():
+        dp = Dispatcher()
+        dp.include_router(setup_routers())
+        setup_middlewares(dp)
+        bot = Bot(TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(base_url)))
+        try:
+            await run_worker(dp, bot, index, port)
+        finally:
+            await bot.session.close()
+
+    asyncio.run(run())
+
+
+async def run_workers(workers: int, total: int) -> float:
+    telegram = FakeTelegram()
+    await telegram.start()
+    bot = Bot(telegram.token, session=telegram.session())
+
+    router = ShardRouter(workers)
+    port = await router.start()
+    processes = start_workers(bench_worker, workers, port, telegram.base_url)
+    await router.wait_workers()
+    front = asyncio.create_task(run_front_polling(bot, router, timeout=1))
+
+    # Прогрев: первые обновления каждого воркера
+    warmup = [telegram.message_update(1000 + n, "/start") for n in range(workers * 20)]
+    for update in warmup:
+        await telegram.push(update)
+    await telegram.wait_answered(len(warmup))
+    telegram.latencies.clear()
+
+    # Все обновления сразу: команды и нажатия кнопок от разных пользователей
+    updates = [
+        telegram.message_update(100000 + n, "/start") if n % 2 else telegram.callback_update(100000 + n, "questions")
+        for n in range(total)
+    ]
+    started = time.perf_counter()
+    for update in updates:
+        await telegram.push(update)
+    await telegram.wait_answered(total)
+    throughput = total / (time.perf_counter() - started)
+
+    front.cancel()
+    await asyncio.gather(front, return_exceptions=True)
+    await router.close()
+    for process in processes:
+        await asyncio.to_thread(process.join, 30)
+    await bot.session.close()
+    await telegram.close()
+    return throughput
+
+
+async def main(worker_counts: list, total: int):
+    print(f"=== ВОРКЕРЫ: {total} обновлений, ядер: {os.cpu_count()} ===")
+    baseline = None
+    for workers in worker_counts:
+        throughput = await run_workers(workers, total)
+        baseline = baseline or throughput
+        print(f"{workers} воркер(ов): {throughput:.0f} обновлений в секунду (x{throughput / baseline:.2f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Масштабирование бота по процессам-воркерам")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="Количество воркеров")
+    parser.add_argument("--total", type=int, default=4000, help="Обновлений в замере")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.workers, args.total))
\ No newline at end of file
@@ -0,0 +1,108 @@
+# benchmarks/bench_webhook.py
+# Сравнение режимов polling и webhook на локальной заглушке Bot API:
+# задержка из конца в конец при постоянном потоке и максимум обновлений в секунду
+# Запуск из корня проекта: python -m benchmarks.bench_webhook
+
+import argparse
+import asyncio
+import socket
+import time
+
+from aiogram import Bot, Dispatcher
+
+from benchmarks.fake_telegram import FakeTelegram
+from handlers import setup_routers
+from middlewares import setup_middlewares
+from utils.webhook import run_webhook
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def push_all(telegram: FakeTelegram, updates: list, rate: float = 0, connections: int = 100):
+    """Отправка обновлений с заданной частотой (0 - как можно быстрее)"""
+    semaphore = asyncio.Semaphore(connections)
+
+    async def push(update):
+        async with semaphore:
+            await telegram.push(update)
+
+    tasks = []
+    started = time.perf_counter()
+    for n, update in enumerate(updates):
+        if rate:
+            delay = started + n / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(push(update)))
+    await asyncio.gather(*tasks)
+
+
+async def run_mode(dp: Dispatcher, mode: str, total: int, rate: float, concurrency: int):
+    telegram = FakeTelegram()
+    await telegram.start()
+    bot = Bot(telegram.token, session=telegram.session())
+
+    stop = asyncio.Event()
+    if mode == "webhook":
+        port = free_port()
+        runner = asyncio.create_task(run_webhook(
+            dp, bot, base_url=f"http://127.0.0.1:{port}", host="127.0.0.1", port=port,
+            secret_token="", concurrency=concurrency, stop=stop
+        ))
+        while not telegram.webhook_url:
+            await asyncio.sleep(0.01)
+    else:
+        runner = asyncio.create_task(dp.start_polling(
+            bot, handle_signals=False, tasks_concurrency_limit=concurrency
+        ))
+        await asyncio.sleep(0.5)
+
+    # Постоянный поток: задержка при частоте rate
+    await push_all(telegram, [telegram.message_update(100000 + n, "/start") for n in range(total)], rate)
+    await telegram.wait_answered(total)
+    latencies = sorted(telegram.latencies)
+    telegram.latencies.clear()
+
+    # Пиковая нагрузка: все обновления сразу
+    started = time.perf_counter()
+    await push_all(telegram, [telegram.message_update(200000 + n, "/start") for n in range(total)])
+    await telegram.wait_answered(total)
+    throughput = total / (time.perf_counter() - started)
+
+    if mode == "webhook":
+        stop.set()
+    else:
+        await dp.stop_polling()
+    await runner
+    await bot.session.close()
+    await telegram.close()
+
+    print(f"--- {mode} ---")
+    print(f"Задержка при {rate:.0f} обн/с: p50 {latencies[len(latencies) // 2] * 1000:.1f} мс, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} мс")
+    print(f"Максимум: {throughput:.0f} обновлений в секунду")
+
+
+async def main(total: int, rate: float, concurrency: int):
+    # Роутеры подключаются к диспетчеру один раз, он используется в обоих режимах
+    dp = Dispatcher()
+    dp.include_router(setup_routers())
+    setup_middlewares(dp)
+
+    print(f"=== POLLING И WEBHOOK: {total} обновлений /start ===")
+    for mode in ("polling", "webhook"):
+        await run_mode(dp, mode, total, rate, concurrency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сравнение режимов polling и webhook")
+    parser.add_argument("--total", type=int, default=2000, help="Обновлений в каждом замере")
+    parser.add_argument("--rate", type=float, default=200, help="Частота постоянного потока (обн/с)")
+    parser.add_argument("--concurrency", type=int, default=100, help="Одновременно обрабатываемых обновлений")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.total, args.rate, args.concurrency))
\ No newline at end of file
@@ -0,0 +1,152 @@
+# benchmarks/fake_esim.py
+# Локальная заглушка API eSIM Access для нагрузочных проверок без обращения к api.esimaccess.com
+
+import itertools
+import json
+import random
+import time
+from typing import Dict, List, Optional, Any
+
+from aiohttp import web
+
+from benchmarks.fake_telegram import Latency
+
+GB = 1073741824
+MB = 1048576
+
+# Объемы и сроки тарифов, как в реальном каталоге
+VOLUMES = [500 * MB, 1 * GB, 2 * GB, 3 * GB, 5 * GB, 10 * GB, 20 * GB, 50 * GB]
+DURATIONS = [1, 3, 5, 7, 10, 15, 30, 90, 180]
+REGIONAL_NAMES = ["Asia 12 countries", "Global 120 areas", "Europe 33 countries", "Multi regions"]
+
+
+def make_packages(country_code: str, count: int = 300, seed: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Список пакетов страны в формате package/list
+
+    Около трети - посуточные, десятая часть - региональные (их отсекает клиент),
+    остальные - на срок. Есть дубли по объему и сроку с разной ценой.
+
+    :param country_code: Код страны (ISO)
+    :param count: Количество пакетов
+    :param seed: Зерно генератора (по умолчанию - по коду страны)
+    """
+    rnd = random.Random(seed if seed is not None else country_code)
+    packages = []
+    for n in range(count):
+        volume = rnd.choice(VOLUMES)
+        kind = rnd.random()
+        if kind < 0.1:
+            name = f"{rnd.choice(REGIONAL_NAMES)} {volume // MB}MB"
+            data_type, duration = 1, rnd.choice(DURATIONS)
+        elif kind < 0.4:
+            name = f"{country_code} {volume // MB}MB/Day"
+            data_type, duration = 2, 1
+        else:
+            duration = rnd.choice(DURATIONS)
+            name = f"{country_code} {volume // MB}MB {duration}Days"
+            data_type = 1
+        packages.append({
+            "packageCode": f"{country_code}{n:04d}",
+            "slug": f"{country_code.lower()}-{n}",
+            "name": name,
+            "price": rnd.randint(5, 400) * 1000,
+            "currencyCode": "USD",
+            "volume": volume,
+            "duration": duration,
+            "durationUnit": "DAY",
+            "dataType": data_type,
+            "location": country_code
+        })
+    return packages
+
+
+class FakeESIMAccess:
+    """
+    Минимальный API eSIM Access: package/list, esim/order и esim/query
+
+    Профиль заказа получает код активации через ready_after секунд после заказа
+    (до этого esim/query возвращает профиль без ac, как во время выпуска).
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: str = "0", packages: int = 300,
+                 ready_after: float = 0.0):
+        """
+        :param latency: Распределение задержки ответа (см. Latency)
+        :param packages: Пакетов в каждой стране
+        :param ready_after: Через сколько секунд после заказа eSIM готова
+        """
+        self.host = host
+        self.port = port
+        self.latency = Latency(latency)
+        self.packages = packages
+        self.ready_after = ready_after
+
+        self.calls: Dict[str, int] = {}
+        self._orders: Dict[str, Dict[str, Any]] = {}
+        self._transactions: Dict[str, str] = {}
+        self._order_ids = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/api/v1/open/{endpoint:.+}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        await self._runner.cleanup()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/api/v1/open"
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        endpoint = request.match_info["endpoint"]
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        payload = json.loads(await request.read() or b"{}")
+        await self.latency.wait()
+
+        if endpoint == "package/list":
+            obj = {"packageList": make_packages(payload.get("locationCode", ""), self.packages)}
+        elif endpoint == "esim/order":
+            obj = {"orderNo": self._order(payload)}
+        elif endpoint == "esim/query":
+            order_no = payload.get("orderNo") or self._transactions.get(payload.get("transactionId"), "")
+            obj = self._query(order_no)
+        else:
+            return web.json_response({"success": False, "errorCode": "404", "errorMsg": "unknown endpoint"})
+        return web.json_response({"success": True, "errorCode": None, "errorMsg": None, "obj": obj})
+
+    def _order(self, payload: Dict[str, Any]) -> str:
+        # Повтор с тем же transactionId возвращает тот же заказ
+        order_no = self._transactions.get(payload.get("transactionId"))
+        if order_no is None:
+            order_no = f"B{next(self._order_ids):014d}"
+            self._transactions[payload.get("transactionId")] = order_no
+            package = (payload.get("packageInfoList") or [{}])[0]
+            self._orders[order_no] = {"created": time.monotonic(), "packageCode": package.get("packageCode"),
+                                      "transactionId": payload.get("transactionId")}
+        return order_no
+
+    def _query(self, order_no: str) -> Dict[str, Any]:
+        order = self._orders.get(order_no)
+        if order is None:
+            return {"esimList": [], "pager": {"pageNum": 1, "pageSize": 50, "total": 0}}
+        ready = time.monotonic() - order["created"] >= self.ready_after
+        number = int(order_no[1:])
+        profile = {
+            "orderNo": order_no,
+            "transactionId": order["transactionId"],
+            "iccid": f"8985200{number:013d}",
+            "esimTranNo": f"T{number:014d}",
+            "packageList": [{"packageCode": order["packageCode"]}],
+            "esimStatus": "GOT_RESOURCE" if ready else "CREATE",
+            "smdpStatus": "RELEASED" if ready else "",
+            "ac": f"LPA:1$rsp.example.com${number:020d}" if ready else "",
+            "qrCodeUrl": f"https://example.com/qr/{number}.png" if ready else ""
+        }
+        return {"esimList": [profile], "pager": {"pageNum": 1, "pageSize": 50, "total": 1}}
\ No newline at end of file
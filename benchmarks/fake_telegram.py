@@ -0,0 +1,230 @@
+# benchmarks/fake_telegram.py
+# Локальная заглушка Bot API для нагрузочных проверок бота без обращения к Telegram
+
+import asyncio
+import itertools
+import random
+import time
+from typing import Dict, List, Optional, Any
+
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import ClientSession, web
+
+TOKEN = "123456:FAKE-TOKEN"
+
+# Методы, в ответ на которые Bot API возвращает сообщение
+MESSAGE_METHODS = {"sendMessage", "sendPhoto", "editMessageText", "editMessageMedia", "editMessageCaption",
+                   "editMessageReplyMarkup"}
+# Методы, в ответ на которые сообщение приходит с фото
+PHOTO_METHODS = {"sendPhoto", "editMessageMedia"}
+
+
+class Latency:
+    """
+    Распределение задержки ответа заглушки
+
+    Задается строкой: "0" - без задержки, "fixed:0.05", "uniform:0.02:0.2",
+    "lognormal:0.1:0.5" (медиана и sigma логарифма).
+    """
+
+    def __init__(self, spec: str = "0"):
+        kind, *params = spec.split(":")
+        self.spec = spec
+        self.kind = kind if params else "fixed"
+        self.params = [float(value) for value in params] if params else [float(kind)]
+        if self.kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Неизвестное распределение задержки: {spec}")
+
+    def sample(self) -> float:
+        if self.kind == "uniform":
+            return random.uniform(*self.params)
+        if self.kind == "lognormal":
+            median, sigma = self.params
+            return random.lognormvariate(0, sigma) * median
+        return self.params[0]
+
+    async def wait(self):
+        delay = self.sample()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class FakeTelegram:
+    """
+    Минимальный Bot API: getUpdates (long polling), setWebhook с доставкой обновлений
+    POST-запросами, отправка и редактирование сообщений.
+
+    Для каждого обновления запоминается время создания; первый ответ бота в тот же чат
+    (или ответ на callback) дает задержку обработки из конца в конец.
+    """
+
+    def __init__(self, token: str = TOKEN, host: str = "127.0.0.1", port: int = 0, latency: str = "0"):
+        self.token = token
+        self.host = host
+        self.port = port
+        self.latency = Latency(latency)
+
+        self.webhook_url: Optional[str] = None
+        self.webhook_secret: Optional[str] = None
+        self.calls: Dict[str, int] = {}
+        self.latencies: List[float] = []
+        # Последнее сообщение бота в чате (для нажатий на его кнопки)
+        self.last_message_ids: Dict[int, int] = {}
+
+        self._updates: List[Dict[str, Any]] = []
+        self._new_updates: Optional[asyncio.Event] = None
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._pending_chats: Dict[int, float] = {}
+        self._pending_callbacks: Dict[str, float] = {}
+        self._answered: Optional[asyncio.Condition] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._client: Optional[ClientSession] = None
+
+    # ---------- Жизненный цикл ----------
+
+    async def start(self):
+        self._new_updates = asyncio.Event()
+        self._answered = asyncio.Condition()
+
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._client = ClientSession()
+
+    async def close(self):
+        await self._client.close()
+        await self._runner.cleanup()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def session(self) -> AiohttpSession:
+        """Сессия aiogram, направляющая запросы бота в заглушку"""
+        return AiohttpSession(api=TelegramAPIServer.from_base(self.base_url))
+
+    # ---------- Обновления ----------
+
+    def message_update(self, chat_id: int, text: str) -> Dict[str, Any]:
+        user = {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"}
+        return {
+            "update_id": next(self._update_ids),
+            "message": {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": user,
+                "text": text,
+                "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+                if text.startswith("/") else None
+            }
+        }
+
+    def callback_update(self, chat_id: int, data: str, message_id: int = 1) -> Dict[str, Any]:
+        user = {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"}
+        update_id = next(self._update_ids)
+        return {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": user,
+                "chat_instance": str(chat_id),
+                "data": data,
+                "message": {
+                    "message_id": message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"},
+                    "text": "..."
+                }
+            }
+        }
+
+    async def push(self, update: Dict[str, Any]):
+        """Отправить обновление боту (в очередь getUpdates или POST на вебхук)"""
+        now = time.perf_counter()
+        if "callback_query" in update:
+            self._pending_callbacks[update["callback_query"]["id"]] = now
+        else:
+            self._pending_chats[update["message"]["chat"]["id"]] = now
+
+        if self.webhook_url:
+            headers = {"X-Telegram-Bot-Api-Secret-Token": self.webhook_secret or ""}
+            async with self._client.post(self.webhook_url, json=update, headers=headers) as response:
+                response.raise_for_status()
+        else:
+            self._updates.append(update)
+            self._new_updates.set()
+
+    async def wait_answered(self, count: int, timeout: float = 60.0):
+        """Дождаться, пока бот ответит на count обновлений"""
+        async with self._answered:
+            await asyncio.wait_for(self._answered.wait_for(lambda: len(self.latencies) >= count), timeout)
+
+    async def _record(self, started: Optional[float]):
+        if started is None:
+            return
+        self.latencies.append(time.perf_counter() - started)
+        async with self._answered:
+            self._answered.notify_all()
+
+    # ---------- Методы Bot API ----------
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        params = dict(await request.post())
+        if method != "getUpdates":
+            await self.latency.wait()
+
+        if method == "getUpdates":
+            result = await self._get_updates(params)
+        elif method == "getMe":
+            result = {"id": int(self.token.split(":")[0]), "is_bot": True, "first_name": "FakeBot",
+                      "username": "fake_bot"}
+        elif method == "setWebhook":
+            self.webhook_url = params.get("url")
+            self.webhook_secret = params.get("secret_token")
+            result = True
+        elif method == "deleteWebhook":
+            self.webhook_url = None
+            result = True
+        elif method == "answerCallbackQuery":
+            await self._record(self._pending_callbacks.pop(params.get("callback_query_id"), None))
+            result = True
+        elif method in MESSAGE_METHODS:
+            chat_id = int(params.get("chat_id", 0))
+            await self._record(self._pending_chats.pop(chat_id, None))
+            result = {
+                "message_id": int(params.get("message_id") or next(self._message_ids)),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": params.get("text", "")
+            }
+            if method in PHOTO_METHODS:
+                file_id = f"photo-{result['message_id']}"
+                result["photo"] = [{"file_id": file_id, "file_unique_id": file_id, "width": 1280, "height": 720}]
+            self.last_message_ids[chat_id] = result["message_id"]
+        else:
+            result = True
+
+        return web.json_response({"ok": True, "result": result})
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+
+        self._updates = [update for update in self._updates if update["update_id"] >= offset]
+        if not self._updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
\ No newline at end of file
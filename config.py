@@ -4,6 +4,102 @@
 BOT_TOKEN = ""
 # API ключ для eSIM Access - замените на свой
 ESIM_ACCESS_CODE = "f3c52bbf67374e35a0daf72a81b5977c"
+# Адрес API eSIM Access
+ESIM_API_URL = "https://api.esimaccess.com/api/v1/open"
+# Запросы к eSIM Access: "live" - к API, "record" - к API с записью ответов в ESIM_FIXTURES_PATH,
+# "replay" - ответы из записи без обращения к сети (Access Code в записи не попадает)
+ESIM_TRANSPORT = "live"
+ESIM_FIXTURES_PATH = "data/esim_fixtures.jsonl.gz"
+# Скорость воспроизведения: 1 - с записанным временем ответа, 2 - вдвое медленнее, 0 - без задержки
+ESIM_REPLAY_SPEED = 1.0
+
+# Путь к базе данных заказов (SQLite)
+ORDERS_DB_PATH = "data/orders.db"
+
+# Журнал оформления заказов (для восстановления после сбоя). Воркер N пишет в файл .N;
+# файлы воркеров, которых стало меньше, при запуске передаются оставшимся
+ORDER_JOURNAL_PATH = "data/orders.journal"
+
+# Кэш file_id загруженных в Telegram изображений
+MEDIA_CACHE_PATH = "data/media_cache.json"
+# Чат администратора для предварительной загрузки изображений при запуске (0 - не загружать)
+ADMIN_CHAT_ID = 0
+# Администраторы бота (Telegram user id) - им доступны служебные команды (/profile, /memory)
+# и приходят уведомления о заказах, требующих внимания
+ADMIN_IDS = []
+
+# Redis для общего состояния нескольких процессов бота (FSM, заказы, кэши),
+# например "redis://localhost:6379/0". Пустая строка - все хранится в памяти процесса
+REDIS_URL = ""
+
+# Режим получения обновлений: "polling" (long polling) или "webhook"
+BOT_MODE = "polling"
+# Количество процессов-воркеров. Больше 1 - принимающий процесс распределяет обновления
+# по воркерам по id пользователя, каждый воркер обрабатывает свою долю чатов
+BOT_WORKERS = 1
+# Каталог общего кэша воркеров (каталог пакетов, курс), если не настроен Redis
+SHARED_CACHE_DIR = "data/cache"
+# Сколько обновлений обрабатывается одновременно (из разных чатов)
+HANDLER_CONCURRENCY = 100
+# Сколько обновлений одного чата может ждать своей очереди (остальные отбрасываются)
+CHAT_QUEUE_LIMIT = 5
+# Сколько обновлений может быть принято в обработку, включая ожидающие очереди своего чата
+MAX_PENDING_UPDATES = 1000
+# Через сколько секунд ответить на нажатие кнопки за обработчик, если он еще не ответил
+CALLBACK_ACK_BUDGET = 0.5
+
+# Обновления, пришедшие во время перезапуска: "replay" - обработать по правилам ниже, "drop" - отбросить
+BACKLOG_MODE = "replay"
+# Сообщения и нажатия старше стольких секунд отбрасываются (оплата обрабатывается всегда)
+BACKLOG_MAX_AGE = 60
+# Сколько обновлений очереди обработать при запуске (остальные, кроме оплаты, отбрасываются)
+BACKLOG_MAX_UPDATES = 1000
+# Сколько обновлений очереди обрабатывается одновременно, отдельно от новых обновлений
+BACKLOG_CONCURRENCY = 20
+
+# Адрес и порт HTTP-сервера метрик Prometheus (/metrics); 0 - не запускать.
+# При BOT_WORKERS > 1 воркер N использует порт METRICS_PORT + N
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9102
+# Блокировка цикла событий дольше стольких секунд записывается в лог со стеком
+LOOP_STALL_THRESHOLD = 0.25
+# Период проверки задержки цикла событий (секунды)
+LOOP_MONITOR_INTERVAL = 0.05
+# Профилирование по команде /profile: каталог файлов профилей, строк в отчете
+# и период выборки стека в режиме sample (секунды)
+PROFILE_DIR = "data/profiles"
+PROFILE_TOP = 20
+PROFILE_SAMPLE_INTERVAL = 0.005
+# Разбор памяти (/memory и метрики memory): сколько записей FSM считать (больше - оценка по выборке),
+# период фонового замера для /metrics (секунды, 0 - не замерять), строк в списках, кадров стека tracemalloc
+MEMORY_SAMPLE_LIMIT = 2000
+MEMORY_STATS_INTERVAL = 300
+MEMORY_TOP = 10
+MEMORY_TRACE_FRAMES = 1
+# Трассировка обновлений: файл спанов JSON Lines (пустая строка - выключена; воркер N пишет в файл .N),
+# доля трассируемых обновлений (0 - выключена), период записи (секунды), максимум спанов в буфере до записи,
+# размер файла, после которого он переименовывается в .old1 (байты), и сколько таких старых файлов хранить
+TRACE_PATH = "data/traces.jsonl"
+TRACE_SAMPLE_RATE = 0.01
+TRACE_FLUSH_INTERVAL = 2.0
+TRACE_BUFFER_LIMIT = 20000
+TRACE_MAX_BYTES = 50 * 1024 * 1024
+TRACE_BACKUP_COUNT = 3
+# Аналитика воронки покупки: каталог файлов событий (пустая строка - выключена; воркер N пишет в файлы .N),
+# размер кольцевого буфера событий и период записи (секунды)
+ANALYTICS_DIR = "data/analytics"
+ANALYTICS_BUFFER_SIZE = 50000
+ANALYTICS_FLUSH_INTERVAL = 10.0
+
+# Настройки вебхука (только для BOT_MODE = "webhook")
+# Публичный адрес бота, например "https://bot.example.com"
+WEBHOOK_BASE_URL = ""
+WEBHOOK_PATH = "/webhook"
+# Секрет для проверки запросов Telegram; пустая строка - генерируется при запуске
+WEBHOOK_SECRET = ""
+# Адрес и порт локального HTTP-сервера
+WEBHOOK_HOST = "0.0.0.0"
+WEBHOOK_PORT = 8080
 
 # Коды стран для API eSIM Access
 COUNTRY_CODES = {
@@ -8,13 +8,15 @@ from . import profile
 from . import setup
 from . import questions
 from . import menu
+from . import admin
 
 
 def setup_routers() -> Router:
     """Настройка всех роутеров"""
     router = Router()
 
-    # Подключаем все роутеры
+    # Подключаем все роутеры (служебные команды - первыми, до обработчиков состояний)
+    router.include_router(admin.router)
     router.include_router(start.router)
     router.include_router(buying.router)
     router.include_router(profile.router)
@@ -0,0 +1,103 @@
+# handlers/admin.py
+
+import asyncio
+from html import escape
+
+from aiogram import Bot, Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from config import ADMIN_IDS
+from utils.memory import memory_inspector
+from utils.profiler import profiler, MODES
+
+router = Router()
+# Служебные команды доступны только администраторам, остальным они не отвечают
+router.message.filter(F.from_user.id.in_(ADMIN_IDS))
+
+# Длительность профилирования, если не указаны ни секунды, ни обновления
+DEFAULT_PROFILE_SECONDS = 30
+# Предел длины сообщения Telegram с запасом на разметку
+MESSAGE_LIMIT = 4000
+
+
+def format_report(report: str) -> str:
+    """Отчет моноширинным текстом в пределах одного сообщения"""
+    if len(report) > MESSAGE_LIMIT:
+        report = report[:MESSAGE_LIMIT].rsplit("\n", 1)[0]
+    return f"<pre>{escape(report)}</pre>"
+
+
+def parse_profile_args(args: str):
+    """
+    Разбор аргументов /profile: [cprofile|sample] [30s|30] [500u]
+
+    :return: Режим, секунды, обновления
+    """
+    mode, seconds, updates = "cprofile", 0, 0
+    for arg in (args or "").split():
+        if arg in MODES:
+            mode = arg
+        elif arg.endswith("u") and arg[:-1].isdigit():
+            updates = int(arg[:-1])
+        elif arg.rstrip("s").replace(".", "", 1).isdigit():
+            seconds = float(arg.rstrip("s"))
+        else:
+            raise ValueError(arg)
+    if not seconds and not updates:
+        seconds = DEFAULT_PROFILE_SECONDS
+    return mode, seconds, updates
+
+
+@router.message(Command("profile"))
+async def cmd_profile(message: Message, command: CommandObject, bot: Bot):
+    """Начать профилирование: /profile [cprofile|sample] [секунды] [N обновлений, например 500u]"""
+    if profiler.active:
+        await message.answer(f"Профилирование уже идет ({profiler.mode}), остановить: /profile_stop")
+        return
+    try:
+        mode, seconds, updates = parse_profile_args(command.args)
+    except ValueError as e:
+        await message.answer(f"Непонятный аргумент: {escape(str(e))}\n"
+                             f"Формат: /profile [cprofile|sample] [30s] [500u]")
+        return
+
+    chat_id = message.chat.id
+
+    async def send_report(report: str):
+        await bot.send_message(chat_id, format_report(report))
+
+    profiler.start(mode, seconds, updates, on_finish=send_report)
+    limits = [f"{seconds:g} с" if seconds else "", f"{updates} обновлений" if updates else ""]
+    await message.answer(f"Профилирование {mode} начато: до {' или '.join(l for l in limits if l)}. "
+                         f"Остановить раньше: /profile_stop")
+
+
+@router.message(Command("profile_stop"))
+async def cmd_profile_stop(message: Message):
+    """Остановить профилирование и получить отчет"""
+    if not profiler.active:
+        await message.answer("Профилирование не идет")
+        return
+    await message.answer(format_report(profiler.stop()))
+
+
+@router.message(Command("memory"))
+async def cmd_memory(message: Message, command: CommandObject):
+    """Память по подсистемам: /memory; рост по строкам кода: /memory trace, /memory diff, /memory stop"""
+    action = (command.args or "").strip()
+    # Обход объектов и снимки tracemalloc долгие - выполняются в отдельном потоке
+    if not action:
+        await message.answer(format_report(await asyncio.to_thread(memory_inspector.report)))
+    elif action == "trace":
+        await asyncio.to_thread(memory_inspector.start_tracing)
+        await message.answer("tracemalloc включен, рост с этого момента: /memory diff")
+    elif action == "diff":
+        if not memory_inspector.tracing:
+            await message.answer("tracemalloc не включен: /memory trace")
+            return
+        await message.answer(format_report(await asyncio.to_thread(memory_inspector.diff)))
+    elif action == "stop":
+        memory_inspector.stop_tracing()
+        await message.answer("tracemalloc выключен")
+    else:
+        await message.answer("Формат: /memory [trace|diff|stop]")
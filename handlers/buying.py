@@ -1,7 +1,7 @@
 # handlers/buying.py
 
 from aiogram import Router, F
-from aiogram.types import CallbackQuery, FSInputFile, InputMediaPhoto, Message
+from aiogram.types import CallbackQuery, Message
 from aiogram.filters.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 from keyboards.inline import (
@@ -16,28 +16,20 @@ from keyboards.inline import (
     is_daily_package,
     deduplicate_packages
 )
-from config import REGIONS, COUNTRY_CODES, ESIM_ACCESS_CODE
+from config import REGIONS, COUNTRY_CODES
 from texts import TEXTS
-from utils.esim_client import ESIMAccessClient
+from utils.analytics import analytics
+from utils.esim_cache import esim_cache
+from utils.catalog import get_country_packages
 from utils.currency import currency_converter
-import asyncio
+from utils.checkout import place_order
+from utils.fulfillment import fulfillment_queue, get_ready_profile, format_esim_details
+from utils.screen import screen
 import logging
 
-# Импортируем функцию сохранения заказа
-try:
-    from handlers.profile import save_order
-except ImportError:
-    # Если не удается импортировать, создаем заглушку
-    def save_order(user_id, order_no, country, package_name):
-        pass
-
 router = Router()
 logger = logging.getLogger(__name__)
 
-# Создаем экземпляр клиента eSIM Access
-esim_client = ESIMAccessClient(ESIM_ACCESS_CODE)
-
-
 # Определяем состояния FSM для процесса покупки
 class BuyingStates(StatesGroup):
     selecting_country = State()
@@ -62,36 +54,8 @@ async def buy_esim(callback: CallbackQuery, state: FSMContext):
     # Очищаем данные состояния
     await state.clear()
 
-    try:
-        # Проверяем, есть ли изображение в текущем сообщении
-        if callback.message.photo:
-            # Удаляем сообщение с фото и отправляем новое
-            await callback.message.delete()
-            await callback.message.answer(
-                text=TEXTS["buy_esim"],
-                reply_markup=get_buy_esim_keyboard()
-            )
-        else:
-            # Редактируем текущее сообщение
-            await callback.message.edit_text(
-                text=TEXTS["buy_esim"],
-                reply_markup=get_buy_esim_keyboard()
-            )
-        logger.info("Successfully sent buy_esim menu")
-    except Exception as e:
-        logger.error(f"Error in buy_esim: {e}")
-        # В случае ошибки пробуем удалить и отправить новое сообщение
-        try:
-            await callback.message.delete()
-            await callback.message.answer(
-                text=TEXTS["buy_esim"],
-                reply_markup=get_buy_esim_keyboard()
-            )
-            logger.info("Successfully sent buy_esim menu after error recovery")
-        except Exception as e2:
-            logger.error(f"Failed to recover from error in buy_esim: {e2}")
-            await callback.answer("Произошла ошибка. Попробуйте еще раз.")
-            return
+    await screen.show(callback.message, text=TEXTS["buy_esim"], reply_markup=get_buy_esim_keyboard())
+    logger.info("Successfully sent buy_esim menu")
 
     await callback.answer()
 
@@ -121,59 +85,13 @@ async def select_region(callback: CallbackQuery, state: FSMContext):
         image_path = region_data.get("image", "")
         keyboard = get_countries_keyboard(region_key, all_countries)
 
-        # Проверяем что содержит текущее сообщение
-        if callback.message.photo:
-            # Если сообщение содержит фото
-            if image_path:
-                try:
-                    photo = FSInputFile(image_path)
-                    await callback.message.edit_media(
-                        media=InputMediaPhoto(
-                            media=photo,
-                            caption=TEXTS["select_country"]
-                        ),
-                        reply_markup=keyboard
-                    )
-                except Exception as e:
-                    logger.warning(f"Could not edit media, trying to delete and send new: {e}")
-                    # Если не удалось отредактировать media, удаляем и отправляем новое
-                    await callback.message.delete()
-                    await callback.message.answer(
-                        text=TEXTS["select_country"],
-                        reply_markup=keyboard
-                    )
-            else:
-                # Если фото есть, но нет пути к изображению - удаляем и отправляем текст
-                await callback.message.delete()
-                await callback.message.answer(
-                    text=TEXTS["select_country"],
-                    reply_markup=keyboard
-                )
-        else:
-            # Если сообщение содержит только текст
-            if image_path:
-                # Если есть путь к изображению - удаляем текст и отправляем с фото
-                try:
-                    await callback.message.delete()
-                    photo = FSInputFile(image_path)
-                    await callback.message.answer_photo(
-                        photo=photo,
-                        caption=TEXTS["select_country"],
-                        reply_markup=keyboard
-                    )
-                except Exception as e:
-                    logger.warning(f"Could not send photo, sending text: {e}")
-                    await callback.message.answer(
-                        text=TEXTS["select_country"],
-                        reply_markup=keyboard
-                    )
-            else:
-                # Если нет изображения - просто редактируем текст
-                await callback.message.edit_text(
-                    text=TEXTS["select_country"],
-                    reply_markup=keyboard
-                )
-
+        # Экран региона с картинкой: при листании меняется только клавиатура
+        await screen.show(
+            callback.message,
+            text=TEXTS["select_country"],
+            reply_markup=keyboard,
+            image=image_path or None
+        )
     except Exception as e:
         logger.error(f"Error in select_region: {e}")
         await callback.answer("Произошла ошибка при загрузке региона")
@@ -181,6 +99,7 @@ async def select_region(callback: CallbackQuery, state: FSMContext):
 
     await callback.answer()
     await state.set_state(BuyingStates.selecting_country)
+    analytics.emit("region_view", callback.from_user.id, region=region_key)
 
 
 @router.callback_query(F.data.startswith("page_"))
@@ -212,59 +131,13 @@ async def handle_pagination(callback: CallbackQuery, state: FSMContext):
         image_path = region_data.get("image", "")
         keyboard = get_countries_keyboard(region_key, all_countries, page)
 
-        # Проверяем что содержит текущее сообщение
-        if callback.message.photo:
-            # Если сообщение содержит фото и есть путь к изображению - обновляем media
-            if image_path:
-                try:
-                    photo = FSInputFile(image_path)
-                    await callback.message.edit_media(
-                        media=InputMediaPhoto(
-                            media=photo,
-                            caption=TEXTS["select_country"]
-                        ),
-                        reply_markup=keyboard
-                    )
-                except Exception as e:
-                    logger.warning(f"Could not edit media, trying to delete and send new: {e}")
-                    # Если не удалось отредактировать media, удаляем и отправляем новое
-                    await callback.message.delete()
-                    await callback.message.answer(
-                        text=TEXTS["select_country"],
-                        reply_markup=keyboard
-                    )
-            else:
-                # Если фото есть, но нет пути к изображению - удаляем и отправляем текст
-                await callback.message.delete()
-                await callback.message.answer(
-                    text=TEXTS["select_country"],
-                    reply_markup=keyboard
-                )
-        else:
-            # Если сообщение содержит только текст
-            if image_path:
-                # Если есть путь к изображению - удаляем текст и отправляем с фото
-                try:
-                    await callback.message.delete()
-                    photo = FSInputFile(image_path)
-                    await callback.message.answer_photo(
-                        photo=photo,
-                        caption=TEXTS["select_country"],
-                        reply_markup=keyboard
-                    )
-                except Exception as e:
-                    logger.warning(f"Could not send photo, sending text: {e}")
-                    await callback.message.answer(
-                        text=TEXTS["select_country"],
-                        reply_markup=keyboard
-                    )
-            else:
-                # Если нет изображения - просто редактируем текст
-                await callback.message.edit_text(
-                    text=TEXTS["select_country"],
-                    reply_markup=keyboard
-                )
-
+        # Экран региона с картинкой: при листании меняется только клавиатура
+        await screen.show(
+            callback.message,
+            text=TEXTS["select_country"],
+            reply_markup=keyboard,
+            image=image_path or None
+        )
     except Exception as e:
         logger.error(f"Error in handle_pagination: {e}")
         await callback.answer("Ошибка при переключении страницы")
@@ -283,21 +156,16 @@ async def select_country(callback: CallbackQuery, state: FSMContext):
     if country_name not in COUNTRY_CODES:
         logger.warning(f"Country code not found for: {country_name}")
         # Если код страны не найден
-        if callback.message.photo:
-            await callback.message.delete()
-            await callback.message.answer(
-                text=TEXTS["nothing_found"],
-                reply_markup=get_buy_esim_keyboard()
-            )
-        else:
-            await callback.message.edit_text(
-                text=TEXTS["nothing_found"],
-                reply_markup=get_buy_esim_keyboard()
-            )
+        await screen.show(
+            callback.message,
+            text=TEXTS["nothing_found"],
+            reply_markup=get_buy_esim_keyboard()
+        )
         await callback.answer()
         return
 
     country_code = COUNTRY_CODES[country_name]
+    analytics.emit("country_view", callback.from_user.id, country=country_code)
 
     # Сохраняем информацию о стране
     await state.update_data(
@@ -312,13 +180,11 @@ async def select_country(callback: CallbackQuery, state: FSMContext):
     loading_text = TEXTS["loading_packages"].format(country_name=country_name)
 
     try:
-        # Всегда удаляем предыдущее сообщение и отправляем новое для загрузки
-        # Это избегает проблем с редактированием разных типов сообщений
-        await callback.message.delete()
-        message = await callback.message.answer(text=loading_text)
+        # Экран загрузки: правка текста, а для сообщения с фото - новое сообщение
+        message = await screen.show(callback.message, text=loading_text)
 
         # Получаем пакеты для выбранной страны
-        packages = esim_client.get_packages_by_country(country_code)
+        packages = await get_country_packages(country_code)
         logger.info(f"Found {len(packages)} packages for {country_name}")
 
         # Дедуплицируем пакеты
@@ -331,7 +197,8 @@ async def select_country(callback: CallbackQuery, state: FSMContext):
         if not packages:
             # Если пакеты не найдены
             no_packages_text = TEXTS["no_packages"].format(country_name=country_name)
-            await message.edit_text(
+            await screen.show(
+                message,
                 text=no_packages_text,
                 reply_markup=get_back_to_countries_keyboard(f"region_{country_code}")
             )
@@ -339,11 +206,13 @@ async def select_country(callback: CallbackQuery, state: FSMContext):
 
         # Отображаем тарифы
         packages_text = TEXTS["choose_package"].format(country_name=country_name)
-        await message.edit_text(
+        await screen.show(
+            message,
             text=packages_text,
             reply_markup=get_packages_keyboard(packages, country_code, country_name, 1)
         )
         await state.set_state(BuyingStates.selecting_package)
+        analytics.emit("packages_shown", callback.from_user.id, country=country_code)
 
     except Exception as e:
         logger.error(f"Error in select_country: {e}")
@@ -376,7 +245,8 @@ async def handle_packages_pagination(callback: CallbackQuery, state: FSMContext)
     try:
         # Отображаем тарифы для выбранной страницы
         packages_text = TEXTS["choose_package"].format(country_name=country_name)
-        await callback.message.edit_text(
+        await screen.show(
+            callback.message,
             text=packages_text,
             reply_markup=get_packages_keyboard(packages, country_code, country_name, page)
         )
@@ -406,7 +276,8 @@ async def select_package(callback: CallbackQuery, state: FSMContext):
 
     if not packages or package_index >= len(packages):
         # Если пакет не найден
-        await callback.message.edit_text(
+        await screen.show(
+            callback.message,
             text="Ошибка: выбранный тариф не найден. Попробуйте снова.",
             reply_markup=get_back_to_countries_keyboard(f"region_{country_code}")
         )
@@ -423,7 +294,8 @@ async def select_package(callback: CallbackQuery, state: FSMContext):
     if is_daily_package(package):
         # Для ежедневных пакетов предлагаем выбрать количество дней
         days_text = TEXTS["select_days"].format(country_name=country_name)
-        await callback.message.edit_text(
+        await screen.show(
+            callback.message,
             text=days_text,
             reply_markup=get_days_selection_keyboard(package_index)
         )
@@ -527,12 +399,14 @@ async def show_confirmation(callback: CallbackQuery, state: FSMContext, package:
     )
 
     # Отправляем подтверждение
-    await callback.message.edit_text(
+    await screen.show(
+        callback.message,
         text=confirmation_text,
         reply_markup=get_confirm_keyboard(country_code)
     )
 
     await state.set_state(BuyingStates.confirming_purchase)
+    analytics.emit("confirm", callback.from_user.id, country=country_code, package=package.get("packageCode", ""))
 
 
 @router.callback_query(F.data == "back_to_packages")
@@ -546,7 +420,8 @@ async def back_to_packages_from_days(callback: CallbackQuery, state: FSMContext)
 
     if not packages:
         # Если пакеты не найдены, возвращаемся к выбору регионов
-        await callback.message.edit_text(
+        await screen.show(
+            callback.message,
             text=TEXTS["buy_esim"],
             reply_markup=get_buy_esim_keyboard()
         )
@@ -555,7 +430,8 @@ async def back_to_packages_from_days(callback: CallbackQuery, state: FSMContext)
 
     # Отображаем тарифы (первая страница)
     packages_text = TEXTS["choose_package"].format(country_name=country_name)
-    await callback.message.edit_text(
+    await screen.show(
+        callback.message,
         text=packages_text,
         reply_markup=get_packages_keyboard(packages, country_code, country_name, 1)
     )
@@ -576,48 +452,22 @@ async def back_to_packages(callback: CallbackQuery, state: FSMContext):
 
     if not packages:
         # Если пакеты не найдены, возвращаемся к выбору регионов
-        try:
-            if callback.message.photo:
-                await callback.message.delete()
-                await callback.message.answer(
-                    text=TEXTS["buy_esim"],
-                    reply_markup=get_buy_esim_keyboard()
-                )
-            else:
-                await callback.message.edit_text(
-                    text=TEXTS["buy_esim"],
-                    reply_markup=get_buy_esim_keyboard()
-                )
-        except Exception as e:
-            # В случае ошибки просто отправляем новое сообщение
-            await callback.message.answer(
-                text=TEXTS["buy_esim"],
-                reply_markup=get_buy_esim_keyboard()
-            )
+        await screen.show(
+            callback.message,
+            text=TEXTS["buy_esim"],
+            reply_markup=get_buy_esim_keyboard()
+        )
         await callback.answer()
         return
 
     # Отображаем тарифы (первая страница)
     packages_text = TEXTS["choose_package"].format(country_name=country_name)
 
-    try:
-        if callback.message.photo:
-            await callback.message.delete()
-            await callback.message.answer(
-                text=packages_text,
-                reply_markup=get_packages_keyboard(packages, country_code, country_name, 1)
-            )
-        else:
-            await callback.message.edit_text(
-                text=packages_text,
-                reply_markup=get_packages_keyboard(packages, country_code, country_name, 1)
-            )
-    except Exception as e:
-        # В случае ошибки просто отправляем новое сообщение
-        await callback.message.answer(
-            text=packages_text,
-            reply_markup=get_packages_keyboard(packages, country_code, country_name, 1)
-        )
+    await screen.show(
+        callback.message,
+        text=packages_text,
+        reply_markup=get_packages_keyboard(packages, country_code, country_name, 1)
+    )
 
     await state.set_state(BuyingStates.selecting_package)
     await callback.answer()
@@ -628,7 +478,7 @@ async def back_to_packages(callback: CallbackQuery, state: FSMContext):
 async def process_payment_sbp(callback: CallbackQuery, state: FSMContext):
     """Обработчик оплаты по СБП"""
     # Отправляем сообщение о обработке платежа
-    await callback.message.edit_text(text=TEXTS["processing_payment"])
+    await screen.show(callback.message, text=TEXTS["processing_payment"])
     await callback.answer()
 
     # Получаем данные из состояния
@@ -637,7 +487,8 @@ async def process_payment_sbp(callback: CallbackQuery, state: FSMContext):
     selected_days = data.get("selected_days")
 
     if not package:
-        await callback.message.edit_text(
+        await screen.show(
+            callback.message,
             text="Ошибка: информация о выбранном тарифе не найдена. Попробуйте снова.",
             reply_markup=get_back_to_main_keyboard()
         )
@@ -655,16 +506,23 @@ async def process_payment_sbp(callback: CallbackQuery, state: FSMContext):
         total_price = price
         count = 1
 
-    order_no = esim_client.order_profile(
+    # Заказ фиксируется в журнале, сохраняется в профиле пользователя
+    # и ставится в очередь фоновой выдачи eSIM
+    order_no = await place_order(
+        user_id=callback.from_user.id,
+        chat_id=callback.message.chat.id,
         package_code=package_code,
         price=total_price,
         count=count,
-        period_num=selected_days if selected_days and is_daily_package(package) else None
+        period_num=selected_days if selected_days and is_daily_package(package) else None,
+        country=data.get("country_name", ""),
+        package_name=package.get("name", "")
     )
 
     if not order_no:
         # Если заказ не удался
-        await callback.message.edit_text(
+        await screen.show(
+            callback.message,
             text=TEXTS["payment_error"],
             reply_markup=get_back_to_main_keyboard()
         )
@@ -672,15 +530,12 @@ async def process_payment_sbp(callback: CallbackQuery, state: FSMContext):
 
     # Сохраняем номер заказа
     await state.update_data(order_no=order_no)
-
-    # Сохраняем информацию о заказе в профиле пользователя
-    user_id = callback.from_user.id
-    country_name = data.get("country_name", "")
-    package_name = package.get("name", "")
-    save_order(user_id, order_no, country_name, package_name)
+    analytics.emit("paid", callback.from_user.id, country=data.get("country_code", ""), package=package_code,
+                   order=order_no)
 
     # Отправляем сообщение об успешной оплате
-    await callback.message.edit_text(
+    await screen.show(
+        callback.message,
         text=TEXTS["payment_success"],
         reply_markup=get_payment_done_keyboard()
     )
@@ -692,7 +547,7 @@ async def process_payment_sbp(callback: CallbackQuery, state: FSMContext):
 async def process_payment(callback: CallbackQuery, state: FSMContext):
     """Обработчик подтверждения покупки и оплаты"""
     # Отправляем сообщение о обработке платежа
-    await callback.message.edit_text(text=TEXTS["processing_payment"])
+    await screen.show(callback.message, text=TEXTS["processing_payment"])
     await callback.answer()
 
     # Получаем данные из состояния
@@ -701,7 +556,8 @@ async def process_payment(callback: CallbackQuery, state: FSMContext):
     selected_days = data.get("selected_days")
 
     if not package:
-        await callback.message.edit_text(
+        await screen.show(
+            callback.message,
             text="Ошибка: информация о выбранном тарифе не найдена. Попробуйте снова.",
             reply_markup=get_back_to_main_keyboard()
         )
@@ -719,16 +575,23 @@ async def process_payment(callback: CallbackQuery, state: FSMContext):
         total_price = price
         count = 1
 
-    order_no = esim_client.order_profile(
+    # Заказ фиксируется в журнале, сохраняется в профиле пользователя
+    # и ставится в очередь фоновой выдачи eSIM
+    order_no = await place_order(
+        user_id=callback.from_user.id,
+        chat_id=callback.message.chat.id,
         package_code=package_code,
         price=total_price,
         count=count,
-        period_num=selected_days if selected_days and is_daily_package(package) else None
+        period_num=selected_days if selected_days and is_daily_package(package) else None,
+        country=data.get("country_name", ""),
+        package_name=package.get("name", "")
     )
 
     if not order_no:
         # Если заказ не удался
-        await callback.message.edit_text(
+        await screen.show(
+            callback.message,
             text=TEXTS["payment_error"],
             reply_markup=get_back_to_main_keyboard()
         )
@@ -736,15 +599,12 @@ async def process_payment(callback: CallbackQuery, state: FSMContext):
 
     # Сохраняем номер заказа
     await state.update_data(order_no=order_no)
-
-    # Сохраняем информацию о заказе в профиле пользователя
-    user_id = callback.from_user.id
-    country_name = data.get("country_name", "")
-    package_name = package.get("name", "")
-    save_order(user_id, order_no, country_name, package_name)
+    analytics.emit("paid", callback.from_user.id, country=data.get("country_code", ""), package=package_code,
+                   order=order_no)
 
     # Отправляем сообщение об успешной оплате
-    await callback.message.edit_text(
+    await screen.show(
+        callback.message,
         text=TEXTS["payment_success"],
         reply_markup=get_payment_done_keyboard()
     )
@@ -757,54 +617,37 @@ async def show_esim_details(callback: CallbackQuery, state: FSMContext):
     """Показать детали купленной eSIM"""
     await callback.answer()
 
-    # Отправляем сообщение о получении данных
-    await callback.message.edit_text(text=TEXTS["getting_esim_details"])
-
     # Получаем номер заказа
     data = await state.get_data()
     order_no = data.get("order_no", "")
 
     if not order_no:
-        await callback.message.edit_text(
+        await screen.show(
+            callback.message,
             text="Ошибка: информация о заказе не найдена.",
             reply_markup=get_back_to_main_keyboard()
         )
         await state.clear()
         return
 
-    # Ждем, пока eSIM будет готова (может занять некоторое время)
-    profiles = []
-    for _ in range(5):  # Максимум 5 попыток
-        profiles = esim_client.query_order(order_no)
-        if profiles:
-            break
-        await asyncio.sleep(2)  # Ждем 2 секунды между попытками
-
-    if not profiles:
-        await callback.message.edit_text(
-            text=TEXTS["esim_not_ready"],
+    # Берем данные из кэша - опрос API выполняет очередь выдачи
+    profile = get_ready_profile(esim_cache.peek(order_no, fresh_status=False))
+
+    if profile is None:
+        # eSIM еще выпускается: данные будут отправлены автоматически
+        fulfillment_queue.submit(order_no, callback.message.chat.id, callback.from_user.id)
+        await screen.show(
+            callback.message,
+            text=TEXTS["esim_pending"],
             reply_markup=get_back_to_main_keyboard()
         )
         await state.clear()
         return
 
-    # Берем первый профиль из заказа
-    profile = profiles[0]
-
-    # Формируем информацию о профиле
-    ac = profile.get("ac", "")  # Activation Code
-    qr_code_url = profile.get("qrCodeUrl", "")
-    iccid = profile.get("iccid", "")
-
-    esim_details = TEXTS["esim_details"].format(
-        iccid=iccid,
-        ac=ac,
-        qr_code_url=qr_code_url
-    )
-
     # Отправляем детали eSIM
-    await callback.message.edit_text(
-        text=esim_details,
+    await screen.show(
+        callback.message,
+        text=format_esim_details(profile),
         reply_markup=get_back_to_main_keyboard(),
         disable_web_page_preview=False  # Показываем QR-код, если URL указывает на изображение
     )
@@ -816,7 +659,8 @@ async def show_esim_details(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data == "cancel_purchase")
 async def cancel_purchase(callback: CallbackQuery, state: FSMContext):
     """Отмена покупки"""
-    await callback.message.edit_text(
+    await screen.show(
+        callback.message,
         text=TEXTS["operation_cancelled"],
         reply_markup=get_back_to_main_keyboard()
     )
@@ -833,6 +677,7 @@ async def process_country_text(message: Message, state: FSMContext):
     # Проверяем, есть ли код страны
     if country_name in COUNTRY_CODES:
         country_code = COUNTRY_CODES[country_name]
+        analytics.emit("country_view", message.from_user.id, country=country_code)
 
         # Сохраняем информацию о стране
         await state.update_data(
@@ -841,12 +686,13 @@ async def process_country_text(message: Message, state: FSMContext):
         )
 
         # Отправляем сообщение о загрузке
-        loading_message = await message.answer(
+        loading_message = await screen.send(
+            message,
             text=TEXTS["loading_packages"].format(country_name=country_name)
         )
 
         # Получаем пакеты для выбранной страны
-        packages = esim_client.get_packages_by_country(country_code)
+        packages = await get_country_packages(country_code)
 
         # Дедуплицируем пакеты
         packages = deduplicate_packages(packages)
@@ -857,7 +703,8 @@ async def process_country_text(message: Message, state: FSMContext):
         if not packages:
             # Если пакеты не найдены
             no_packages_text = TEXTS["no_packages"].format(country_name=country_name)
-            await loading_message.edit_text(
+            await screen.show(
+                loading_message,
                 text=no_packages_text,
                 reply_markup=get_buy_esim_keyboard()
             )
@@ -865,14 +712,17 @@ async def process_country_text(message: Message, state: FSMContext):
 
         # Отображаем тарифы
         packages_text = TEXTS["choose_package"].format(country_name=country_name)
-        await loading_message.edit_text(
+        await screen.show(
+            loading_message,
             text=packages_text,
             reply_markup=get_packages_keyboard(packages, country_code, country_name)
         )
         await state.set_state(BuyingStates.selecting_package)
+        analytics.emit("packages_shown", message.from_user.id, country=country_code)
     else:
         # Если код страны не найден
-        await message.answer(
+        await screen.send(
+            message,
             text=TEXTS["nothing_found"],
             reply_markup=get_buy_esim_keyboard()
         )
\ No newline at end of file
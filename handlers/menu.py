@@ -11,6 +11,7 @@ from keyboards.inline import (
     get_feedback_no_keyboard
 )
 from texts import TEXTS
+from utils.screen import screen
 
 router = Router()
 
@@ -18,69 +19,21 @@ router = Router()
 @router.callback_query(F.data == "partner")
 async def show_partner(callback: CallbackQuery):
     """Показать информацию о партнерстве"""
-    try:
-        if callback.message.photo:
-            await callback.message.delete()
-            await callback.message.answer(
-                text=TEXTS["partner"],
-                reply_markup=get_partner_keyboard()
-            )
-        else:
-            await callback.message.edit_text(
-                text=TEXTS["partner"],
-                reply_markup=get_partner_keyboard()
-            )
-    except Exception:
-        await callback.message.answer(
-            text=TEXTS["partner"],
-            reply_markup=get_partner_keyboard()
-        )
+    await screen.show(callback.message, TEXTS["partner"], get_partner_keyboard())
     await callback.answer()
 
 
 @router.callback_query(F.data == "partner_referral")
 async def show_partner_referral(callback: CallbackQuery):
     """Показать информацию о партнерской программе"""
-    try:
-        if callback.message.photo:
-            await callback.message.delete()
-            await callback.message.answer(
-                text=TEXTS["partner_referral"],
-                reply_markup=get_partner_referral_keyboard()
-            )
-        else:
-            await callback.message.edit_text(
-                text=TEXTS["partner_referral"],
-                reply_markup=get_partner_referral_keyboard()
-            )
-    except Exception:
-        await callback.message.answer(
-            text=TEXTS["partner_referral"],
-            reply_markup=get_partner_referral_keyboard()
-        )
+    await screen.show(callback.message, TEXTS["partner_referral"], get_partner_referral_keyboard())
     await callback.answer()
 
 
 @router.callback_query(F.data == "partner_community")
 async def show_partner_community(callback: CallbackQuery):
     """Показать информацию о монетизации сообщества"""
-    try:
-        if callback.message.photo:
-            await callback.message.delete()
-            await callback.message.answer(
-                text=TEXTS["partner_community"],
-                reply_markup=get_partner_community_keyboard()
-            )
-        else:
-            await callback.message.edit_text(
-                text=TEXTS["partner_community"],
-                reply_markup=get_partner_community_keyboard()
-            )
-    except Exception:
-        await callback.message.answer(
-            text=TEXTS["partner_community"],
-            reply_markup=get_partner_community_keyboard()
-        )
+    await screen.show(callback.message, TEXTS["partner_community"], get_partner_community_keyboard())
     await callback.answer()
 
 
@@ -103,23 +56,7 @@ async def handle_feedback(callback: CallbackQuery):
         feedback_text = TEXTS["feedback_no"]
         keyboard = get_feedback_no_keyboard()
 
-    try:
-        if callback.message.photo:
-            await callback.message.delete()
-            await callback.message.answer(
-                text=feedback_text,
-                reply_markup=keyboard
-            )
-        else:
-            await callback.message.edit_text(
-                text=feedback_text,
-                reply_markup=keyboard
-            )
-    except Exception:
-        await callback.message.answer(
-            text=feedback_text,
-            reply_markup=keyboard
-        )
+    await screen.show(callback.message, feedback_text, keyboard)
 
     await callback.answer()
 
@@ -7,19 +7,33 @@ from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from keyboards.inline import get_profile_keyboard, get_back_to_main_keyboard
 from texts import TEXTS
-from config import ESIM_ACCESS_CODE
-from utils.esim_client import ESIMAccessClient
+from middlewares.callback_ack import time_left
+from utils.esim_cache import esim_cache, profile_status, PENDING_STATUSES, REFRESH_TIMEOUT
+from utils.order_storage import order_repository
+from utils.screen import screen
+import asyncio
 import logging
 
 router = Router()
 logger = logging.getLogger(__name__)
 
-# Создаем экземпляр клиента eSIM Access
-esim_client = ESIMAccessClient(ESIM_ACCESS_CODE)
+# Активные статусы eSIM
+ACTIVE_STATUSES = {"ACTIVE", "IN_USE"}
 
-# Хранилище для заказов пользователей
-# В реальном приложении лучше использовать базу данных
-user_orders = {}
+# Количество eSIM на одной странице профиля
+PROFILE_PAGE_SIZE = 10
+
+# Тексты статусов eSIM для профиля
+STATUS_TEXTS = {
+    "ACTIVE": "Активна",
+    "IN_USE": "Активна",
+    "USED_UP": "Трафик израсходован",
+    "USED_EXPIRED": "Срок действия истек",
+    "UNUSED_EXPIRED": "Срок действия истек",
+    "CANCEL": "Отменена",
+    "REVOKED": "Отозвана",
+    "SUSPENDED": "Приостановлена"
+}
 
 
 class ProfileStates(StatesGroup):
@@ -27,62 +41,110 @@ class ProfileStates(StatesGroup):
     viewing_esim = State()
 
 
+def get_status_text(status: str) -> str:
+    """Текст статуса eSIM для пользователя"""
+    if status in PENDING_STATUSES:
+        return "Выпускается"
+    return STATUS_TEXTS.get(status, "Не активирована")
+
+
 @router.callback_query(F.data == "profile")
 async def show_profile(callback: CallbackQuery, state: FSMContext):
-    """Показать профиль пользователя"""
+    """Показать профиль пользователя (первая страница eSIM)"""
+    await render_profile(callback, state)
+
+
+@router.callback_query(F.data.startswith("profile_older_") | F.data.startswith("profile_newer_"))
+async def paginate_profile(callback: CallbackQuery, state: FSMContext):
+    """Листание eSIM в профиле"""
+    # Курсор в callback data: profile_{направление}_{created_at}_{order_no}
+    try:
+        _, direction, created_at, order_no = callback.data.split("_", 3)
+        cursor = (int(created_at), order_no)
+    except ValueError:
+        # Устаревшая или поврежденная кнопка - показываем первую страницу
+        logger.warning(f"Invalid profile pagination data: {callback.data}")
+        return await render_profile(callback, state)
+    await render_profile(callback, state, cursor, newer=direction == "newer")
+
+
+async def render_profile(callback: CallbackQuery, state: FSMContext, cursor=None, newer: bool = False):
+    """
+    Отрисовка страницы профиля
+
+    :param cursor: Курсор (created_at, order_no) крайней eSIM соседней страницы (None - первая страница)
+    :param newer: True - показать eSIM новее курсора, False - старше
+    """
     user_id = callback.from_user.id
 
-    # Получаем заказы пользователя (заглушка)
-    orders = user_orders.get(user_id, [])
+    # Получаем одну страницу заказов пользователя (от новых к старым)
+    orders, has_newer, has_older = await order_repository.get_user_orders_page(
+        user_id, cursor, newer, PROFILE_PAGE_SIZE
+    )
+    if not orders and cursor is not None:
+        # Страница опустела (устаревшая кнопка) - показываем первую
+        return await render_profile(callback, state)
 
     if not orders:
         # Если у пользователя нет заказов
         profile_text = f"{TEXTS['profile']}\n\nУ вас пока нет активированных eSIM. Нажмите на кнопку «Купить eSIM», чтобы приобрести новую."
         keyboard = get_profile_keyboard()
     else:
+        # Обновляем статусы eSIM страницы одним пакетом (с общим дедлайном,
+        # не дольше, чем осталось до дедлайна нажатия кнопки)
+        statuses = await esim_cache.query_orders(
+            [order['order_no'] for order in orders], timeout=time_left(REFRESH_TIMEOUT)
+        )
+
         # Формируем текст с имеющимися eSIM
         profile_text = TEXTS['profile'] + "\n\n"
 
-        for i, order in enumerate(orders):
+        for order in orders:
             order_no = order.get('order_no', 'Неизвестный')
             country = order.get('country', 'Неизвестная страна')
             date = order.get('date', 'Неизвестная дата')
 
-            profile_text += f"{i + 1}. eSIM {country} - {date}\n"
+            profiles = statuses.get(order_no)
+            if profiles is None:
+                status_text = "статус обновляется"
+            elif not profiles:
+                status_text = "выпускается"
+            else:
+                status_text = get_status_text(profile_status(profiles[0])).lower()
+
+            profile_text += f"• eSIM {country} - {date} ({status_text})\n"
 
         # Создаем клавиатуру с eSIM
         builder = InlineKeyboardBuilder()
 
-        for i, order in enumerate(orders):
+        for order in orders:
             country = order.get('country', 'Неизвестная страна')
             builder.row(
-                InlineKeyboardButton(text=f"eSIM {country}", callback_data=f"esim_{i}")
+                InlineKeyboardButton(text=f"eSIM {country}", callback_data=f"esim_{order['order_no']}")
             )
 
+        # Кнопки навигации несут курсор крайней eSIM страницы
+        navigation = []
+        if has_newer:
+            first = orders[0]
+            navigation.append(InlineKeyboardButton(
+                text="⬅️ Новее", callback_data=f"profile_newer_{first['created_at']}_{first['order_no']}"
+            ))
+        if has_older:
+            last = orders[-1]
+            navigation.append(InlineKeyboardButton(
+                text="Старше ➡️", callback_data=f"profile_older_{last['created_at']}_{last['order_no']}"
+            ))
+        if navigation:
+            builder.row(*navigation)
+
         builder.row(
             InlineKeyboardButton(text="↩️ В каталог", callback_data="back_to_main")
         )
 
         keyboard = builder.as_markup()
 
-    try:
-        if callback.message.photo:
-            await callback.message.delete()
-            await callback.message.answer(
-                text=profile_text,
-                reply_markup=keyboard
-            )
-        else:
-            await callback.message.edit_text(
-                text=profile_text,
-                reply_markup=keyboard
-            )
-    except Exception as e:
-        # В случае ошибки просто отправляем новое сообщение
-        await callback.message.answer(
-            text=profile_text,
-            reply_markup=keyboard
-        )
+    await screen.show(callback.message, profile_text, keyboard)
 
     await state.set_state(ProfileStates.viewing_profile)
     await callback.answer()
@@ -93,57 +155,30 @@ async def show_esim_details(callback: CallbackQuery, state: FSMContext):
     """Показать детали eSIM"""
     user_id = callback.from_user.id
 
-    # Получаем индекс eSIM
-    esim_index = int(callback.data.split('_')[1])
+    # Получаем номер заказа eSIM
+    order_no = callback.data.replace("esim_", "", 1)
 
     # Получаем данные о заказе
-    orders = user_orders.get(user_id, [])
-
-    if not orders or esim_index >= len(orders):
-        try:
-            if callback.message.photo:
-                await callback.message.delete()
-                await callback.message.answer(
-                    text="eSIM не найдена. Возможно, она была удалена.",
-                    reply_markup=get_back_to_main_keyboard()
-                )
-            else:
-                await callback.message.edit_text(
-                    text="eSIM не найдена. Возможно, она была удалена.",
-                    reply_markup=get_back_to_main_keyboard()
-                )
-        except Exception:
-            await callback.message.answer(
-                text="eSIM не найдена. Возможно, она была удалена.",
-                reply_markup=get_back_to_main_keyboard()
-            )
+    order = await order_repository.get_order(order_no)
+
+    if not order or order['user_id'] != user_id:
+        await screen.show(
+            callback.message,
+            "eSIM не найдена. Возможно, она была удалена.",
+            get_back_to_main_keyboard()
+        )
         await callback.answer()
         return
 
-    order = orders[esim_index]
-    order_no = order.get('order_no', '')
-
-    # Получаем данные eSIM через API
-    profiles = esim_client.query_order(order_no)
+    # Получаем данные eSIM (из кэша или через API в отдельном потоке)
+    profiles = await asyncio.to_thread(esim_cache.query_order, order_no)
 
     if not profiles:
-        try:
-            if callback.message.photo:
-                await callback.message.delete()
-                await callback.message.answer(
-                    text="Не удалось получить информацию об eSIM. Пожалуйста, попробуйте позже.",
-                    reply_markup=get_back_to_main_keyboard()
-                )
-            else:
-                await callback.message.edit_text(
-                    text="Не удалось получить информацию об eSIM. Пожалуйста, попробуйте позже.",
-                    reply_markup=get_back_to_main_keyboard()
-                )
-        except Exception:
-            await callback.message.answer(
-                text="Не удалось получить информацию об eSIM. Пожалуйста, попробуйте позже.",
-                reply_markup=get_back_to_main_keyboard()
-            )
+        await screen.show(
+            callback.message,
+            "Не удалось получить информацию об eSIM. Пожалуйста, попробуйте позже.",
+            get_back_to_main_keyboard()
+        )
         await callback.answer()
         return
 
@@ -154,13 +189,13 @@ async def show_esim_details(callback: CallbackQuery, state: FSMContext):
     ac = profile.get("ac", "")  # Activation Code
     qr_code_url = profile.get("qrCodeUrl", "")
     iccid = profile.get("iccid", "")
-    status = profile.get("status", "")
+    status = profile_status(profile)
 
     # Проверяем статус
-    status_text = "Активна" if status == "ACTIVE" else "Не активирована"
+    status_text = get_status_text(status)
 
     esim_details = f"""
-eSIM #{esim_index + 1}
+eSIM {order.get('country', '')} — {order.get('date', '')}
 
 ICCID: {iccid}
 Статус: {status_text}
@@ -175,35 +210,16 @@ QR-код для активации: {qr_code_url}
     builder = InlineKeyboardBuilder()
 
     # Если eSIM не активирована, добавляем кнопку активации
-    if status != "ACTIVE":
+    if status not in ACTIVE_STATUSES:
         builder.row(
-            InlineKeyboardButton(text="📲 Активировать", callback_data=f"activate_esim_{esim_index}")
+            InlineKeyboardButton(text="📲 Активировать", callback_data=f"activate_esim_{order_no}")
         )
 
     builder.row(
         InlineKeyboardButton(text="↩️ Назад к профилю", callback_data="profile")
     )
 
-    try:
-        if callback.message.photo:
-            await callback.message.delete()
-            await callback.message.answer(
-                text=esim_details,
-                reply_markup=builder.as_markup(),
-                disable_web_page_preview=False
-            )
-        else:
-            await callback.message.edit_text(
-                text=esim_details,
-                reply_markup=builder.as_markup(),
-                disable_web_page_preview=False
-            )
-    except Exception:
-        await callback.message.answer(
-            text=esim_details,
-            reply_markup=builder.as_markup(),
-            disable_web_page_preview=False
-        )
+    await screen.show(callback.message, esim_details, builder.as_markup(), disable_web_page_preview=False)
 
     await state.set_state(ProfileStates.viewing_esim)
     await callback.answer()
@@ -213,39 +229,9 @@ QR-код для активации: {qr_code_url}
 @router.callback_query(ProfileStates.viewing_esim, F.data.startswith("activate_esim_"))
 async def activate_esim(callback: CallbackQuery, state: FSMContext):
     """Активация eSIM"""
-    try:
-        if callback.message.photo:
-            await callback.message.delete()
-            await callback.message.answer(
-                text="eSIM активируется автоматически при установке. Следуйте инструкциям в разделе «Как установить eSIM».",
-                reply_markup=get_back_to_main_keyboard()
-            )
-        else:
-            await callback.message.edit_text(
-                text="eSIM активируется автоматически при установке. Следуйте инструкциям в разделе «Как установить eSIM».",
-                reply_markup=get_back_to_main_keyboard()
-            )
-    except Exception:
-        await callback.message.answer(
-            text="eSIM активируется автоматически при установке. Следуйте инструкциям в разделе «Как установить eSIM».",
-            reply_markup=get_back_to_main_keyboard()
-        )
+    await screen.show(
+        callback.message,
+        "eSIM активируется автоматически при установке. Следуйте инструкциям в разделе «Как установить eSIM».",
+        get_back_to_main_keyboard()
+    )
     await callback.answer()
-
-
-# Функция для сохранения информации о заказе
-def save_order(user_id, order_no, country, package_name):
-    """Сохраняет информацию о заказе пользователя"""
-    from datetime import datetime
-
-    order_info = {
-        'order_no': order_no,
-        'country': country,
-        'package_name': package_name,
-        'date': datetime.now().strftime('%d.%m.%Y')
-    }
-
-    if user_id not in user_orders:
-        user_orders[user_id] = []
-
-    user_orders[user_id].append(order_info)
\ No newline at end of file
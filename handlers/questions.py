@@ -5,6 +5,7 @@ from aiogram.types import CallbackQuery
 from keyboards.inline import get_questions_keyboard, get_qa_back_keyboard, get_feedback_keyboard
 from texts import TEXTS
 from texts import QA_ITEMS
+from utils.screen import screen
 
 router = Router()
 
@@ -12,23 +13,7 @@ router = Router()
 @router.callback_query(F.data == "questions")
 async def show_questions(callback: CallbackQuery):
     """Показать меню вопросов и ответов"""
-    try:
-        if callback.message.photo:
-            await callback.message.delete()
-            await callback.message.answer(
-                text=TEXTS["questions"],
-                reply_markup=get_questions_keyboard()
-            )
-        else:
-            await callback.message.edit_text(
-                text=TEXTS["questions"],
-                reply_markup=get_questions_keyboard()
-            )
-    except Exception:
-        await callback.message.answer(
-            text=TEXTS["questions"],
-            reply_markup=get_questions_keyboard()
-        )
+    await screen.show(callback.message, TEXTS["questions"], get_questions_keyboard())
     await callback.answer()
 
 
@@ -41,22 +26,6 @@ async def show_answer(callback: CallbackQuery):
         qa_item = QA_ITEMS[qa_key]
         answer_text = f"❓ {qa_item['text']}\n\n{qa_item['answer']}\n\n{TEXTS['feedback_question']}"
 
-        try:
-            if callback.message.photo:
-                await callback.message.delete()
-                await callback.message.answer(
-                    text=answer_text,
-                    reply_markup=get_feedback_keyboard()
-                )
-            else:
-                await callback.message.edit_text(
-                    text=answer_text,
-                    reply_markup=get_feedback_keyboard()
-                )
-        except Exception:
-            await callback.message.answer(
-                text=answer_text,
-                reply_markup=get_feedback_keyboard()
-            )
+        await screen.show(callback.message, answer_text, get_feedback_keyboard())
 
     await callback.answer()
\ No newline at end of file
@@ -191,7 +191,7 @@ def get_packages_keyboard(packages: List[Dict[str, Any]], country_code: str, cou
     packages = deduplicate_packages(packages)
 
     # Получаем курс один раз для всех пакетов
-    usd_to_rub_rate = currency_converter.get_usd_to_rub_rate()
+    usd_to_rub_rate = currency_converter.cached_rate()
 
     # Разделяем пакеты на ежедневные и обычные
     daily_packages = [p for p in packages if is_daily_package(p)]
@@ -8,42 +8,218 @@ from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.redis import RedisStorage
 
-from config import BOT_TOKEN
+from config import (
+    BOT_TOKEN, BOT_MODE, BOT_WORKERS, MAX_PENDING_UPDATES, ADMIN_CHAT_ID, REGIONS, BACKLOG_MODE, METRICS_PORT
+)
 from handlers import setup_routers
+from middlewares import setup_middlewares, setup_session_middlewares
+from utils.analytics import analytics
+from utils.backlog import backlog_replay
+from utils.order_storage import order_repository
+from utils.fulfillment import fulfillment_queue
+from utils.order_journal import order_journal
+from utils.checkout import resume_orders
+from utils.currency import currency_converter
+from utils.esim_cache import esim_cache
+from utils.loop_monitor import loop_monitor
+from utils.profiler import profiler
+from utils.media_cache import media_cache
+from utils.memory import memory_inspector
+from utils.metrics import metrics
+from utils.screen import screen
+from utils.shared_cache import redis_client, shared_cache
+from utils.tracing import tracer
+from utils.sharding import ShardRouter, start_workers, run_worker, run_front_polling, run_front_webhook
+from utils.webhook import run_webhook
 
 
-async def main():
-    """Основная функция для запуска бота"""
-    # Настройка логирования
+def setup_logging():
+    """Настройка логирования"""
     logging.basicConfig(
         level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        format='%(asctime)s - %(process)d - %(name)s - %(levelname)s - %(message)s',
         stream=sys.stdout
     )
 
-    # Инициализация хранилища состояний
-    storage = MemoryStorage()
 
-    # Инициализация бота
-    bot = Bot(
+def create_bot() -> Bot:
+    """Инициализация бота"""
+    return Bot(
         token=BOT_TOKEN,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
 
-    # Инициализация диспетчера
+
+def create_dispatcher() -> Dispatcher:
+    """Инициализация диспетчера с роутерами и middleware"""
+    # Инициализация хранилища состояний: общее для всех процессов бота, если настроен Redis
+    if redis_client is not None:
+        storage = RedisStorage(redis=redis_client)
+    else:
+        storage = MemoryStorage()
+
     dp = Dispatcher(storage=storage)
 
     # Подключение роутеров
     router = setup_routers()
     dp.include_router(router)
 
-    # Удаление вебхука и очистка обновлений
-    await bot.delete_webhook(drop_pending_updates=True)
+    # Подключение middleware
+    setup_middlewares(dp)
+
+    # Статистика компонентов на /metrics
+    metrics.register("fulfillment", fulfillment_queue.stats)
+    metrics.register("order_journal", order_journal.stats)
+    metrics.register("esim_cache", esim_cache.stats)
+    metrics.register("screen", screen.stats)
+    metrics.register("backlog", backlog_replay.stats)
+    metrics.register("loop", loop_monitor.stats)
+    metrics.register("profiler", profiler.stats)
+    metrics.register("tracing", tracer.stats)
+    metrics.register("analytics", analytics.stats)
+
+    # Разбор памяти по подсистемам (/memory и метрики memory)
+    memory_inspector.storage = storage
+    memory_inspector.register("shared_cache", shared_cache.memory_data)
+    memory_inspector.register("esim_cache", esim_cache.memory_data)
+    memory_inspector.register("screen", screen.memory_data)
+    memory_inspector.register("media_cache", media_cache.memory_data)
+    memory_inspector.register("order_buffer", order_repository.memory_data)
+    metrics.register("memory", memory_inspector.stats)
+    return dp
+
+
+async def receive_updates(dp: Dispatcher, bot: Bot):
+    """Прием обновлений от Telegram в этом же процессе"""
+    replay = BACKLOG_MODE == "replay"
+
+    # Удаление вебхука; очередь, накопившаяся за время перезапуска, обрабатывается или отбрасывается
+    await bot.delete_webhook(drop_pending_updates=not replay)
+    if replay:
+        await backlog_replay.replay(dp, bot)
+
+    if BOT_MODE == "webhook":
+        # Прием обновлений через вебхук (aiohttp)
+        await run_webhook(dp, bot, drop_pending_updates=not replay)
+    else:
+        # Запуск long-polling
+        logging.info("Бот запущен!")
+        await dp.start_polling(bot, tasks_concurrency_limit=MAX_PENDING_UPDATES)
+
+
+async def run_bot(receive, warmup_media: bool = True, metrics_port: int = METRICS_PORT):
+    """
+    Запуск бота: фоновые службы и прием обновлений
+
+    :param receive: Корутина receive(dp, bot), получающая обновления
+    :param warmup_media: Загружать изображения регионов в чат администратора заранее
+    :param metrics_port: Порт /metrics (0 - не запускать)
+    """
+    bot = create_bot()
+    dp = create_dispatcher()
+    setup_session_middlewares(bot)
+    await metrics.start(port=metrics_port)
+    # Задержка цикла событий и стеки блокирующих вызовов
+    loop_watch = asyncio.create_task(loop_monitor.run())
+    # Фоновая запись спанов трассировки и событий воронки
+    tracer.start()
+    analytics.start()
+    # Периодический замер памяти в отдельном потоке (метрики memory)
+    memory_inspector.start()
+
+    # Открытие хранилища заказов и запуск фоновой выдачи eSIM
+    await order_repository.start()
+    fulfillment_queue.start(bot)
+    # Курс получаем до приема обновлений: обработчики берут его только из кэша
+    await currency_converter.try_sync_shared_rate()
+    rate_sync = asyncio.create_task(currency_converter.run_shared_sync())
+
+    # Изображения регионов загружаются в Telegram заранее, дальше отправляются по file_id.
+    # Кэш читается до приема обновлений, иначе первая запись затерла бы его файл
+    await asyncio.to_thread(media_cache.load, bot.id)
+    media_warmup = asyncio.create_task(
+        media_cache.start(bot, ADMIN_CHAT_ID if warmup_media else 0, [region["image"] for region in REGIONS.values()])
+    )
+
+    try:
+        # Завершение заказов, прерванных предыдущим перезапуском
+        incomplete_orders = await order_journal.start()
+        await resume_orders(incomplete_orders)
+
+        await receive(dp, bot)
+    finally:
+        # Сохраняем заказы, которые еще не записаны на диск
+        rate_sync.cancel()
+        loop_watch.cancel()
+        media_warmup.cancel()
+        await fulfillment_queue.close()
+        await order_journal.close()
+        await order_repository.close()
+        await tracer.close()
+        await analytics.close()
+        await memory_inspector.close()
+        if redis_client is not None:
+            await redis_client.aclose()
+        await metrics.close()
+        await bot.session.close()
+
+
+def worker_main(index: int, port: int):
+    """Процесс-воркер: обработка обновлений своей доли пользователей"""
+    setup_logging()
+    # У каждого воркера свой журнал заказов, файлы спанов и событий (воркер 0 - прежние файлы)
+    if index:
+        order_journal.set_shard(index)
+        if tracer.path:
+            tracer.path = f"{tracer.path}.{index}"
+        analytics.suffix = f".{index}"
+    # У каждого воркера свой порт /metrics
+    asyncio.run(run_bot(
+        lambda dp, bot: run_worker(dp, bot, index, port), warmup_media=index == 0,
+        metrics_port=METRICS_PORT + index if METRICS_PORT else 0
+    ))
+
+
+async def run_front():
+    """Принимающий процесс: получает обновления и распределяет их по воркерам"""
+    bot = create_bot()
+    router = ShardRouter(BOT_WORKERS)
+    port = await router.start()
+    processes = start_workers(worker_main, BOT_WORKERS, port)
+    try:
+        await router.wait_workers()
+
+        replay = BACKLOG_MODE == "replay"
+        await bot.delete_webhook(drop_pending_updates=not replay)
+        if replay:
+            # Очередь перезапуска уходит воркерам раньше новых обновлений
+            for update in await backlog_replay.collect(bot):
+                await router.forward(update, backlog=True)
+
+        if BOT_MODE == "webhook":
+            await run_front_webhook(bot, router, drop_pending_updates=not replay)
+        else:
+            await run_front_polling(bot, router, drop_pending_updates=not replay)
+    finally:
+        # Воркеры дообрабатывают полученные обновления и завершаются
+        await router.close()
+        for process in processes:
+            await asyncio.to_thread(process.join, 30)
+            if process.is_alive():
+                process.terminate()
+        await bot.session.close()
+
+
+async def main():
+    """Основная функция для запуска бота"""
+    setup_logging()
 
-    # Запуск long-polling
-    logging.info("Бот запущен!")
-    await dp.start_polling(bot)
+    if BOT_WORKERS > 1:
+        await run_front()
+    else:
+        await run_bot(receive_updates)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,49 @@
+# middlewares/__init__.py
+
+from aiogram import Bot, Dispatcher
+
+from .callback_ack import callback_ack
+from .callback_dispatch import CallbackTrieMiddleware
+from .chat_order import chat_order_middleware
+from .flood_control import flood_control, PurchasePriorityMiddleware
+from .metrics import handler_metrics
+from .tracing import update_tracing
+from utils.metrics import metrics
+
+
+def setup_middlewares(dp: Dispatcher):
+    """Подключение middleware к диспетчеру (после подключения роутеров)"""
+    # Очередь чата должна соблюдаться до чтения состояния FSM,
+    # поэтому исполнитель ставится перед FSM middleware диспетчера
+    dp.update.outer_middleware.unregister(dp.fsm)
+    # Корневой спан трассировки охватывает все middleware обновления
+    dp.update.outer_middleware(update_tracing)
+    # Дедлайн ответа на нажатие кнопки отсчитывается с момента получения,
+    # включая ожидание в очереди чата
+    dp.update.outer_middleware(callback_ack)
+    dp.update.outer_middleware(chat_order_middleware)
+    dp.update.outer_middleware(dp.fsm)
+    dp.update.outer_middleware(PurchasePriorityMiddleware())
+    # Выбор обработчика нажатия по дереву префиксов callback data
+    callback_trie = CallbackTrieMiddleware(dp)
+    dp.callback_query.outer_middleware(callback_trie)
+    # Время и спаны обработчиков: внутренние middleware диспетчера действуют во всех роутерах
+    for name, observer in dp.observers.items():
+        if name not in ("update", "error"):
+            observer.middleware(handler_metrics)
+            observer.middleware(update_tracing.handler_middleware)
+    # Статистика middleware на /metrics
+    metrics.register("chat_order", chat_order_middleware.stats)
+    metrics.register("flood_control", flood_control.stats)
+    metrics.register("callback_ack", callback_ack.stats)
+    metrics.register("callback_trie", callback_trie.stats)
+
+
+def setup_session_middlewares(bot: Bot):
+    """Подключение middleware к сессии бота (исходящие запросы к Bot API)"""
+    # Время запросов вместе с ожиданием в планировщике
+    bot.session.middleware(handler_metrics.request_middleware)
+    # Планировщик с учетом лимитов Telegram
+    bot.session.middleware(flood_control)
+    # Поздние ответы на callback query после раннего ответа не отправляются
+    bot.session.middleware(callback_ack.request_middleware)
@@ -0,0 +1,189 @@
+# middlewares/callback_ack.py
+
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import NextRequestMiddlewareType
+from aiogram.methods import AnswerCallbackQuery, Response, TelegramMethod
+from aiogram.types import TelegramObject
+
+from config import CALLBACK_ACK_BUDGET
+
+logger = logging.getLogger(__name__)
+
+# Сколько Telegram ждет ответа на callback query («query is too old» после этого)
+CALLBACK_QUERY_TIMEOUT = 15.0
+
+# Дедлайн ответа на callback query текущего обновления (time.monotonic())
+callback_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("callback_deadline", default=None)
+
+
+def time_left(default: float) -> float:
+    """
+    Сколько времени можно потратить на ожидание в текущем обновлении
+
+    :param default: Обычный таймаут операции (секунды)
+    :return: default, но не больше времени до дедлайна callback query
+    """
+    deadline = callback_deadline.get()
+    if deadline is None:
+        return default
+    return max(0.0, min(default, deadline - time.monotonic()))
+
+
+class _Query:
+    __slots__ = ("received", "deadline", "chat_id", "answered", "early")
+
+    def __init__(self, received: float, deadline: float, chat_id: Optional[int]):
+        self.received = received
+        self.deadline = deadline
+        # Чат, куда отправить текст ответа, если Telegram его уже не покажет
+        self.chat_id = chat_id
+        self.answered = False
+        # Ответ, отправленный middleware за обработчик
+        self.early: Optional[AnswerCallbackQuery] = None
+
+
+class CallbackAckMiddleware(BaseMiddleware):
+    """
+    Ранний ответ на callback query
+
+    Если обработчик не ответил на нажатие кнопки за budget секунд (долгая загрузка
+    фото, ожидание API или очереди чата), middleware отвечает сам - кнопка перестает
+    «крутиться», и ответ успевает до дедлайна Telegram. Поздний callback.answer()
+    обработчика после этого не отправляется (Telegram отклонил бы повторный ответ),
+    а его текст, если он есть, приходит в чат обычным сообщением.
+    Дедлайн обновления доступен обработчикам как callback_deadline и через time_left().
+    """
+
+    def __init__(self, budget: float = CALLBACK_ACK_BUDGET, timeout: float = CALLBACK_QUERY_TIMEOUT):
+        """
+        :param budget: Сколько секунд ждать ответа обработчика
+        :param timeout: Дедлайн Telegram на ответ (секунды)
+        """
+        self.budget = budget
+        self.timeout = timeout
+        self._queries: Dict[str, _Query] = {}
+        self._early_tasks: Set[asyncio.Task] = set()
+
+        self.tracked = 0
+        self.answered_early = 0
+        self.suppressed = 0
+        self.expired = 0
+        self.texts_resent = 0
+        self._ack_delays = deque(maxlen=1000)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        callback_query = getattr(event, "callback_query", None)
+        if callback_query is None:
+            return await handler(event, data)
+
+        received = time.monotonic()
+        # Нажатие из очереди перезапуска: Telegram уже не примет ответ на него
+        timeout = 0.0 if data.get("backlog") else self.timeout
+        message = callback_query.message
+        chat_id = message.chat.id if message is not None else callback_query.from_user.id
+        query = self._queries[callback_query.id] = _Query(received, received + timeout, chat_id)
+        self.tracked += 1
+        data["callback_deadline"] = query.deadline
+        token = callback_deadline.set(query.deadline)
+        timer = None
+        if timeout:
+            timer = asyncio.get_running_loop().call_later(
+                self.budget, self._schedule_early, data["bot"], callback_query.id, query
+            )
+        try:
+            return await handler(event, data)
+        finally:
+            if timer is not None:
+                timer.cancel()
+            callback_deadline.reset(token)
+            self._queries.pop(callback_query.id, None)
+
+    def _schedule_early(self, bot: Bot, query_id: str, query: _Query):
+        task = asyncio.create_task(self._answer_early(bot, query_id, query))
+        self._early_tasks.add(task)
+        task.add_done_callback(self._early_done)
+
+    def _early_done(self, task: asyncio.Task):
+        self._early_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Ошибка раннего ответа на callback query", exc_info=task.exception())
+
+    async def _answer_early(self, bot: Bot, query_id: str, query: _Query):
+        if query.answered:
+            return
+        query.answered = True
+        query.early = AnswerCallbackQuery(callback_query_id=query_id)
+        self.answered_early += 1
+        self._ack_delays.append(time.monotonic() - query.received)
+        try:
+            await bot(query.early)
+        except Exception as e:
+            logger.warning(f"Не удалось ответить на callback query {query_id}: {e}")
+
+    async def request_middleware(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod
+    ) -> Response:
+        """Middleware сессии бота: пропуск ответов, которые Telegram уже не примет"""
+        if not isinstance(method, AnswerCallbackQuery):
+            return await make_request(bot, method)
+
+        query = self._queries.get(method.callback_query_id)
+        if query is None or method is query.early:
+            return await make_request(bot, method)
+
+        if query.answered:
+            # Middleware уже ответил раньше обработчика
+            self.suppressed += 1
+            await self._resend_text(bot, query, method)
+            return True
+
+        query.answered = True
+        self._ack_delays.append(time.monotonic() - query.received)
+        if time.monotonic() > query.deadline:
+            self.expired += 1
+            await self._resend_text(bot, query, method)
+            return True
+        return await make_request(bot, method)
+
+    async def _resend_text(self, bot: Bot, query: _Query, method: AnswerCallbackQuery):
+        """Текст ответа, который Telegram уже не покажет, отправляется в чат сообщением"""
+        if not method.text or query.chat_id is None:
+            return
+        self.texts_resent += 1
+        try:
+            await bot.send_message(chat_id=query.chat_id, text=method.text)
+        except Exception as e:
+            logger.warning(f"Не удалось отправить текст ответа на callback query в чат {query.chat_id}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Ответы на callback query: ранние (за обработчик), подавленные поздние и время до ответа (секунды)"""
+        delays = sorted(self._ack_delays)
+        return {
+            "tracked": self.tracked,
+            "answered_early": self.answered_early,
+            "late_answers_suppressed": self.suppressed,
+            "expired": self.expired,
+            "texts_resent": self.texts_resent,
+            "in_flight": len(self._queries),
+            "ack_delay_p50": delays[len(delays) // 2] if delays else 0.0,
+            "ack_delay_p95": delays[int(len(delays) * 0.95)] if delays else 0.0
+        }
+
+
+# Глобальный middleware ранних ответов на callback query
+callback_ack = CallbackAckMiddleware()
\ No newline at end of file
@@ -0,0 +1,204 @@
+# middlewares/callback_dispatch.py
+
+import logging
+import operator
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import BaseMiddleware, Router
+from aiogram.dispatcher.event.bases import UNHANDLED, REJECTED, SkipHandler
+from aiogram.dispatcher.event.handler import FilterObject, HandlerObject
+from aiogram.dispatcher.event.telegram import TelegramEventObserver
+from aiogram.types import CallbackQuery
+from magic_filter.operations import (
+    CallOperation, CombinationOperation, ComparatorOperation, FunctionOperation, GetAttributeOperation
+)
+from magic_filter.util import in_op, or_op
+
+logger = logging.getLogger(__name__)
+
+# Обработчик в порядке регистрации: (номер, обработчик, его роутер, остальные фильтры)
+Entry = Tuple[int, HandlerObject, Router, List[FilterObject]]
+
+
+def callback_data_keys(filter_object: FilterObject) -> Optional[List[Tuple[bool, str]]]:
+    """
+    Значения callback data, на которые срабатывает фильтр
+
+    Понимает F.data == "x", F.data.startswith("x"), F.data.in_([...]) и их объединения через |.
+
+    :return: Список (префикс ли, строка) или None, если фильтр другой
+    """
+    magic = getattr(filter_object, "magic", None)
+    if magic is None:
+        return None
+    return _magic_keys(list(magic._operations))
+
+
+def _magic_keys(operations: list) -> Optional[List[Tuple[bool, str]]]:
+    last = operations[-1] if operations else None
+    if isinstance(last, CombinationOperation) and last.combinator is or_op:
+        left = _magic_keys(operations[:-1])
+        right = _magic_keys(list(last.right._operations))
+        return left + right if left is not None and right is not None else None
+
+    if not operations or not isinstance(operations[0], GetAttributeOperation) or operations[0].name != "data":
+        return None
+    rest = operations[1:]
+
+    if len(rest) == 1 and isinstance(rest[0], ComparatorOperation) and rest[0].comparator is operator.eq \
+            and isinstance(rest[0].right, str):
+        return [(False, rest[0].right)]
+
+    if len(rest) == 1 and isinstance(rest[0], FunctionOperation) and rest[0].function is in_op \
+            and len(rest[0].args) == 1 and all(isinstance(value, str) for value in rest[0].args[0]):
+        return [(False, value) for value in rest[0].args[0]]
+
+    if len(rest) == 2 and isinstance(rest[0], GetAttributeOperation) and rest[0].name == "startswith" \
+            and isinstance(rest[1], CallOperation) and len(rest[1].args) == 1 and not rest[1].kwargs \
+            and isinstance(rest[1].args[0], str):
+        return [(True, rest[1].args[0])]
+
+    return None
+
+
+class _TrieNode:
+    __slots__ = ("children", "entries")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.entries: List[Entry] = []
+
+
+class CallbackTrieMiddleware(BaseMiddleware):
+    """
+    Выбор обработчика callback query по префиксному дереву callback data
+
+    Вместо последовательной проверки фильтров всех роутеров callback data один раз
+    проходит по дереву префиксов (и таблице точных значений). Кандидаты берутся в
+    порядке регистрации, для них проверяются только остальные фильтры (состояние FSM
+    и т.п.), поэтому выбирается тот же обработчик, что и при обычном обходе роутеров.
+    Обработчики с фильтрами, которые не удалось разобрать, проверяются всегда.
+    Как и в aiogram, REJECTED от обработчика завершает обход его роутера вместе
+    с вложенными роутерами, и проверка продолжается в следующих роутерах.
+    Дерево строится один раз: роутеры подключаются до setup_middlewares.
+    """
+
+    def __init__(self, router: Router):
+        """
+        :param router: Корневой роутер (диспетчер) с уже подключенными роутерами
+        """
+        self._exact: Dict[str, List[Entry]] = {}
+        self._root = _TrieNode()
+        self._generic: List[Entry] = []
+        self.enabled = self._build(router)
+
+        self.dispatched = 0
+        self.candidates = 0
+
+    def _build(self, root: Router) -> bool:
+        index = 0
+        for router in root.chain_tail:
+            observer = router.observers["callback_query"]
+            if observer._handler.filters or (router is not root and len(observer.outer_middleware)):
+                # Фильтры и outer middleware роутера работают только при обычном обходе
+                logger.warning(f"Роутер {router.name} использует общие фильтры - дерево callback data отключено")
+                return False
+
+            for handler in observer.handlers:
+                entry_keys, rest = None, list(handler.filters or [])
+                for position, filter_object in enumerate(rest):
+                    entry_keys = callback_data_keys(filter_object)
+                    if entry_keys is not None:
+                        rest.pop(position)
+                        break
+
+                entry = (index, handler, router, rest)
+                index += 1
+                if entry_keys is None:
+                    self._generic.append(entry)
+                    continue
+                for is_prefix, key in entry_keys:
+                    if not is_prefix:
+                        self._exact.setdefault(key, []).append(entry)
+                        continue
+                    node = self._root
+                    for char in key:
+                        node = node.children.setdefault(char, _TrieNode())
+                    node.entries.append(entry)
+        return True
+
+    def _candidates(self, data: str) -> List[Entry]:
+        found = list(self._generic)
+        found.extend(self._exact.get(data, ()))
+        node = self._root
+        found.extend(node.entries)
+        for char in data:
+            node = node.children.get(char)
+            if node is None:
+                break
+            found.extend(node.entries)
+        # Порядок регистрации; обработчик с несколькими ключами учитывается один раз
+        return sorted({entry[0]: entry for entry in found}.values(), key=lambda entry: entry[0])
+
+    async def __call__(
+        self,
+        handler: Callable[[CallbackQuery, Dict[str, Any]], Awaitable[Any]],
+        event: CallbackQuery,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not self.enabled or event.data is None:
+            return await handler(event, data)
+
+        self.dispatched += 1
+        rejected: List[Router] = []
+        for _, handler_object, router, rest in self._candidates(event.data):
+            if rejected and self._inside(router, rejected):
+                continue
+            self.candidates += 1
+            kwargs = {**data, "event_router": router, "handler": handler_object}
+            if not await self._check(rest, event, kwargs):
+                continue
+
+            observer: TelegramEventObserver = router.observers["callback_query"]
+            try:
+                wrapped_inner = observer.outer_middleware.wrap_middlewares(
+                    observer._resolve_middlewares(), handler_object.call
+                )
+                response = await wrapped_inner(event, kwargs)
+            except SkipHandler:
+                continue
+            if response is REJECTED:
+                rejected.append(router)
+                continue
+            return response
+
+        return UNHANDLED
+
+    @staticmethod
+    def _inside(router: Router, rejected: List[Router]) -> bool:
+        """Роутер - один из отклонивших событие или вложен в такой"""
+        while router is not None:
+            if router in rejected:
+                return True
+            router = router.parent_router
+        return False
+
+    @staticmethod
+    async def _check(filters: List[FilterObject], event: CallbackQuery, kwargs: Dict[str, Any]) -> bool:
+        for filter_object in filters:
+            result = await filter_object.call(event, **kwargs)
+            if not result:
+                return False
+            if isinstance(result, dict):
+                kwargs.update(result)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Размер дерева и среднее число проверенных обработчиков на одно нажатие"""
+        return {
+            "enabled": self.enabled,
+            "exact_keys": len(self._exact),
+            "generic_handlers": len(self._generic),
+            "dispatched": self.dispatched,
+            "candidates_per_update": self.candidates / self.dispatched if self.dispatched else 0.0
+        }
\ No newline at end of file
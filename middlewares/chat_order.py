@@ -0,0 +1,107 @@
+# middlewares/chat_order.py
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import TelegramObject, Update
+
+from config import HANDLER_CONCURRENCY, CHAT_QUEUE_LIMIT, BACKLOG_CONCURRENCY
+from utils.backlog import is_payment_update
+
+logger = logging.getLogger(__name__)
+
+
+class ChatOrderMiddleware(BaseMiddleware):
+    """
+    Исполнение обновлений: строго по порядку внутри чата, параллельно между чатами
+
+    У каждого чата своя очередь: следующее обновление чата начинает обработку только
+    после завершения предыдущего (двойное нажатие «Подтвердить» или стрелок листания
+    применяется по порядку). Место в общем лимите занимает только первое обновление
+    очереди, поэтому всплеск в одном чате не задерживает другие. Обновления сверх
+    max_queue в очереди чата отбрасываются, кроме оплаты и обновлений, накопившихся
+    за время перезапуска (backlog=True в данных): их количество уже ограничено
+    отбором очереди. Обновления очереди перезапуска обрабатываются в своем лимите
+    и не занимают места новых.
+    """
+
+    def __init__(self, concurrency: int = HANDLER_CONCURRENCY, max_queue: int = CHAT_QUEUE_LIMIT,
+                 backlog_concurrency: int = BACKLOG_CONCURRENCY):
+        """
+        :param concurrency: Максимум одновременно обрабатываемых обновлений
+        :param max_queue: Максимальная длина очереди одного чата
+        :param backlog_concurrency: Максимум одновременно обрабатываемых обновлений из очереди перезапуска
+        """
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._backlog_semaphore = asyncio.Semaphore(backlog_concurrency)
+        self._chats: Dict[int, Deque[asyncio.Future]] = {}
+
+        self.processed = 0
+        self.dropped = 0
+        self._waits = deque(maxlen=1000)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        chat = data.get("event_chat")
+        arrived = time.monotonic()
+
+        if chat is None:
+            # Обновления без чата (например, inline-запросы) упорядочивать не нужно
+            return await self._run(handler, event, data, arrived)
+
+        queue = self._chats.setdefault(chat.id, deque())
+        if len(queue) >= self.max_queue and not data.get("backlog") and not (
+                isinstance(event, Update) and is_payment_update(event)):
+            self.dropped += 1
+            logger.warning(f"Очередь чата {chat.id} переполнена, обновление {getattr(event, 'update_id', '')} отброшено")
+            return UNHANDLED
+
+        turn = asyncio.get_running_loop().create_future()
+        queue.append(turn)
+        if len(queue) == 1:
+            turn.set_result(None)
+
+        try:
+            await turn
+            return await self._run(handler, event, data, arrived)
+        finally:
+            # Передаем очередь следующему обновлению чата (в том числе при отмене)
+            is_head = queue[0] is turn
+            queue.remove(turn)
+            if is_head and queue and not queue[0].done():
+                queue[0].set_result(None)
+            if not queue:
+                self._chats.pop(chat.id, None)
+
+    async def _run(self, handler, event: TelegramObject, data: Dict[str, Any], arrived: float) -> Any:
+        async with self._backlog_semaphore if data.get("backlog") else self._semaphore:
+            self._waits.append(time.monotonic() - arrived)
+            self.processed += 1
+            return await handler(event, data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Очереди чатов и время ожидания обновлений до начала обработки (секунды)"""
+        waits = sorted(self._waits)
+        return {
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "active_chats": len(self._chats),
+            "queued": sum(len(queue) for queue in self._chats.values()),
+            "queue_wait_p50": waits[len(waits) // 2] if waits else 0.0,
+            "queue_wait_p95": waits[int(len(waits) * 0.95)] if waits else 0.0,
+            "queue_wait_max": waits[-1] if waits else 0.0
+        }
+
+
+# Глобальный исполнитель обновлений
+chat_order_middleware = ChatOrderMiddleware()
\ No newline at end of file
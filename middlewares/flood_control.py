@@ -0,0 +1,217 @@
+# middlewares/flood_control.py
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.types import TelegramObject
+
+from config import BOT_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты исходящих запросов (меньше - важнее)
+PRIORITY_PURCHASE = 0  # Оплата и выдача eSIM
+PRIORITY_BROWSING = 1  # Каталог, профиль, вопросы
+
+# Приоритет запросов текущего обновления (или фоновой задачи)
+outbound_priority: contextvars.ContextVar[int] = contextvars.ContextVar("outbound_priority", default=PRIORITY_BROWSING)
+
+# Callback data и состояния FSM покупки
+PURCHASE_CALLBACKS = {"pay_sbp", "confirm_purchase", "show_esim_details", "cancel_purchase"}
+PURCHASE_STATES = {"BuyingStates:confirming_purchase", "BuyingStates:payment_processing"}
+
+# Ограничения Telegram: около 30 сообщений в секунду всего и около 1 в секунду в одном чате
+GLOBAL_RATE = 30.0
+CHAT_RATE = 1.0
+CHAT_BURST = 3
+
+# Сколько раз повторять запрос после ответа 429
+MAX_RETRIES = 3
+
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше burst в запасе"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Сколько ждать до появления токена"""
+        self._refill(time.monotonic())
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill(time.monotonic())
+        self.tokens -= 1
+
+    def reserve(self) -> float:
+        """Забрать токен в долг: возвращает, сколько ждать своей очереди"""
+        self.take()
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def is_full(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.burst
+
+
+class FloodControlMiddleware(BaseRequestMiddleware):
+    """
+    Планировщик исходящих запросов к Bot API
+
+    Запросы в чат (сообщения, редактирования, фото) проходят через корзину токенов
+    чата и общую корзину бота. Когда общая корзина пуста, первыми получают токены
+    запросы с более высоким приоритетом (покупка раньше каталога). На 429 запрос
+    повторяется через retry_after, а чат до этого момента не получает новых запросов.
+    Запросы без чата (answerCallbackQuery, getUpdates и т.п.) не ограничиваются.
+
+    Корзины живут в памяти процесса. Чаты распределены по воркерам по id
+    пользователя, поэтому корзина чата всегда в одном процессе, а общий лимит
+    бота делится между воркерами поровну.
+    """
+
+    def __init__(self, global_rate: float = GLOBAL_RATE, chat_rate: float = CHAT_RATE, chat_burst: int = CHAT_BURST):
+        """
+        :param global_rate: Запросов в секунду для всего бота (для процесса-воркера - его доля)
+        :param chat_rate: Запросов в секунду в одном чате
+        :param chat_burst: Сколько запросов в чат можно отправить подряд без ожидания
+        """
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: Dict[Any, TokenBucket] = {}
+        self._chat_blocked_until: Dict[Any, float] = {}
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._pump_task: Optional[asyncio.Task] = None
+
+        self.requests = 0
+        self.throttled = 0
+        self.retry_after = 0
+        self._waits = deque(maxlen=1000)
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod
+    ) -> Response:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        priority = outbound_priority.get()
+        for attempt in range(MAX_RETRIES + 1):
+            await self._acquire(chat_id, priority)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.retry_after += 1
+                self._chat_blocked_until[chat_id] = time.monotonic() + e.retry_after
+                logger.warning(f"Telegram ограничил отправку в чат {chat_id} на {e.retry_after} с ({method.__api_method__})")
+                if attempt == MAX_RETRIES:
+                    raise
+
+    async def _acquire(self, chat_id: Any, priority: int):
+        started = time.monotonic()
+        self.requests += 1
+
+        # Очередь чата: токен берется в долг, ждем своей очереди
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > 10000:
+                self._prune()
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        delay = max(bucket.reserve(), self._chat_blocked_until.get(chat_id, 0.0) - started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        # Общая очередь бота с приоритетами
+        if self._waiters or self._global.delay() > 0:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+            if self._pump_task is None or self._pump_task.done():
+                self._pump_task = asyncio.create_task(self._pump())
+            await future
+        else:
+            self._global.take()
+
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self.throttled += 1
+        self._waits.append(waited)
+
+    async def _pump(self):
+        """Выдача токенов общей корзины ожидающим запросам по приоритету"""
+        while self._waiters:
+            delay = self._global.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self._global.take()
+                future.set_result(None)
+
+    def _prune(self):
+        """Удаление корзин чатов, которые давно ничего не отправляли"""
+        now = time.monotonic()
+        for chat_id in [chat_id for chat_id, bucket in self._chats.items() if bucket.is_full()]:
+            del self._chats[chat_id]
+        for chat_id in [chat_id for chat_id, until in self._chat_blocked_until.items() if until <= now]:
+            del self._chat_blocked_until[chat_id]
+
+    def stats(self) -> Dict[str, Any]:
+        """Количество запросов, задержанных планировщиком, и время ожидания (секунды)"""
+        waits = sorted(self._waits)
+        return {
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "retry_after": self.retry_after,
+            "waiting": len(self._waiters),
+            "throttle_wait_p50": waits[len(waits) // 2] if waits else 0.0,
+            "throttle_wait_p95": waits[int(len(waits) * 0.95)] if waits else 0.0
+        }
+
+
+class PurchasePriorityMiddleware(BaseMiddleware):
+    """Повышает приоритет исходящих запросов для обновлений из процесса покупки"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        callback_query = getattr(event, "callback_query", None)
+        if data.get("raw_state") not in PURCHASE_STATES and not (
+                callback_query and callback_query.data in PURCHASE_CALLBACKS):
+            return await handler(event, data)
+
+        token = outbound_priority.set(PRIORITY_PURCHASE)
+        try:
+            return await handler(event, data)
+        finally:
+            outbound_priority.reset(token)
+
+
+# Глобальный планировщик исходящих запросов (при нескольких воркерах - доля общего лимита)
+flood_control = FloodControlMiddleware(global_rate=GLOBAL_RATE / max(BOT_WORKERS, 1))
\ No newline at end of file
@@ -0,0 +1,65 @@
+# middlewares/metrics.py
+
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.types import TelegramObject
+
+from utils.loop_monitor import loop_monitor
+from utils.metrics import MetricsRegistry, call_times, metrics
+from utils.profiler import profiler
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Время обработчиков и запросов к Bot API
+
+    Подключается внутренним middleware событий (после выбора обработчика, имя берется
+    из data["handler"]) и middleware сессии бота. Время Telegram включает ожидание
+    в планировщике flood control, если middleware сессии подключен раньше него.
+    Выполняемый обработчик отмечается для лога блокировок цикла событий, во время
+    профилирования обработанные обновления считаются для его остановки.
+    """
+
+    def __init__(self, registry: MetricsRegistry = metrics):
+        """
+        :param registry: Реестр метрик
+        """
+        self.registry = registry
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(handler_object.callback, "__name__", "unknown") if handler_object else "unknown"
+
+        update = data.get("event_update")
+        loop_monitor.track(name, update.update_id if update else None)
+
+        parts: Dict[str, float] = {}
+        token = call_times.set(parts)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.registry.observe_handler(name, time.perf_counter() - started, parts)
+            call_times.reset(token)
+            loop_monitor.untrack()
+            if profiler.active:
+                profiler.handled_update()
+
+    async def request_middleware(self, make_request: NextRequestMiddlewareType, bot: Bot,
+                                 method: TelegramMethod) -> Any:
+        """Middleware сессии: количество, ошибки и время запросов к Bot API по методам"""
+        with self.registry.outbound("telegram", method.__api_method__):
+            return await make_request(bot, method)
+
+
+# Глобальный middleware метрик
+handler_metrics = HandlerMetricsMiddleware()
\ No newline at end of file
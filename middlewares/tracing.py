@@ -0,0 +1,58 @@
+# middlewares/tracing.py
+
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from utils.tracing import Tracer, tracer
+
+
+class UpdateTracingMiddleware(BaseMiddleware):
+    """
+    Спаны трассировки обновления
+
+    Внешний middleware обновлений открывает корневой спан (вместе с ожиданием
+    в очереди чата и остальными middleware) и кладет traceId в data["trace_id"].
+    Метод handler_middleware подключается внутренним middleware событий и
+    открывает вложенный спан обработчика. Спаны запросов к Bot API и внешним
+    сервисам открывает utils.metrics.outbound.
+    """
+
+    def __init__(self, tracer: Tracer = tracer):
+        """
+        :param tracer: Трассировщик
+        """
+        self.tracer = tracer
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+        user = data.get("event_from_user")
+        with self.tracer.span("update", kind="server", update_id=event.update_id, type=event.event_type,
+                              user_id=user.id if user else None, backlog=bool(data.get("backlog"))) as span:
+            if span is not None:
+                data["trace_id"] = span.trace_id
+            return await handler(event, data)
+
+    async def handler_middleware(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        """Внутренний middleware событий: спан обработчика"""
+        handler_object = data.get("handler")
+        name = getattr(handler_object.callback, "__name__", "unknown") if handler_object else "unknown"
+        state = data.get("raw_state")
+        with self.tracer.span(f"handler {name}", handler=name, state=state):
+            return await handler(event, data)
+
+
+# Глобальный middleware трассировки
+update_tracing = UpdateTracingMiddleware()
\ No newline at end of file
@@ -0,0 +1,62 @@
+# tests/test_backlog.py
+
+from utils.backlog import BacklogReplay
+
+NOW = 1_000_000
+
+
+def message(update_id: int, chat: int, age: float, text: str = "/start"):
+    return {"update_id": update_id, "message": {"message_id": update_id, "date": int(NOW - age), "text": text,
+                                                "chat": {"id": chat, "type": "private"},
+                                                "from": {"id": chat, "is_bot": False, "first_name": "u"}}}
+
+
+def callback(update_id: int, chat: int, data: str, message_age: float = 0):
+    return {"update_id": update_id, "callback_query": {
+        "id": str(update_id), "chat_instance": "1", "data": data,
+        "from": {"id": chat, "is_bot": False, "first_name": "u"},
+        "message": {"message_id": 1, "date": int(NOW - message_age), "chat": {"id": chat, "type": "private"}}
+    }}
+
+
+def selected(replay: BacklogReplay, updates):
+    return [update["update_id"] for update in replay.select(updates, now=NOW)]
+
+
+def test_stale_updates_are_dropped_except_payment():
+    replay = BacklogReplay(max_age=60, max_updates=100, per_chat=10)
+    updates = [message(1, 1, age=600), callback(2, 1, "confirm_purchase"), message(3, 1, age=300),
+               message(4, 2, age=10)]
+    assert selected(replay, updates) == [2, 4]
+    assert replay.stale == 2
+
+
+def test_callback_age_comes_from_the_next_message():
+    replay = BacklogReplay(max_age=60, max_updates=100, per_chat=10)
+    # Нажатие перед старым сообщением тоже старое, хотя сообщение с кнопкой свежее
+    updates = [callback(1, 1, "buy_esim", message_age=0), message(2, 1, age=600), callback(3, 1, "profile")]
+    assert selected(replay, updates) == [3]
+
+
+def test_lone_callback_is_dated_by_its_message():
+    replay = BacklogReplay(max_age=60, max_updates=100, per_chat=10)
+    updates = [callback(1, 1, "buy_esim", message_age=600), callback(2, 2, "buy_esim", message_age=5)]
+    assert selected(replay, updates) == [2]
+
+
+def test_per_chat_limit_keeps_latest_and_all_payments():
+    replay = BacklogReplay(max_age=60, max_updates=100, per_chat=2)
+    updates = [callback(1, 1, "pay_sbp"), message(2, 1, 5), message(3, 1, 4), message(4, 1, 3), message(5, 2, 1)]
+    assert selected(replay, updates) == [1, 3, 4, 5]
+    assert replay.overflow == 1
+
+
+def test_total_limit_keeps_latest():
+    replay = BacklogReplay(max_age=60, max_updates=2, per_chat=10)
+    assert selected(replay, [message(1, 1, 3), message(2, 2, 2), message(3, 3, 1)]) == [2, 3]
+
+
+def test_repeated_update_ids_are_replayed_once():
+    replay = BacklogReplay(max_age=60, max_updates=100, per_chat=10)
+    assert selected(replay, [message(1, 1, 5), message(1, 1, 5), message(2, 1, 1)]) == [1, 2]
+    assert replay.duplicates == 1
\ No newline at end of file
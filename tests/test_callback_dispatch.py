@@ -0,0 +1,120 @@
+# tests/test_callback_dispatch.py
+
+import asyncio
+import itertools
+
+from aiogram import Dispatcher, F, Router
+from aiogram.dispatcher.event.bases import REJECTED, UNHANDLED, SkipHandler
+from aiogram.types import CallbackQuery
+
+from handlers import setup_routers
+from handlers.buying import BuyingStates
+from handlers.profile import ProfileStates
+from middlewares.callback_dispatch import CallbackTrieMiddleware
+
+# Callback data всех разделов бота, в том числе поврежденные и неизвестные
+CALLBACK_DATA = [
+    "buy_esim", "region_asia", "page_asia_2", "country_🇨🇳 Китай", "packages_page_CN_2", "package_3",
+    "select_days_3_7", "confirm_purchase", "pay_sbp", "cancel_purchase", "show_esim_details", "profile",
+    "profile_older_1700000000_B240101", "profile_newer_x_y", "esim_B240101", "setup", "questions", "qa_1",
+    "feedback_yes", "partner", "back_to_main", "unknown", ""
+]
+STATES = [None] + [state.state for group in (BuyingStates, ProfileStates) for state in group.__all_states__]
+
+
+def callback(data: str, n: int = 0) -> CallbackQuery:
+    return CallbackQuery.model_validate({"id": str(n), "chat_instance": "1", "data": data,
+                                         "from": {"id": 1, "is_bot": False, "first_name": "u"}})
+
+
+def label(name: str):
+    async def handler(*args, **kwargs):
+        return name
+    return handler
+
+
+def bot_dispatcher() -> Dispatcher:
+    """Роутеры бота, обработчики которых возвращают свое имя"""
+    dp = Dispatcher()
+    dp.include_router(setup_routers())
+    for router in dp.chain_tail:
+        for handler in router.callback_query.handlers:
+            handler.callback = label(f"{router.name}.{handler.callback.__name__}")
+            handler.awaitable = True
+            handler.params = set()
+            handler.varkw = True
+    return dp
+
+
+async def dispatch(dp: Dispatcher, data: str, state):
+    return await dp.propagate_event("callback_query", callback(data), raw_state=state)
+
+
+def test_trie_selects_the_same_handler_as_aiogram():
+    async def scenario():
+        dp = bot_dispatcher()
+        cases = list(itertools.product(CALLBACK_DATA, STATES))
+        expected = [await dispatch(dp, data, state) for data, state in cases]
+        trie = CallbackTrieMiddleware(dp)
+        assert trie.enabled
+        dp.callback_query.outer_middleware(trie)
+        actual = [await dispatch(dp, data, state) for data, state in cases]
+        # Каждое нажатие прошло через дерево, а не через обычный обход
+        assert trie.dispatched == len(cases)
+        return cases, expected, actual
+
+    cases, expected, actual = asyncio.run(scenario())
+    mismatches = [(case, want, got) for case, want, got in zip(cases, expected, actual) if want != got]
+    assert not mismatches
+    assert any(result is not UNHANDLED for result in expected)
+
+
+def rejecting_tree() -> Dispatcher:
+    """
+    REJECTED в роутере a отменяет его вложенный роутер, SkipHandler - только сам обработчик;
+    префикс из раньше подключенного роутера важнее точного значения из следующего
+    """
+    dp = Dispatcher()
+    first, a, nested, b = Router(name="first"), Router(name="a"), Router(name="nested"), Router(name="b")
+
+    @first.callback_query(F.data.startswith("o"))
+    async def prefix_handler(event):
+        return "prefix"
+
+    @a.callback_query(F.data.startswith("x"))
+    async def reject(event):
+        return REJECTED
+
+    @nested.callback_query(F.data == "x1")
+    async def nested_handler(event):
+        return "nested"
+
+    @b.callback_query(F.data == "x1")
+    async def skip(event):
+        raise SkipHandler()
+
+    @b.callback_query(F.data.in_(["x1", "y"]))
+    async def b_handler(event):
+        return "b"
+
+    @b.callback_query(F.data == "o1")
+    async def exact_handler(event):
+        return "exact"
+
+    a.include_router(nested)
+    dp.include_routers(first, a, b)
+    return dp
+
+
+def test_rejected_and_skipped_handlers_fall_through_like_aiogram():
+    async def scenario():
+        dp = rejecting_tree()
+        cases = ["x1", "x2", "y", "o1", "z"]
+        expected = [await dispatch(dp, data, None) for data in cases]
+        dp.callback_query.outer_middleware(CallbackTrieMiddleware(dp))
+        actual = [await dispatch(dp, data, None) for data in cases]
+        return expected, actual
+
+    expected, actual = asyncio.run(scenario())
+    assert expected == ["b", UNHANDLED, "b", "prefix", UNHANDLED]
+    assert actual == expected
\ No newline at end of file
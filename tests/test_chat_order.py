@@ -0,0 +1,92 @@
+# tests/test_chat_order.py
+
+import asyncio
+
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import Chat, Update
+
+from middlewares.chat_order import ChatOrderMiddleware
+
+
+def update(update_id: int, chat_id: int, data: str = "buy_esim") -> Update:
+    return Update.model_validate({"update_id": update_id, "callback_query": {
+        "id": str(update_id), "chat_instance": "1", "data": data,
+        "from": {"id": chat_id, "is_bot": False, "first_name": "u"}
+    }})
+
+
+def chat(chat_id: int) -> Chat:
+    return Chat(id=chat_id, type="private")
+
+
+def test_updates_of_one_chat_run_in_order_and_chats_run_in_parallel():
+    async def scenario():
+        middleware = ChatOrderMiddleware(concurrency=10, max_queue=10)
+        log = []
+
+        async def handler(event, data):
+            log.append(("start", event.update_id))
+            # Первое обновление чата 1 самое долгое
+            await asyncio.sleep(0.05 if event.update_id == 1 else 0.01)
+            log.append(("end", event.update_id))
+            return event.update_id
+
+        results = await asyncio.gather(
+            middleware(handler, update(1, 1), {"event_chat": chat(1)}),
+            middleware(handler, update(2, 1), {"event_chat": chat(1)}),
+            middleware(handler, update(3, 2), {"event_chat": chat(2)})
+        )
+        return middleware, log, results
+
+    middleware, log, results = asyncio.run(scenario())
+    assert results == [1, 2, 3]
+    # Второе обновление чата 1 начинается только после первого, чат 2 его не ждет
+    assert log.index(("start", 2)) > log.index(("end", 1))
+    assert log.index(("end", 3)) < log.index(("end", 1))
+    assert middleware.stats()["active_chats"] == 0
+
+
+def test_overflow_is_dropped_but_payment_and_backlog_are_kept():
+    async def scenario():
+        middleware = ChatOrderMiddleware(concurrency=10, max_queue=2)
+        release = asyncio.Event()
+
+        async def handler(event, data):
+            await release.wait()
+            return event.update_id
+
+        tasks = [
+            asyncio.create_task(middleware(handler, update(1, 1), {"event_chat": chat(1)})),
+            asyncio.create_task(middleware(handler, update(2, 1), {"event_chat": chat(1)})),
+            asyncio.create_task(middleware(handler, update(3, 1), {"event_chat": chat(1)})),
+            asyncio.create_task(middleware(handler, update(4, 1, "pay_sbp"), {"event_chat": chat(1)})),
+            asyncio.create_task(middleware(handler, update(5, 1), {"event_chat": chat(1), "backlog": True}))
+        ]
+        await asyncio.sleep(0.01)
+        release.set()
+        return middleware, await asyncio.gather(*tasks)
+
+    middleware, results = asyncio.run(scenario())
+    assert results == [1, 2, UNHANDLED, 4, 5]
+    assert middleware.dropped == 1
+
+
+def test_cancelled_update_passes_the_turn():
+    async def scenario():
+        middleware = ChatOrderMiddleware(concurrency=10, max_queue=10)
+        started = asyncio.Event()
+
+        async def slow(event, data):
+            started.set()
+            await asyncio.sleep(10)
+
+        async def fast(event, data):
+            return event.update_id
+
+        first = asyncio.create_task(middleware(slow, update(1, 1), {"event_chat": chat(1)}))
+        second = asyncio.create_task(middleware(fast, update(2, 1), {"event_chat": chat(1)}))
+        await started.wait()
+        first.cancel()
+        return await asyncio.wait_for(second, 1)
+
+    assert asyncio.run(scenario()) == 2
\ No newline at end of file
@@ -0,0 +1,96 @@
+# tests/test_order_journal.py
+
+import asyncio
+import os
+
+import pytest
+
+from utils.order_journal import OrderJournal, INTENT, ORDERED, FAILED, CLOSED, EXPIRED
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def write(journal: OrderJournal, *records):
+    await journal.start()
+    for kind, fields in records:
+        await journal.append(kind, **fields)
+    await journal.close()
+
+
+def test_replay_returns_only_incomplete_orders(tmp_path):
+    path = str(tmp_path / "orders.journal")
+    run(write(
+        OrderJournal(path),
+        (INTENT, {"id": "a", "user_id": 1}),
+        (INTENT, {"id": "b", "user_id": 2}),
+        (ORDERED, {"id": "b", "order_no": "B1"}),
+        (INTENT, {"id": "c", "user_id": 3}),
+        (ORDERED, {"id": "c", "order_no": "C1"}),
+        (CLOSED, {"order_no": "C1"}),
+        (INTENT, {"id": "d", "user_id": 4}),
+        (FAILED, {"id": "d"}),
+        (EXPIRED, {"order_no": "B1"}),
+        (EXPIRED, {"order_no": "B1"})
+    ))
+
+    journal = OrderJournal(path)
+    entries = {entry["id"]: entry for entry in run(_start_and_close(journal))}
+    # Заказ без номера, заказ с номером и двумя истекшими выдачами; закрытый и неудачный отброшены
+    assert entries == {
+        "a": {"id": "a", "user_id": 1},
+        "b": {"id": "b", "user_id": 2, "order_no": "B1", "expired": 2}
+    }
+
+
+def test_start_compacts_the_file(tmp_path):
+    path = str(tmp_path / "orders.journal")
+    run(write(
+        OrderJournal(path),
+        (INTENT, {"id": "a"}),
+        (INTENT, {"id": "c"}),
+        (ORDERED, {"id": "c", "order_no": "C1"}),
+        (CLOSED, {"order_no": "C1"})
+    ))
+    run(_start_and_close(OrderJournal(path)))
+
+    with open(path, encoding="utf-8") as f:
+        assert f.read().splitlines() == ['{"t":"intent","id":"a"}']
+
+
+def test_damaged_last_line_is_skipped(tmp_path):
+    path = str(tmp_path / "orders.journal")
+    run(write(OrderJournal(path), (INTENT, {"id": "a"})))
+    with open(path, "ab") as f:
+        f.write(b'{"t":"intent","id":')
+
+    assert [entry["id"] for entry in run(_start_and_close(OrderJournal(path)))] == ["a"]
+
+
+def test_journals_of_removed_workers_are_handed_over(tmp_path):
+    path = str(tmp_path / "orders.journal")
+    for index in range(3):
+        journal = OrderJournal(path, workers=3)
+        journal.set_shard(index)
+        run(write(journal, (INTENT, {"id": f"w{index}"})))
+
+    # Воркеров стало два: файл воркера 2 достается воркеру 0
+    first = OrderJournal(path, workers=2)
+    second = OrderJournal(path, workers=2)
+    second.set_shard(1)
+    assert sorted(entry["id"] for entry in run(_start_and_close(first))) == ["w0", "w2"]
+    assert [entry["id"] for entry in run(_start_and_close(second))] == ["w1"]
+    assert sorted(os.listdir(tmp_path)) == ["orders.journal", "orders.journal.1"]
+
+
+def test_append_requires_an_open_journal(tmp_path):
+    journal = OrderJournal(str(tmp_path / "orders.journal"))
+    with pytest.raises(RuntimeError):
+        run(journal.append(INTENT, id="a"))
+
+
+async def _start_and_close(journal: OrderJournal):
+    entries = await journal.start()
+    await journal.close()
+    return entries
\ No newline at end of file
@@ -140,6 +140,8 @@ QR-код для активации: {qr_code_url}
 
 Для активации отсканируйте QR-код или введите код активации в настройках вашего устройства.""",
 
+    "esim_pending": "Оплата прошла, ваша eSIM выпускается. Как только она будет готова, мы пришлём данные для установки в этот чат.",
+
     "esim_not_ready": "eSIM создается и будет готова в ближайшее время. Пожалуйста, проверьте позже в разделе 'Мои eSIM'.",
 
     "operation_cancelled": "Операция отменена. Для начала работы с ботом снова, нажмите кнопку ниже."
@@ -0,0 +1,237 @@
+# utils/analytics.py
+# Воронка покупки: события сценария покупки копятся в кольцевом буфере и пишутся пачками
+# в файлы по дням (UTC), только дописыванием
+# Свод воронки из корня проекта:
+#   python -m utils.analytics --days 7 --by region
+#   python -m utils.analytics --days 30 --by package --top 20
+
+import argparse
+import asyncio
+import glob
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from config import ANALYTICS_DIR, ANALYTICS_BUFFER_SIZE, ANALYTICS_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Шаги воронки по порядку
+EVENTS = ("region_view", "country_view", "packages_shown", "confirm", "paid", "fulfilled")
+# Первый шаг воронки при разбивке по региону, стране и тарифу
+FIRST_STEP = {"region": 0, "country": 1, "package": 3}
+
+# Событие: время, шаг, пользователь, регион, страна (код), тариф (packageCode), номер заказа
+Event = Tuple[float, str, int, str, str, str, str]
+
+
+class FunnelAnalytics:
+    """
+    События воронки покупки
+
+    emit только добавляет кортеж в кольцевой буфер - обработчики не делают
+    ввода-вывода. Фоновая задача раз в flush_interval забирает буфер и
+    дописывает события в файлы events-ГГГГММДД.tsv (по строке на событие,
+    поля через табуляцию). Если запись не успевает, буфер вытесняет самые
+    старые события, они считаются в dropped. Пустой directory выключает сбор.
+    """
+
+    def __init__(self, directory: str = ANALYTICS_DIR, buffer_size: int = ANALYTICS_BUFFER_SIZE,
+                 flush_interval: float = ANALYTICS_FLUSH_INTERVAL):
+        """
+        :param directory: Каталог файлов событий
+        :param buffer_size: Размер кольцевого буфера (событий)
+        :param flush_interval: Период записи (секунды)
+        """
+        self.directory = directory
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        # Суффикс файлов процесса (у воркера N - ".N")
+        self.suffix = ""
+
+        self._buffer: Deque[Event] = deque(maxlen=buffer_size)
+        self._flush_task: Optional[asyncio.Task] = None
+
+        self.emitted = 0
+        self.written = 0
+        self.dropped = 0
+
+    def emit(self, event: str, user_id: int, region: str = "", country: str = "", package: str = "",
+             order: str = ""):
+        """
+        Событие воронки
+
+        :param event: Шаг из EVENTS
+        :param user_id: Пользователь
+        :param region: Ключ региона
+        :param country: Код страны
+        :param package: Код тарифа
+        :param order: Номер заказа (для paid и fulfilled)
+        """
+        if not self.directory:
+            return
+        if len(self._buffer) == self.buffer_size:
+            self.dropped += 1
+        self._buffer.append((time.time(), event, user_id, region, country, package, order))
+        self.emitted += 1
+
+    # ---------- Запись ----------
+
+    def start(self):
+        """Запуск фоновой записи событий"""
+        if self.directory and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        """Остановка фоновой записи и запись оставшихся событий"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        """Запись накопленных событий одной пачкой"""
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, deque(maxlen=self.buffer_size)
+        try:
+            await asyncio.to_thread(self._write, batch)
+            self.written += len(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            logger.error(f"Ошибка записи событий аналитики: {e}")
+
+    def _write(self, batch: Deque[Event]):
+        days: Dict[str, List[str]] = {}
+        for ts, event, user_id, region, country, package, order in batch:
+            day = time.strftime("%Y%m%d", time.gmtime(ts))
+            line = f"{ts:.3f}\t{event}\t{user_id}\t{region}\t{country}\t{package}\t{order}\n"
+            days.setdefault(day, []).append(line)
+        os.makedirs(self.directory, exist_ok=True)
+        for day, lines in days.items():
+            with open(os.path.join(self.directory, f"events-{day}{self.suffix}.tsv"), "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Событий получено, записано, вытеснено и ожидает записи"""
+        return {"emitted": self.emitted, "written": self.written, "dropped": self.dropped,
+                "buffered": len(self._buffer)}
+
+
+# Глобальный сбор событий воронки
+analytics = FunnelAnalytics()
+
+
+# ---------- Свод воронки ----------
+
+def event_files(directory: str, days: int, now: Optional[float] = None) -> List[str]:
+    """Файлы событий за последние days дней (по порядку дней, все процессы)"""
+    now = time.time() if now is None else now
+    files = []
+    for back in range(days - 1, -1, -1):
+        day = time.strftime("%Y%m%d", time.gmtime(now - back * 86400))
+        files.extend(sorted(glob.glob(os.path.join(directory, f"events-{day}*.tsv"))))
+    return files
+
+
+def rollup(files: List[str], by: str = "region") -> Dict[str, List[Set[str]]]:
+    """
+    Уникальные пользователи на каждом шаге воронки по группам
+
+    Событие без региона (страны) относится к последнему региону (стране), который
+    пользователь смотрел; выдача - к группе оплаты заказа. События одного
+    пользователя лежат в одном файле дня (воркеры делят пользователей), поэтому
+    порядок файлов внутри дня не важен.
+
+    :param files: Файлы событий по порядку дней
+    :param by: Разбивка: region, country или package
+    :return: Группа -> множества пользователей по шагам EVENTS
+    """
+    first = FIRST_STEP[by]
+    steps = {event: index for index, event in enumerate(EVENTS)}
+    groups: Dict[str, List[Set[str]]] = {}
+    last_region: Dict[str, str] = {}
+    last_country: Dict[str, str] = {}
+    orders: Dict[str, str] = {}
+
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) != 7:
+                    continue
+                _, event, user, region, country, package, order = fields
+                step = steps.get(event)
+                if step is None or step < first:
+                    continue
+
+                if region:
+                    last_region[user] = region
+                if country:
+                    last_country[user] = country
+
+                if event == "fulfilled":
+                    group = orders.get(order)
+                    if group is None:
+                        continue
+                elif by == "region":
+                    group = region or last_region.get(user, "-")
+                elif by == "country":
+                    group = country or last_country.get(user, "-")
+                else:
+                    group = package or "-"
+                if event == "paid":
+                    orders[order] = group
+
+                sets = groups.get(group)
+                if sets is None:
+                    sets = groups[group] = [set() for _ in EVENTS]
+                sets[step].add(user)
+    return groups
+
+
+def format_rollup(groups: Dict[str, List[Set[str]]], by: str, top: int = 0) -> str:
+    """Таблица воронки: пользователи на шагах и конверсия в оплату"""
+    first = FIRST_STEP[by]
+    names = EVENTS[first:]
+    totals = [set() for _ in EVENTS]
+    for sets in groups.values():
+        for step, users in enumerate(sets):
+            totals[step] |= users
+
+    rows = sorted(groups.items(), key=lambda item: -len(item[1][first]))
+    if top:
+        rows = rows[:top]
+    rows.append(("ИТОГО", totals))
+
+    lines = [f"{by:<16}" + "".join(f"{name:>15}" for name in names) + f"{'в оплату':>10}"]
+    paid = EVENTS.index("paid")
+    for group, sets in rows:
+        start = len(sets[first])
+        conversion = len(sets[paid]) / start if start else 0.0
+        lines.append(f"{group[:16]:<16}" + "".join(f"{len(users):>15}" for users in sets[first:])
+                     + f"{conversion:>10.1%}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Свод воронки покупки по файлам событий")
+    parser.add_argument("--dir", default=ANALYTICS_DIR, help="Каталог файлов событий")
+    parser.add_argument("--days", type=int, default=7, help="За сколько последних дней (UTC)")
+    parser.add_argument("--by", choices=tuple(FIRST_STEP), default="region", help="Разбивка")
+    parser.add_argument("--top", type=int, default=0, help="Показать только столько групп (0 - все)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    paths = event_files(args.dir, args.days)
+    result = rollup(paths, args.by)
+    print(format_rollup(result, args.by, args.top))
+    print(f"\nФайлов: {len(paths)}, свод за {time.perf_counter() - started:.2f} с")
\ No newline at end of file
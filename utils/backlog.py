@@ -0,0 +1,217 @@
+# utils/backlog.py
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from config import BACKLOG_MAX_AGE, BACKLOG_MAX_UPDATES, CHAT_QUEUE_LIMIT
+from utils.sharding import shard_key
+
+logger = logging.getLogger(__name__)
+
+# Обновления с датой события
+DATED_EVENTS = ("message", "edited_message", "channel_post", "edited_channel_post")
+# Callback data кнопок, которыми пользователь оплачивает заказ
+PAYMENT_CALLBACKS = {"pay_sbp", "confirm_purchase"}
+
+
+def is_payment(update: Dict[str, Any]) -> bool:
+    """Обновление из оплаты: его нельзя отбрасывать, даже если оно устарело"""
+    callback_query = update.get("callback_query")
+    if callback_query:
+        return callback_query.get("data") in PAYMENT_CALLBACKS
+    if "pre_checkout_query" in update:
+        return True
+    return "successful_payment" in (update.get("message") or {})
+
+
+def is_payment_update(update: Update) -> bool:
+    """То же, что is_payment, для разобранного обновления aiogram"""
+    if update.callback_query is not None:
+        return update.callback_query.data in PAYMENT_CALLBACKS
+    if update.pre_checkout_query is not None:
+        return True
+    return update.message is not None and update.message.successful_payment is not None
+
+
+class BacklogReplay:
+    """
+    Обработка обновлений, накопившихся в Telegram за время перезапуска бота
+
+    Вместо drop_pending_updates очередь забирается при запуске и проходит правила:
+    - повтор обновления с тем же update_id отбрасывается;
+    - сообщения и нажатия старше max_age отбрасываются, кроме оплаты. У нажатия нет
+      даты, поэтому его возраст оценивается по следующему за ним сообщению, а если
+      такого нет - по дате сообщения с кнопкой;
+    - из одного чата берется не больше per_chat последних обновлений (оплата - всегда);
+    - всего обрабатывается не больше max_updates (оплата - всегда).
+    Отобранные обновления сразу встают в очереди своих чатов, раньше новых, а
+    обрабатываются в отдельном лимите исполнителя (BACKLOG_CONCURRENCY), не занимая
+    места новых обновлений, и не отбрасываются переполненной очередью чата. Оплата переживает перезапуск только с Redis: состояние
+    FSM в памяти процесса после перезапуска пусто.
+    """
+
+    def __init__(self, max_age: float = BACKLOG_MAX_AGE, max_updates: int = BACKLOG_MAX_UPDATES,
+                 per_chat: int = CHAT_QUEUE_LIMIT):
+        """
+        :param max_age: Максимальный возраст обновления (секунды)
+        :param max_updates: Максимум обрабатываемых обновлений очереди
+        :param per_chat: Максимум обновлений одного чата
+        """
+        self.max_age = max_age
+        self.max_updates = max_updates
+        self.per_chat = per_chat
+        self._task: Optional[asyncio.Task] = None
+
+        self.fetched = 0
+        self.duplicates = 0
+        self.stale = 0
+        self.overflow = 0
+        self.replayed = 0
+        self.failed = 0
+        self.seconds = 0.0
+
+    async def fetch(self, bot: Bot) -> List[Dict[str, Any]]:
+        """
+        Все обновления из очереди Telegram (очередь подтверждается)
+
+        Вебхук должен быть снят: getUpdates с ним не работает.
+        """
+        updates: List[Dict[str, Any]] = []
+        offset = None
+        while True:
+            # offset после последнего полученного: каждое обновление приходит один раз
+            batch = await bot.get_updates(offset=offset, limit=100, timeout=0)
+            if not batch:
+                break
+            self.fetched += len(batch)
+            updates.extend(update.model_dump(mode="json", by_alias=True, exclude_none=True) for update in batch)
+            offset = batch[-1].update_id + 1
+
+        if offset is not None:
+            # Подтверждаем полученное, чтобы приему новых обновлений оно не досталось повторно
+            await bot.get_updates(offset=offset, limit=1, timeout=0)
+        return updates
+
+    def select(self, updates: List[Dict[str, Any]], now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Отбор обновлений для обработки по правилам очереди
+
+        :param updates: Обновления по возрастанию update_id
+        :param now: Текущее время (Unix)
+        """
+        now = time.time() if now is None else now
+
+        # Обновление обрабатывается один раз, даже если очередь отдала его повторно
+        unique: List[Dict[str, Any]] = []
+        seen = set()
+        for update in updates:
+            if update["update_id"] in seen:
+                self.duplicates += 1
+                continue
+            seen.add(update["update_id"])
+            unique.append(update)
+        updates = unique
+
+        # Время события: дата сообщения или, для нажатий, верхняя оценка - дата следующего
+        # сообщения. Если сообщений после нажатия нет - дата сообщения с кнопкой
+        # (0 у недоступного сообщения: оно старше 48 часов)
+        times: List[Optional[int]] = [None] * len(updates)
+        later = None
+        for position in range(len(updates) - 1, -1, -1):
+            update = updates[position]
+            date = next((update[event]["date"] for event in DATED_EVENTS if event in update), None)
+            later = date if date is not None else later
+            if later is None and "callback_query" in update:
+                times[position] = (update["callback_query"].get("message") or {}).get("date")
+            else:
+                times[position] = later
+
+        fresh = []
+        for update, event_time in zip(updates, times):
+            if not is_payment(update) and event_time is not None and now - event_time > self.max_age:
+                self.stale += 1
+            else:
+                fresh.append(update)
+
+        # Из чата - последние per_chat обновлений, из всей очереди - последние max_updates
+        kept = set()
+        per_chat: Dict[int, int] = {}
+        total = 0
+        for update in reversed(fresh):
+            chat = shard_key(update)
+            if is_payment(update) or (per_chat.get(chat, 0) < self.per_chat and total < self.max_updates):
+                kept.add(update["update_id"])
+                per_chat[chat] = per_chat.get(chat, 0) + 1
+                total += 1
+            else:
+                self.overflow += 1
+        return [update for update in fresh if update["update_id"] in kept]
+
+    async def collect(self, bot: Bot) -> List[Dict[str, Any]]:
+        """Очередь Telegram после отбора (для пересылки воркерам)"""
+        updates = self.select(await self.fetch(bot))
+        self._log_selected(len(updates))
+        return updates
+
+    async def replay(self, dp: Dispatcher, bot: Bot) -> asyncio.Task:
+        """
+        Запуск обработки очереди
+
+        Обновления ставятся в очереди чатов до возврата из метода, поэтому прием
+        новых обновлений, запущенный после него, не обгонит очередь.
+
+        :return: Задача, завершающаяся после обработки всей очереди
+        """
+        updates = await self.collect(bot)
+        started = time.perf_counter()
+
+        async def feed(update: Dict[str, Any]):
+            try:
+                await dp.feed_raw_update(bot, update, backlog=True)
+                self.replayed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Ошибка обработки обновления {update['update_id']} из очереди: {e}")
+
+        tasks = [asyncio.create_task(feed(update)) for update in updates]
+
+        async def wait():
+            await asyncio.gather(*tasks)
+            self.seconds = time.perf_counter() - started
+            if tasks:
+                logger.info(
+                    f"Очередь обработана: {self.replayed} обновлений за {self.seconds:.2f} с "
+                    f"({self.replayed / self.seconds:.0f} обн/с), ошибок {self.failed}"
+                )
+
+        self._task = asyncio.create_task(wait())
+        return self._task
+
+    def _log_selected(self, count: int):
+        if self.fetched:
+            logger.info(
+                f"Очередь обновлений после перезапуска: получено {self.fetched}, к обработке {count}, "
+                f"повторов {self.duplicates}, устаревших {self.stale}, сверх лимитов {self.overflow}"
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """Результат обработки очереди при запуске"""
+        return {
+            "fetched": self.fetched,
+            "duplicates": self.duplicates,
+            "stale": self.stale,
+            "overflow": self.overflow,
+            "replayed": self.replayed,
+            "failed": self.failed,
+            "seconds": self.seconds,
+            "updates_per_second": self.replayed / self.seconds if self.seconds else 0.0
+        }
+
+
+# Глобальная обработка очереди перезапуска
+backlog_replay = BacklogReplay()
\ No newline at end of file
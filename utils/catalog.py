@@ -0,0 +1,38 @@
+# utils/catalog.py
+
+import asyncio
+import logging
+from typing import Dict, List, Any
+
+from config import ESIM_ACCESS_CODE
+from utils.esim_client import ESIMAccessClient
+from utils.shared_cache import shared_cache
+
+logger = logging.getLogger(__name__)
+
+# Время жизни списка пакетов страны в общем кэше (секунды)
+PACKAGES_TTL = 300
+
+# Создаем экземпляр клиента eSIM Access
+esim_client = ESIMAccessClient(ESIM_ACCESS_CODE)
+
+
+async def get_country_packages(country_code: str) -> List[Dict[str, Any]]:
+    """
+    Пакеты eSIM для страны через общий кэш
+
+    Список запрашивается у eSIM Access одним процессом бота и затем
+    читается из кэша всеми остальными.
+
+    :param country_code: Код страны (ISO)
+    :return: Список пакетов
+    """
+    key = f"packages:{country_code}"
+    packages = await shared_cache.get(key)
+    if packages is not None:
+        return packages
+
+    packages = await asyncio.to_thread(esim_client.get_packages_by_country, country_code)
+    if packages:
+        await shared_cache.set(key, packages, PACKAGES_TTL)
+    return packages
\ No newline at end of file
@@ -0,0 +1,135 @@
+# utils/checkout.py
+
+import asyncio
+import logging
+from typing import Dict, List, Optional, Any
+
+from config import ESIM_ACCESS_CODE
+from utils.esim_client import ESIMAccessClient
+from utils.fulfillment import fulfillment_queue
+from utils.order_journal import order_journal, INTENT, ORDERED, FAILED
+from utils.order_storage import order_repository
+
+logger = logging.getLogger(__name__)
+
+# Создаем экземпляр клиента eSIM Access
+esim_client = ESIMAccessClient(ESIM_ACCESS_CODE)
+
+
+async def _find_order(entry: Dict[str, Any]) -> Optional[str]:
+    """
+    Заказ, уже созданный по записи журнала (поиск по transactionId)
+
+    :return: Номер заказа, пустая строка - заказа нет, None - проверить не удалось
+    """
+    order_no = await asyncio.to_thread(esim_client.find_order, entry["id"])
+    if order_no is None:
+        logger.error(f"Не удалось проверить заказ {entry['id']} пользователя {entry['user_id']}, "
+                     f"запись журнала остается открытой до следующего запуска")
+        await fulfillment_queue.alert(f"Заказ {entry['id']} пользователя {entry['user_id']} не подтвержден "
+                                      f"eSIM Access, требуется ручная проверка")
+    return order_no
+
+
+async def _order(entry: Dict[str, Any], resumed: bool = False) -> Optional[str]:
+    """
+    Заказ eSIM по записи журнала с фиксацией результата
+
+    FAILED пишется, только если eSIM Access подтвердил, что заказа с этим
+    transactionId нет. Ошибка esim/order может означать и отказ из-за повторного
+    transactionId (заказ уже создан), и заказ, созданный до обрыва соединения.
+
+    :param entry: Запись намерения
+    :param resumed: Заказ после перезапуска - сначала ищется уже созданный заказ
+    """
+    order_no = None
+    if resumed:
+        order_no = await _find_order(entry)
+        if order_no is None:
+            return None
+
+    if not order_no:
+        order_no = await asyncio.to_thread(
+            esim_client.order_profile,
+            package_code=entry["package_code"],
+            price=entry["price"],
+            count=entry["count"],
+            period_num=entry["period_num"],
+            transaction_id=entry["id"]
+        )
+
+    if not order_no:
+        order_no = await _find_order(entry)
+        if order_no is None:
+            return None
+        if not order_no:
+            await order_journal.append(FAILED, id=entry["id"])
+            return None
+        logger.warning(f"Заказ {entry['id']} уже создан в eSIM Access: {order_no}")
+
+    await order_journal.append(ORDERED, id=entry["id"], order_no=order_no)
+
+    # Сохраняем заказ в профиле и запускаем фоновую выдачу eSIM
+    order_repository.save_order(entry["user_id"], order_no, entry["country"], entry["package_name"])
+    fulfillment_queue.submit(order_no, entry["chat_id"], entry["user_id"])
+    return order_no
+
+
+async def place_order(user_id: int, chat_id: int, package_code: str, price: float, count: int = 1,
+                      period_num: Optional[int] = None, country: str = "", package_name: str = "") -> Optional[str]:
+    """
+    Оформление оплаченного заказа eSIM
+
+    Намерение записывается в журнал до обращения к API, поэтому заказ, прерванный
+    сбоем, будет завершен при следующем запуске.
+
+    :param user_id: ID пользователя Telegram
+    :param chat_id: Чат для отправки данных eSIM
+    :param package_code: Код пакета
+    :param price: Цена пакета
+    :param count: Количество
+    :param period_num: Количество дней для ежедневного тарифа (опционально)
+    :param country: Название страны
+    :param package_name: Название тарифа
+    :return: Номер заказа или None в случае ошибки
+    """
+    entry = {
+        "id": ESIMAccessClient.new_transaction_id(),
+        "user_id": user_id,
+        "chat_id": chat_id,
+        "package_code": package_code,
+        "price": price,
+        "count": count,
+        "period_num": period_num,
+        "country": country,
+        "package_name": package_name
+    }
+    await order_journal.append(INTENT, **entry)
+    return await _order(entry)
+
+
+async def resume_orders(entries: List[Dict[str, Any]]):
+    """
+    Завершение заказов, прерванных перезапуском
+
+    Заказы с номером снова сохраняются и ставятся в очередь выдачи. Для заказов без
+    номера сначала ищется заказ с тем же transactionId, и только если его нет, заказ
+    отправляется повторно.
+
+    :param entries: Незавершенные заказы из журнала
+    """
+    for entry in entries:
+        order_no = entry.get("order_no")
+        if order_no:
+            if entry.get("expired"):
+                logger.warning(f"Повторяем выдачу eSIM по заказу {order_no}, "
+                               f"прошлых попыток не хватило: {entry['expired']}")
+            else:
+                logger.info(f"Возобновляем выдачу eSIM по заказу {order_no}")
+            order_repository.save_order(entry["user_id"], order_no, entry["country"], entry["package_name"])
+            fulfillment_queue.submit(order_no, entry["chat_id"], entry["user_id"])
+            continue
+
+        logger.warning(f"Повторяем заказ {entry['id']} пользователя {entry['user_id']}")
+        if not await _order(entry, resumed=True):
+            logger.error(f"Заказ {entry['id']} пользователя {entry['user_id']} не восстановлен, требуется ручная проверка")
\ No newline at end of file
@@ -1,10 +1,14 @@
 # utils/currency.py
 
+import asyncio
 import requests
 import logging
 from typing import Optional
 import time
 
+from utils.metrics import metrics
+from utils.shared_cache import shared_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -16,9 +20,19 @@ class CurrencyConverter:
         self._last_update = 0
         self._cache_duration = 300  # Кэш на 5 минут
 
+    def cached_rate(self) -> float:
+        """
+        Курс USD к RUB без обращения к API (для обработчиков)
+
+        Курс обновляет фоновая задача run_shared_sync, поэтому расчет цены
+        не ждет запроса к API и не блокирует цикл событий.
+        """
+        return self.usd_to_rub_rate
+
     def get_usd_to_rub_rate(self) -> float:
         """
-        Получение текущего курса USD к RUB с кэшированием
+        Получение текущего курса USD к RUB с кэшированием (синхронный запрос к API,
+        если кэш устарел - вызывать только из отдельного потока)
         """
         current_time = time.time()
 
@@ -30,7 +44,8 @@ class CurrencyConverter:
         try:
             # Пробуем получить курс с Rapira API (как указано в требованиях)
             url = "https://api.rapira.net/open/market/rates"
-            response = requests.get(url, timeout=5)
+            with metrics.outbound("currency", "rapira"):
+                response = requests.get(url, timeout=5)
             logger.info(f"Rapira API ответ: статус {response.status_code}")
 
             if response.status_code == 200:
@@ -80,7 +95,8 @@ class CurrencyConverter:
         # Резервный вариант - ЦБ РФ
         try:
             url = "https://www.cbr-xml-daily.ru/daily_json.js"
-            response = requests.get(url, timeout=5)
+            with metrics.outbound("currency", "cbr"):
+                response = requests.get(url, timeout=5)
 
             if response.status_code == 200:
                 data = response.json()
@@ -99,6 +115,44 @@ class CurrencyConverter:
 
         return self.usd_to_rub_rate
 
+    async def sync_shared_rate(self):
+        """
+        Обмен курсом с другими процессами бота через общий кэш
+
+        Если другой процесс уже получил свежий курс, берем его; иначе запрашиваем
+        курс сами и публикуем его для остальных.
+        """
+        shared = await shared_cache.get("usd_to_rub_rate")
+        if shared and shared["updated_at"] > self._last_update:
+            self.usd_to_rub_rate = shared["rate"]
+            self._last_update = shared["updated_at"]
+            return
+
+        if time.time() - self._last_update >= self._cache_duration:
+            await asyncio.to_thread(self.get_usd_to_rub_rate)
+            await shared_cache.set(
+                "usd_to_rub_rate",
+                {"rate": self.usd_to_rub_rate, "updated_at": self._last_update},
+                self._cache_duration
+            )
+
+    async def try_sync_shared_rate(self):
+        """sync_shared_rate с записью ошибки в лог вместо исключения"""
+        try:
+            await self.sync_shared_rate()
+        except Exception as e:
+            logger.warning(f"Ошибка синхронизации курса через общий кэш: {e}")
+
+    async def run_shared_sync(self, interval: float = 30):
+        """
+        Фоновое обновление курса, чтобы обработчики не ждали запроса к API
+
+        :param interval: Период проверки (секунды)
+        """
+        while True:
+            await self.try_sync_shared_rate()
+            await asyncio.sleep(interval)
+
     def calculate_esim_price(self, usd_price: float) -> int:
         """
         Расчет цены eSIM по формуле заказчика:
@@ -107,7 +161,7 @@ class CurrencyConverter:
         :param usd_price: Цена в долларах США
         :return: Цена в рублях (округленная)
         """
-        rapira_rate = self.get_usd_to_rub_rate()
+        rapira_rate = self.cached_rate()
 
         # Формула: (Стоимость симки * курс рапиры USDT/RUB значение HIGH * 4) + 6.5%
         step1 = usd_price * rapira_rate * 4  # Умножаем на курс и на 4
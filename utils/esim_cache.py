@@ -0,0 +1,243 @@
+# utils/esim_cache.py
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any
+
+from config import ESIM_ACCESS_CODE
+from utils.esim_client import ESIMAccessClient
+
+logger = logging.getLogger(__name__)
+
+# Поля профиля, которые не меняются после выпуска eSIM
+IMMUTABLE_FIELDS = ("iccid", "ac", "qrCodeUrl", "shortUrl", "orderNo", "esimTranNo", "smdpAddress")
+
+# Статусы, в которых eSIM еще выпускается
+PENDING_STATUSES = {"CREATE", "PAYING", "PAID", "GETTING_RESOURCE"}
+
+# Конечные статусы: дальше профиль почти не меняется
+FINAL_STATUSES = {"USED_UP", "USED_EXPIRED", "UNUSED_EXPIRED", "CANCEL", "REVOKED"}
+
+# Время жизни статуса и данных о трафике в кэше (секунды)
+PENDING_TTL = 2
+ACTIVE_TTL = 180
+FINAL_TTL = 3600
+
+# Пакетное обновление статусов: одновременных запросов и общий дедлайн (секунды)
+REFRESH_CONCURRENCY = 5
+REFRESH_TIMEOUT = 3.0
+
+
+def profile_status(profile: Dict[str, Any]) -> str:
+    """Статус профиля eSIM из ответа esim/query"""
+    return profile.get("esimStatus") or profile.get("status", "")
+
+
+class _CacheEntry:
+    __slots__ = ("profiles", "immutable", "expires_at")
+
+    def __init__(self, profiles: List[Dict[str, Any]], immutable: List[Dict[str, Any]], expires_at: float):
+        self.profiles = profiles
+        self.immutable = immutable
+        self.expires_at = expires_at
+
+
+class ESIMQueryCache:
+    """
+    Кэш результатов esim/query по номеру заказа и ICCID
+
+    Неизменяемые поля (ICCID, код активации, QR) хранятся бессрочно, статус и трафик -
+    в зависимости от статуса: секунды для выпускаемых eSIM, минуты для активных.
+    """
+
+    def __init__(self, client: ESIMAccessClient, max_entries: int = 10000):
+        """
+        :param client: Клиент API eSIM Access
+        :param max_entries: Максимальное количество заказов в кэше
+        """
+        self.client = client
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._iccid_index: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.immutable_hits = 0
+        self.misses = 0
+
+    def _ttl(self, profiles: List[Dict[str, Any]]) -> float:
+        """Время жизни записи по самому изменчивому профилю заказа"""
+        if not profiles:
+            return PENDING_TTL
+        statuses = {profile_status(p) for p in profiles}
+        if statuses & PENDING_STATUSES:
+            return PENDING_TTL
+        if statuses <= FINAL_STATUSES:
+            return FINAL_TTL
+        return ACTIVE_TTL
+
+    def _store(self, order_no: str, profiles: List[Dict[str, Any]]):
+        immutable = [
+            {field: p[field] for field in IMMUTABLE_FIELDS if p.get(field)}
+            for p in profiles
+            if p.get("iccid") and p.get("ac")
+        ]
+        with self._lock:
+            previous = self._entries.pop(order_no, None)
+            if not immutable and previous:
+                # Неизменяемые поля уже известны - не теряем их при пустом ответе
+                immutable = previous.immutable
+            self._entries[order_no] = _CacheEntry(profiles, immutable, time.monotonic() + self._ttl(profiles))
+            for item in immutable:
+                self._iccid_index[item["iccid"]] = order_no
+
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                for item in evicted.immutable:
+                    self._iccid_index.pop(item.get("iccid"), None)
+
+    def query_order(self, order_no: str, fresh_status: bool = True) -> Optional[List[Dict[str, Any]]]:
+        """
+        Профили eSIM заказа из кэша или из API
+
+        :param order_no: Номер заказа
+        :param fresh_status: Нужны ли актуальные статус и трафик. Если нет, достаточно
+            неизменяемых полей, и они берутся из кэша без срока давности
+        :return: Список eSIM профилей в заказе или None, если API не ответил
+        """
+        with self._lock:
+            entry = self._entries.get(order_no)
+            if entry is not None:
+                self._entries.move_to_end(order_no)
+                if time.monotonic() < entry.expires_at:
+                    self.hits += 1
+                    return entry.profiles
+                if not fresh_status and entry.immutable:
+                    self.immutable_hits += 1
+                    return entry.immutable
+            self.misses += 1
+
+        logger.info(f"Заказ {order_no} нет в кэше, запрашиваем esim/query")
+        return self.refresh(order_no)
+
+    def refresh(self, order_no: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Запрос профилей заказа из API в обход кэша с обновлением кэша
+
+        Неудачный запрос не попадает в кэш: прежняя запись (если была) остается.
+
+        :param order_no: Номер заказа
+        :return: Список eSIM профилей в заказе или None, если API не ответил
+        """
+        profiles = self.client.query_order(order_no)
+        if profiles is None:
+            return None
+        self._store(order_no, profiles)
+        return profiles
+
+    def peek(self, order_no: str, fresh_status: bool = True) -> Optional[List[Dict[str, Any]]]:
+        """
+        Профили заказа из кэша без обращения к API
+
+        :param order_no: Номер заказа
+        :param fresh_status: Нужны ли актуальные статус и трафик
+        :return: Список профилей из кэша или None, если подходящих данных нет
+        """
+        with self._lock:
+            entry = self._entries.get(order_no)
+            if entry is None:
+                return None
+            if time.monotonic() < entry.expires_at:
+                self.hits += 1
+                return entry.profiles
+            if not fresh_status and entry.immutable:
+                self.immutable_hits += 1
+                return entry.immutable
+        return None
+
+    async def query_orders(self, order_nos: List[str], concurrency: int = REFRESH_CONCURRENCY,
+                           timeout: float = REFRESH_TIMEOUT) -> Dict[str, Optional[List[Dict[str, Any]]]]:
+        """
+        Актуальные профили сразу для нескольких заказов
+
+        Заказы с актуальным статусом в кэше отдаются сразу, остальные запрашиваются
+        параллельно (не больше concurrency запросов одновременно). Заказы, не успевшие
+        до дедлайна, возвращаются как None - их запросы продолжаются в фоне и заполнят кэш.
+
+        :param order_nos: Номера заказов
+        :param concurrency: Максимум одновременных запросов к API
+        :param timeout: Дедлайн на весь пакет (секунды)
+        :return: Словарь номер заказа -> список профилей или None
+        """
+        results: Dict[str, Optional[List[Dict[str, Any]]]] = {}
+        missing = []
+        for order_no in dict.fromkeys(order_nos):
+            profiles = self.peek(order_no)
+            if profiles is None:
+                missing.append(order_no)
+            results[order_no] = profiles
+
+        if not missing:
+            return results
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(order_no: str):
+            async with semaphore:
+                return await asyncio.to_thread(self.query_order, order_no)
+
+        tasks = {asyncio.create_task(fetch(order_no)): order_no for order_no in missing}
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+
+        for task in done:
+            if task.exception() is None:
+                results[tasks[task]] = task.result()
+        if pending:
+            logger.warning(f"Не успели обновить статус {len(pending)} из {len(missing)} заказов за {timeout} с")
+
+        return results
+
+    def get_by_iccid(self, iccid: str, fresh_status: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Профиль eSIM по ICCID (только для заказов, которые уже есть в кэше)
+
+        :param iccid: ICCID профиля
+        :param fresh_status: Нужны ли актуальные статус и трафик
+        :return: Профиль или None
+        """
+        order_no = self._iccid_index.get(iccid)
+        if not order_no:
+            return None
+        for profile in self.query_order(order_no, fresh_status=fresh_status) or []:
+            if profile.get("iccid") == iccid:
+                return profile
+        return None
+
+    def invalidate(self, order_no: str):
+        """Сбрасывает статус заказа, сохраняя неизменяемые поля"""
+        with self._lock:
+            entry = self._entries.get(order_no)
+            if entry is not None:
+                entry.expires_at = 0
+
+    def memory_data(self) -> tuple:
+        """Записи кэша и индекс ICCID (для отчета о памяти)"""
+        return self._entries, self._iccid_index
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика попаданий в кэш"""
+        total = self.hits + self.immutable_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "immutable_hits": self.immutable_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.immutable_hits) / total if total else 0.0
+        }
+
+
+# Глобальный кэш запросов esim/query
+esim_cache = ESIMQueryCache(ESIMAccessClient(ESIM_ACCESS_CODE))
\ No newline at end of file
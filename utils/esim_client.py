@@ -1,11 +1,14 @@
 # utils/esim_client.py
 
-import requests
 import json
 import logging
 from typing import Dict, List, Optional, Any, Union
 import uuid
 
+from config import ESIM_API_URL
+from utils.esim_fixtures import create_transport
+from utils.metrics import metrics
+
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
@@ -15,13 +18,17 @@ class ESIMAccessClient:
     Класс для работы с API eSIM Access
     """
 
-    def __init__(self, access_code: str):
+    def __init__(self, access_code: str, base_url: str = ESIM_API_URL, transport: Any = None):
         """
         Инициализация клиента API eSIM Access
 
         :param access_code: Access Code для API eSIM Access
+        :param base_url: Адрес API (для нагрузочных проверок - локальная заглушка)
+        :param transport: Объект с методом post как у requests (по умолчанию - по ESIM_TRANSPORT:
+            requests, запись или воспроизведение ответов)
         """
-        self.base_url = "https://api.esimaccess.com/api/v1/open"
+        self.base_url = base_url.rstrip("/")
+        self.transport = transport if transport is not None else create_transport(access_code)
         self.headers = {
             "RT-AccessCode": access_code,
             "Content-Type": "application/json"
@@ -68,6 +75,35 @@ class ESIMAccessClient:
         # Посуточные пакеты: dataType = 2 (daily reset) или короткий период с DAY
         return data_type == 2 or (duration_unit == "DAY" and duration <= 7)
 
+    def select_country_packages(self, all_packages: List[Dict[str, Any]], country_code: str) -> List[Dict[str, Any]]:
+        """
+        Пакеты конкретной страны из ответа package/list (без региональных), посуточные первыми
+
+        :param all_packages: Пакеты из ответа API
+        :param country_code: Код страны (ISO)
+        :return: Отсортированный список пакетов страны
+        """
+        # Фильтруем только пакеты для конкретной страны
+        country_packages = []
+        for package in all_packages:
+            package_name = package.get("name", "")
+
+            # Пропускаем региональные пакеты
+            if self._is_regional_package(package_name, country_code):
+                continue
+
+            # Добавляем пакет в список
+            country_packages.append(package)
+
+        # Сортируем: сначала посуточные, потом остальные
+        country_packages.sort(key=lambda x: (
+            not self._is_daily_package(x),  # Посуточные первыми (False < True)
+            x.get("duration", 0),  # По возрастанию длительности
+            x.get("volume", 0)  # По возрастанию объема
+        ))
+
+        return country_packages
+
     def get_packages_by_country(self, country_code: str) -> List[Dict[str, Any]]:
         """
         Получение тарифов для конкретной страны с фильтрацией региональных пакетов
@@ -85,37 +121,18 @@ class ESIMAccessClient:
         }
 
         try:
-            response = requests.post(
-                endpoint,
-                headers=self.headers,
-                data=json.dumps(payload)
-            )
-            response.raise_for_status()
+            with metrics.outbound("esim", "package/list"):
+                response = self.transport.post(
+                    endpoint,
+                    headers=self.headers,
+                    data=json.dumps(payload)
+                )
+                response.raise_for_status()
             result = response.json()
 
             if result.get("success"):
                 all_packages = result.get("obj", {}).get("packageList", [])
-
-                # Фильтруем только пакеты для конкретной страны
-                country_packages = []
-                for package in all_packages:
-                    package_name = package.get("name", "")
-
-                    # Пропускаем региональные пакеты
-                    if self._is_regional_package(package_name, country_code):
-                        continue
-
-                    # Добавляем пакет в список
-                    country_packages.append(package)
-
-                # Сортируем: сначала посуточные, потом остальные
-                country_packages.sort(key=lambda x: (
-                    not self._is_daily_package(x),  # Посуточные первыми (False < True)
-                    x.get("duration", 0),  # По возрастанию длительности
-                    x.get("volume", 0)  # По возрастанию объема
-                ))
-
-                return country_packages
+                return self.select_country_packages(all_packages, country_code)
             else:
                 logger.error(f"Ошибка API: {result.get('errorMsg')}")
                 return []
@@ -123,8 +140,13 @@ class ESIMAccessClient:
             logger.error(f"Ошибка запроса: {e}")
             return []
 
-    def order_profile(self, package_code: str, price: float, count: int = 1, period_num: Optional[int] = None) -> \
-    Optional[str]:
+    @staticmethod
+    def new_transaction_id() -> str:
+        """Новый идентификатор транзакции для esim/order"""
+        return f"WWS-{uuid.uuid4().hex[:8]}"
+
+    def order_profile(self, package_code: str, price: float, count: int = 1, period_num: Optional[int] = None,
+                      transaction_id: Optional[str] = None) -> Optional[str]:
         """
         Заказ eSIM профиля
 
@@ -132,10 +154,12 @@ class ESIMAccessClient:
         :param price: Цена пакета
         :param count: Количество
         :param period_num: Количество дней для ежедневного тарифа (опционально)
+        :param transaction_id: Идентификатор транзакции; повтор с тем же идентификатором
+            не создает второй заказ (по умолчанию генерируется новый)
         :return: Номер заказа или None в случае ошибки
         """
         endpoint = f"{self.base_url}/esim/order"
-        transaction_id = f"WWS-{uuid.uuid4().hex[:8]}"
+        transaction_id = transaction_id or self.new_transaction_id()
         amount = price * count
 
         # Базовая информация о пакете
@@ -158,12 +182,13 @@ class ESIMAccessClient:
 
         try:
             logger.info(f"Ordering profile: {payload}")
-            response = requests.post(
-                endpoint,
-                headers=self.headers,
-                data=json.dumps(payload)
-            )
-            response.raise_for_status()
+            with metrics.outbound("esim", "esim/order"):
+                response = self.transport.post(
+                    endpoint,
+                    headers=self.headers,
+                    data=json.dumps(payload)
+                )
+                response.raise_for_status()
             result = response.json()
 
             if result.get("success"):
@@ -177,42 +202,114 @@ class ESIMAccessClient:
             logger.error(f"Ошибка запроса: {e}")
             return None
 
-    def query_order(self, order_no: str) -> List[Dict[str, Any]]:
+    def query_order(self, order_no: str, page_size: int = 50) -> Optional[List[Dict[str, Any]]]:
+        """
+        Запрос информации о заказе (все страницы esim/query)
+
+        :param order_no: Номер заказа
+        :param page_size: Количество профилей на странице
+        :return: Список eSIM профилей в заказе или None, если запрос любой из страниц не удался
+        """
+        esim_list = []
+        page_num = 1
+
+        while True:
+            page = self._query_page(order_no, page_num, page_size)
+            if page is None:
+                # Неполный список выдал бы выпущенную eSIM за еще не готовую
+                return None
+
+            profiles, total = page
+            esim_list.extend(profiles)
+
+            # Останавливаемся на последней странице
+            if not profiles or len(profiles) < page_size or len(esim_list) >= total:
+                break
+            page_num += 1
+
+        logger.info(f"Found {len(esim_list)} eSIM profiles for order {order_no}")
+        return esim_list
+
+    def find_order(self, transaction_id: str, page_size: int = 50, max_pages: int = 20) -> Optional[str]:
+        """
+        Поиск заказа, созданного с этим transactionId (все страницы esim/query)
+
+        Отсутствие заказа подтверждается, только если просмотрены все страницы и у
+        каждого профиля был transactionId (иначе нельзя проверить, что профиль не наш).
+
+        :param transaction_id: Идентификатор транзакции esim/order
+        :param page_size: Количество профилей на странице
+        :param max_pages: Сколько страниц просматривать, прежде чем считать результат непроверенным
+        :return: Номер заказа, пустая строка - такого заказа нет, None - запрос не удался или не проверен
+        """
+        seen = 0
+        verified = True
+        for page_num in range(1, max_pages + 1):
+            page = self._query_page("", page_num, page_size, transaction_id=transaction_id)
+            if page is None:
+                return None
+
+            profiles, total = page
+            for profile in profiles:
+                if "transactionId" not in profile:
+                    verified = False
+                elif profile["transactionId"] == transaction_id and profile.get("orderNo"):
+                    return profile["orderNo"]
+            seen += len(profiles)
+
+            if not profiles or len(profiles) < page_size or seen >= total:
+                if not verified:
+                    logger.warning(f"Отсутствие заказа {transaction_id} не проверено: в ответе нет transactionId")
+                    return None
+                return ""
+
+        logger.warning(f"Заказ {transaction_id} не найден за {max_pages} страниц esim/query, результат не проверен")
+        return None
+
+    def _query_page(self, order_no: str, page_num: int, page_size: int,
+                    transaction_id: str = "") -> Optional[tuple]:
         """
-        Запрос информации о заказе
+        Запрос одной страницы esim/query
 
         :param order_no: Номер заказа
-        :return: Список eSIM профилей в заказе
+        :param page_num: Номер страницы (с 1)
+        :param page_size: Количество профилей на странице
+        :param transaction_id: Идентификатор транзакции заказа (вместо номера заказа)
+        :return: (список профилей, всего профилей) или None в случае ошибки
         """
         endpoint = f"{self.base_url}/esim/query"
         payload = {
             "orderNo": order_no,
             "iccid": "",
             "pager": {
-                "pageNum": 1,
-                "pageSize": 10
+                "pageNum": page_num,
+                "pageSize": page_size
             }
         }
+        if transaction_id:
+            payload["transactionId"] = transaction_id
 
         try:
-            response = requests.post(
-                endpoint,
-                headers=self.headers,
-                data=json.dumps(payload)
-            )
-            response.raise_for_status()
+            with metrics.outbound("esim", "esim/query"):
+                response = self.transport.post(
+                    endpoint,
+                    headers=self.headers,
+                    data=json.dumps(payload)
+                )
+                response.raise_for_status()
             result = response.json()
 
             if result.get("success"):
-                esim_list = result.get("obj", {}).get("esimList", [])
-                logger.info(f"Found {len(esim_list)} eSIM profiles for order {order_no}")
-                return esim_list
+                obj = result.get("obj") or {}
+                esim_list = obj.get("esimList") or []
+                total = (obj.get("pager") or {}).get("total", len(esim_list))
+                return esim_list, total
             else:
                 logger.error(f"Ошибка запроса заказа: {result.get('errorMsg')} (код: {result.get('errorCode')})")
-                return []
+                return None
         except Exception as e:
             logger.error(f"Ошибка запроса: {e}")
-            return []
+            return None
 
     def cancel_profile(self, esim_tran_no: str = None, iccid: str = None) -> bool:
         """
@@ -234,12 +331,13 @@ class ESIMAccessClient:
             return False
 
         try:
-            response = requests.post(
-                endpoint,
-                headers=self.headers,
-                data=json.dumps(payload)
-            )
-            response.raise_for_status()
+            with metrics.outbound("esim", "esim/cancel"):
+                response = self.transport.post(
+                    endpoint,
+                    headers=self.headers,
+                    data=json.dumps(payload)
+                )
+                response.raise_for_status()
             result = response.json()
 
             if result.get("success"):
@@ -272,12 +370,13 @@ class ESIMAccessClient:
             return False
 
         try:
-            response = requests.post(
-                endpoint,
-                headers=self.headers,
-                data=json.dumps(payload)
-            )
-            response.raise_for_status()
+            with metrics.outbound("esim", "esim/suspend"):
+                response = self.transport.post(
+                    endpoint,
+                    headers=self.headers,
+                    data=json.dumps(payload)
+                )
+                response.raise_for_status()
             result = response.json()
 
             if result.get("success"):
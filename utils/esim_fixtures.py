@@ -0,0 +1,270 @@
+# utils/esim_fixtures.py
+# Запись и воспроизведение ответов API eSIM Access
+# Запись каталога всех стран из корня проекта:
+#   python -m utils.esim_fixtures --out data/esim_fixtures.jsonl.gz
+
+import argparse
+import atexit
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from config import ESIM_TRANSPORT, ESIM_FIXTURES_PATH, ESIM_REPLAY_SPEED
+
+logger = logging.getLogger(__name__)
+
+# Поля запроса, которые меняются от вызова к вызову и не участвуют в поиске записи
+VOLATILE_FIELDS = ("transactionId", "amount")
+# Значение, которым заменяется Access Code в записях
+SCRUBBED = "<scrubbed>"
+# Данные выданных eSIM (код активации, QR-код, номера профиля) - в записи попадают только их хэши
+SENSITIVE_FIELDS = ("ac", "qrCodeUrl", "shortUrl", "iccid", "imsi", "msisdn", "eid")
+
+
+def _endpoint(url: str) -> str:
+    """Метод API из адреса: .../api/v1/open/esim/query -> esim/query"""
+    return url.split("/open/", 1)[-1]
+
+
+def redact(value: Any) -> Any:
+    """
+    Копия запроса или ответа без данных выданных eSIM
+
+    Непустые значения SENSITIVE_FIELDS заменяются метками с хэшем значения: одна
+    и та же eSIM в разных записях получает одну метку, а готовность профиля
+    (непустой ac) сохраняется.
+    """
+    if isinstance(value, dict):
+        return {
+            key: f"<scrubbed:{hashlib.sha256(item.encode()).hexdigest()[:16]}>"
+            if key in SENSITIVE_FIELDS and isinstance(item, str) and item else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+def request_key(endpoint: str, payload: Dict[str, Any]) -> str:
+    """Ключ поиска записи: метод и запрос без меняющихся полей"""
+    stable = {key: value for key, value in payload.items() if key not in VOLATILE_FIELDS}
+    return endpoint + " " + json.dumps(stable, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+class FixtureResponse:
+    """Ответ из записи с интерфейсом requests.Response, который использует клиент"""
+
+    def __init__(self, status_code: int, payload: Any, url: str = ""):
+        self.status_code = status_code
+        self._payload = payload
+        self.url = url
+
+    def json(self) -> Any:
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} для {self.url}", response=self)
+
+
+class RecordingTransport:
+    """
+    Транспорт, который выполняет запросы и записывает пары запрос/ответ
+
+    Записи - сжатый JSON Lines: метод, запрос, код ответа, ответ и время запроса.
+    Заголовки не сохраняются, Access Code вырезается отовсюду, где встречается,
+    данные выданных eSIM заменяются метками (см. redact).
+
+    Каждая запись сжимается отдельным членом gzip и сразу сбрасывается на диск:
+    если процесс упадет, файл обрывается на последней записи, а все предыдущие
+    читаются (ReplayTransport пропускает оборванный конец).
+    """
+
+    def __init__(self, path: str, access_code: str = "", inner: Any = requests):
+        """
+        :param path: Файл записей (.jsonl.gz), дописывается
+        :param access_code: Access Code, который нужно вырезать из записей
+        :param inner: Транспорт, выполняющий запросы (по умолчанию requests)
+        """
+        self.path = path
+        self.access_code = access_code
+        self.inner = inner
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._file = None
+        atexit.register(self.close)
+
+    def post(self, url: str, headers: Optional[Dict[str, str]] = None, data: Optional[str] = None, **kwargs):
+        started = time.perf_counter()
+        response = self.inner.post(url, headers=headers, data=data, **kwargs)
+        elapsed = time.perf_counter() - started
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+
+        line = json.dumps({
+            "endpoint": _endpoint(url),
+            "request": redact(json.loads(data)) if data else {},
+            "status": response.status_code,
+            "response": redact(body),
+            "elapsed": round(elapsed, 4)
+        }, ensure_ascii=False, separators=(",", ":"))
+        if self.access_code:
+            line = line.replace(self.access_code, SCRUBBED)
+
+        member = gzip.compress((line + "\n").encode("utf-8"))
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "ab")
+            self._file.write(member)
+            self._file.flush()
+            self.recorded += 1
+        return response
+
+    def close(self):
+        """Закрытие файла записей"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class ReplayTransport:
+    """
+    Транспорт, который отвечает записанными ответами без обращения к сети
+
+    Запись ищется по методу и запросу без меняющихся полей (transactionId).
+    Если на один запрос записано несколько ответов (опрос статуса заказа),
+    они выдаются по очереди, последний повторяется. Неизвестный запрос
+    получает ответ с ошибкой, как от API.
+    """
+
+    def __init__(self, path: str, speed: float = ESIM_REPLAY_SPEED):
+        """
+        :param path: Файл записей (.jsonl.gz или .jsonl)
+        :param speed: Множитель времени ответа: 1 - как при записи, 0 - без задержки
+        """
+        self.path = path
+        self.speed = speed
+        self.served = 0
+        self.missed = 0
+        self._lock = threading.Lock()
+        self._records: Dict[str, List[Dict[str, Any]]] = {}
+        self._positions: Dict[str, int] = {}
+
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Пропущена поврежденная запись eSIM Access: {line[:100]!r}")
+                        continue
+                    self._records.setdefault(request_key(record["endpoint"], record["request"]), []).append(record)
+            except (EOFError, gzip.BadGzipFile):
+                # Запись оборвалась (процесс упал во время записи) - используем то, что прочитано
+                logger.warning(f"Файл записей {path} оборван, загружены записи до обрыва")
+        logger.info(f"Загружено записей eSIM Access: {sum(len(r) for r in self._records.values())} из {path}")
+
+    def post(self, url: str, headers: Optional[Dict[str, str]] = None, data: Optional[str] = None, **kwargs):
+        endpoint = _endpoint(url)
+        # Запрос приводится к виду записи: ICCID в нем тоже заменен меткой
+        key = request_key(endpoint, redact(json.loads(data)) if data else {})
+        with self._lock:
+            records = self._records.get(key)
+            if not records:
+                self.missed += 1
+                record = None
+            else:
+                position = self._positions.get(key, 0)
+                self._positions[key] = position + 1
+                record = records[min(position, len(records) - 1)]
+                self.served += 1
+
+        if record is None:
+            logger.warning(f"Нет записи для запроса {key[:200]}")
+            return FixtureResponse(200, {"success": False, "errorCode": "REPLAY_MISS",
+                                         "errorMsg": "Запрос не записан"}, url)
+        if self.speed:
+            time.sleep(record["elapsed"] * self.speed)
+        return FixtureResponse(record["status"], record["response"], url)
+
+    def endpoints(self) -> Dict[str, int]:
+        """Количество записей по методам"""
+        counts: Dict[str, int] = {}
+        for key, records in self._records.items():
+            endpoint = key.split(" ", 1)[0]
+            counts[endpoint] = counts.get(endpoint, 0) + len(records)
+        return counts
+
+    def packages(self, country_code: str) -> Optional[List[Dict[str, Any]]]:
+        """Записанный ответ package/list страны (список пакетов до фильтрации)"""
+        for record in self._records.get(request_key("package/list", _package_list_payload(country_code)), []):
+            return (record["response"] or {}).get("obj", {}).get("packageList", [])
+        return None
+
+
+def _package_list_payload(country_code: str) -> Dict[str, Any]:
+    # Тот же запрос, что отправляет ESIMAccessClient.get_packages_by_country
+    return {"locationCode": country_code, "type": "", "packageCode": "", "slug": "", "iccid": ""}
+
+
+# Транспорты записи и воспроизведения, общие для всех клиентов процесса: (режим, файл) -> транспорт
+_transports: Dict[Tuple[str, str], Any] = {}
+
+
+def create_transport(access_code: str, mode: str = ESIM_TRANSPORT, path: str = ESIM_FIXTURES_PATH) -> Any:
+    """
+    Транспорт клиента eSIM Access по настройке ESIM_TRANSPORT
+
+    :param access_code: Access Code (вырезается из записей)
+    :param mode: "live" - запросы к API, "record" - запросы с записью, "replay" - ответы из записи
+    :param path: Файл записей
+    """
+    if mode not in ("record", "replay"):
+        return requests
+    transport = _transports.get((mode, path))
+    if transport is None:
+        transport = RecordingTransport(path, access_code) if mode == "record" else ReplayTransport(path)
+        _transports[(mode, path)] = transport
+    return transport
+
+
+def record_catalog(out: str, countries: List[Tuple[str, str]]):
+    """Запись package/list всех стран каталога"""
+    from config import ESIM_ACCESS_CODE
+    from utils.esim_client import ESIMAccessClient
+
+    transport = RecordingTransport(out, ESIM_ACCESS_CODE)
+    client = ESIMAccessClient(ESIM_ACCESS_CODE, transport=transport)
+    for name, code in countries:
+        packages = client.get_packages_by_country(code)
+        print(f"{code} ({name}): {len(packages)} пакетов страны")
+    transport.close()
+    print(f"Записано ответов: {transport.recorded} в {out}")
+
+
+if __name__ == "__main__":
+    from config import COUNTRY_CODES
+
+    parser = argparse.ArgumentParser(description="Запись ответов package/list eSIM Access для всех стран")
+    parser.add_argument("--out", default=ESIM_FIXTURES_PATH, help="Файл записей (.jsonl.gz)")
+    parser.add_argument("--countries", nargs="*", help="Коды стран (по умолчанию все из COUNTRY_CODES)")
+    args = parser.parse_args()
+
+    # Одна страна может встречаться под несколькими названиями - пишем ее один раз
+    unique = {}
+    for country_name, country_code in COUNTRY_CODES.items():
+        if not args.countries or country_code in args.countries:
+            unique.setdefault(country_code, country_name)
+    record_catalog(args.out, [(name, code) for code, name in unique.items()])
\ No newline at end of file
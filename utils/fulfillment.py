@@ -0,0 +1,205 @@
+# utils/fulfillment.py
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Dict, List, Optional, Any
+
+from aiogram import Bot
+
+from config import ADMIN_IDS
+from keyboards.inline import get_back_to_main_keyboard
+from middlewares.flood_control import outbound_priority, PRIORITY_PURCHASE
+from texts import TEXTS
+from utils.analytics import analytics
+from utils.esim_cache import esim_cache
+from utils.order_journal import order_journal, CLOSED, EXPIRED
+from utils.order_storage import order_repository
+
+logger = logging.getLogger(__name__)
+
+
+def get_ready_profile(profiles: Optional[List[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """Первый профиль заказа, для которого уже выдан код активации"""
+    for profile in profiles or []:
+        if profile.get("ac"):
+            return profile
+    return None
+
+
+def format_esim_details(profile: Dict[str, Any]) -> str:
+    """Текст с данными для установки eSIM"""
+    return TEXTS["esim_details"].format(
+        iccid=profile.get("iccid", ""),
+        ac=profile.get("ac", ""),
+        qr_code_url=profile.get("qrCodeUrl", "")
+    )
+
+
+class FulfillmentQueue:
+    """
+    Фоновая выдача eSIM после оплаты
+
+    Для каждого заказа запускается задача, которая опрашивает esim/query с
+    экспоненциальной задержкой и случайным разбросом, а когда eSIM готова -
+    сама отправляет пользователю данные для установки. Общее количество
+    одновременных запросов к API ограничено. Заказ, не выпущенный за deadline,
+    остается в журнале открытым (EXPIRED) и снова ставится в очередь при
+    следующем запуске; администраторы получают уведомление. Так же остается
+    открытым заказ, данные которого Telegram не принял за send_attempts попыток.
+    """
+
+    def __init__(self, concurrency: int = 10, base_delay: float = 2.0, max_delay: float = 60.0,
+                 deadline: float = 1800.0, send_attempts: int = 3):
+        """
+        :param concurrency: Максимум одновременных запросов esim/query
+        :param base_delay: Задержка перед первой проверкой (секунды)
+        :param max_delay: Максимальная задержка между проверками (секунды)
+        :param deadline: Сколько ждать выпуска eSIM, прежде чем сдаться (секунды)
+        :param send_attempts: Попыток отправить пользователю готовые данные eSIM
+        """
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.send_attempts = send_attempts
+
+        self._bot: Optional[Bot] = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._jobs: Dict[str, asyncio.Task] = {}
+
+        self.fulfilled = 0
+        self.expired = 0
+        self.undelivered = 0
+        self._fulfil_times = deque(maxlen=1000)
+
+    def start(self, bot: Bot):
+        """Запуск очереди: бот нужен для отправки готовых eSIM"""
+        self._bot = bot
+
+    async def close(self):
+        """Остановка всех задач выдачи"""
+        jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+        self._jobs.clear()
+
+    async def wait(self, timeout: float):
+        """Ожидание задач выдачи, уже стоящих в очереди (не дольше timeout секунд)"""
+        jobs = list(self._jobs.values())
+        if jobs:
+            await asyncio.wait(jobs, timeout=timeout)
+
+    def submit(self, order_no: str, chat_id: int, user_id: int) -> bool:
+        """
+        Поставить заказ в очередь выдачи
+
+        :param order_no: Номер заказа eSIM Access
+        :param chat_id: Чат, в который отправить данные eSIM
+        :param user_id: Покупатель (для аналитики воронки)
+        :return: False, если заказ уже в очереди
+        """
+        if order_no in self._jobs:
+            return False
+
+        job = asyncio.create_task(self._fulfil(order_no, chat_id, user_id))
+        self._jobs[order_no] = job
+        job.add_done_callback(lambda done: self._job_done(order_no, done))
+        return True
+
+    def _job_done(self, order_no: str, job: asyncio.Task):
+        self._jobs.pop(order_no, None)
+        if not job.cancelled() and job.exception() is not None:
+            logger.error(f"Ошибка выдачи eSIM по заказу {order_no}", exc_info=job.exception())
+
+    def _delay(self, attempt: int) -> float:
+        """Экспоненциальная задержка с разбросом (половина фиксирована, половина случайна)"""
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def _fulfil(self, order_no: str, chat_id: int, user_id: int):
+        # Данные eSIM отправляются в первую очередь, даже если бот упирается в лимиты Telegram
+        outbound_priority.set(PRIORITY_PURCHASE)
+        started = time.monotonic()
+        attempt = 0
+
+        while time.monotonic() - started < self.deadline:
+            await asyncio.sleep(self._delay(attempt))
+            attempt += 1
+
+            async with self._semaphore:
+                profiles = await asyncio.to_thread(esim_cache.refresh, order_no)
+
+            profile = get_ready_profile(profiles)
+            if profile is None:
+                continue
+
+            elapsed = time.monotonic() - started
+            self.fulfilled += 1
+            self._fulfil_times.append(elapsed)
+            logger.info(f"eSIM по заказу {order_no} готова через {elapsed:.1f} с ({attempt} проверок)")
+
+            order_repository.set_iccid(order_no, profile.get("iccid", ""))
+            # Выдача закрывается в журнале только после того, как Telegram принял сообщение
+            for send_attempt in range(self.send_attempts):
+                if send_attempt:
+                    await asyncio.sleep(self._delay(send_attempt))
+                if await self._send(chat_id, format_esim_details(profile)):
+                    analytics.emit("fulfilled", user_id, order=order_no)
+                    await order_journal.append(CLOSED, order_no=order_no)
+                    return
+
+            # Запись журнала остается открытой: данные отправятся снова после перезапуска
+            self.undelivered += 1
+            await self.alert(f"eSIM по заказу {order_no} готова, но данные не доставлены в чат {chat_id} "
+                             f"за {self.send_attempts} попыток, отправка повторится после перезапуска")
+            return
+
+        # Заказ оплачен, но eSIM не выпущена: запись журнала остается открытой,
+        # чтобы выдача повторилась после перезапуска
+        self.expired += 1
+        logger.error(f"eSIM по заказу {order_no} не выпущена за {self.deadline:.0f} с")
+        await self._send(chat_id, TEXTS["esim_not_ready"])
+        await order_journal.append(EXPIRED, order_no=order_no)
+        await self.alert(f"eSIM по оплаченному заказу {order_no} не выпущена за {self.deadline:.0f} с, "
+                         f"выдача повторится после перезапуска")
+
+    async def alert(self, text: str):
+        """Уведомление администраторов о заказе, требующем внимания"""
+        for admin_id in ADMIN_IDS:
+            try:
+                await self._bot.send_message(chat_id=admin_id, text=text)
+            except Exception as e:
+                logger.error(f"Не удалось отправить уведомление администратору {admin_id}: {e}")
+
+    async def _send(self, chat_id: int, text: str) -> bool:
+        """Отправка пользователю; False - Telegram не принял сообщение"""
+        try:
+            await self._bot.send_message(
+                chat_id=chat_id,
+                text=text,
+                reply_markup=get_back_to_main_keyboard(),
+                disable_web_page_preview=False  # Показываем QR-код, если URL указывает на изображение
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Не удалось отправить данные eSIM в чат {chat_id}: {e}")
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Глубина очереди и время выдачи eSIM"""
+        times = sorted(self._fulfil_times)
+        return {
+            "queue_depth": len(self._jobs),
+            "fulfilled": self.fulfilled,
+            "expired": self.expired,
+            "undelivered": self.undelivered,
+            "time_to_fulfil_p50": times[len(times) // 2] if times else 0.0,
+            "time_to_fulfil_p95": times[int(len(times) * 0.95)] if times else 0.0
+        }
+
+
+# Глобальная очередь выдачи eSIM
+fulfillment_queue = FulfillmentQueue()
\ No newline at end of file
@@ -0,0 +1,117 @@
+# utils/loop_monitor.py
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Dict, Optional, Tuple
+
+from config import LOOP_STALL_THRESHOLD, LOOP_MONITOR_INTERVAL
+from utils.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы задержки цикла событий (секунды)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Сколько верхних кадров стека писать в лог (нижние - цепочка middleware aiogram)
+STACK_DEPTH = 20
+
+
+class LoopStallDetector:
+    """
+    Обнаружение блокировок цикла событий
+
+    Корутина просыпается каждые interval секунд и записывает задержку пробуждения в
+    гистограмму loop_lag_seconds. Отдельный поток следит за последним пробуждением:
+    если цикл не просыпался дольше threshold, он снимает стек потока цикла событий
+    (там видна блокирующая функция, например requests.post) и пишет его в лог вместе
+    с обработчиком и update_id задачи, выполнявшейся в этот момент. Поток только
+    читает метку времени, стек снимается лишь при блокировке.
+    """
+
+    def __init__(self, threshold: float = LOOP_STALL_THRESHOLD, interval: float = LOOP_MONITOR_INTERVAL,
+                 registry: MetricsRegistry = metrics):
+        """
+        :param threshold: Блокировка дольше стольких секунд попадает в лог со стеком
+        :param interval: Период проверки (секунды)
+        :param registry: Реестр метрик для гистограммы задержки
+        """
+        self.threshold = threshold
+        self.interval = interval
+        self.registry = registry
+        # Задачи, выполняющие обработчик: задача -> (имя обработчика, update_id)
+        self.running: Dict[asyncio.Task, Tuple[str, Optional[int]]] = {}
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._beat = 0.0
+        self._reported = 0.0
+        self._stop = threading.Event()
+
+        self.stalls = 0
+        self.max_lag = 0.0
+
+    def track(self, handler: str, update_id: Optional[int]):
+        """Текущая задача выполняет обработчик (для лога блокировки)"""
+        task = asyncio.current_task()
+        if task is not None:
+            self.running[task] = (handler, update_id)
+
+    def untrack(self):
+        """Обработчик текущей задачи завершен"""
+        self.running.pop(asyncio.current_task(), None)
+
+    async def run(self):
+        """Отслеживание задержки цикла событий (до отмены задачи)"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        watchdog = threading.Thread(target=self._watch, name="loop-stall-watchdog", daemon=True)
+        watchdog.start()
+        try:
+            while True:
+                expected = time.monotonic() + self.interval
+                await asyncio.sleep(self.interval)
+                self._beat = time.monotonic()
+                lag = max(0.0, self._beat - expected)
+                self.registry.histogram(
+                    "loop_lag_seconds", "Задержка пробуждения цикла событий", lag, LAG_BUCKETS
+                )
+                self.max_lag = max(self.max_lag, lag)
+                if lag > self.threshold:
+                    logger.warning(f"Цикл событий был заблокирован {lag:.2f} с")
+        finally:
+            self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            stalled = time.monotonic() - beat
+            if stalled > self.threshold and beat != self._reported:
+                # Одна запись на блокировку
+                self._reported = beat
+                self.stalls += 1
+                self._report(stalled)
+
+    def _report(self, stalled: float):
+        frame = sys._current_frames().get(self._loop_thread)
+        stack = "".join(traceback.format_stack(frame, STACK_DEPTH)) if frame is not None else "стек недоступен\n"
+
+        handler, update_id = None, None
+        task = asyncio.current_task(self._loop)
+        if task is not None:
+            handler, update_id = self.running.get(task, (None, None))
+        where = f"обработчик {handler}, update_id {update_id}" if handler else f"задача {task.get_name() if task else '-'}"
+
+        logger.warning(f"Цикл событий заблокирован уже {stalled:.2f} с ({where}):\n{stack.rstrip()}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Количество блокировок дольше порога и максимальная задержка цикла (секунды)"""
+        return {"stalls": self.stalls, "max_lag": self.max_lag, "handlers_running": len(self.running)}
+
+
+# Глобальный детектор блокировок цикла событий
+loop_monitor = LoopStallDetector()
\ No newline at end of file
@@ -0,0 +1,168 @@
+# utils/media_cache.py
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+from aiogram import Bot
+from aiogram.types import FSInputFile, Message
+
+from config import MEDIA_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class MediaCache:
+    """
+    Кэш file_id изображений, уже загруженных в Telegram
+
+    После первой загрузки файла Telegram возвращает file_id, по которому то же
+    изображение можно отправлять без повторной загрузки. Ключ кэша - SHA-256
+    содержимого файла, поэтому замена картинки автоматически дает новую загрузку.
+    file_id действителен только для бота, который его получил. Хэш файла
+    (при первом обращении или после изменения файла) и запись кэша на диск
+    выполняются в отдельном потоке.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: Путь к JSON-файлу кэша
+        """
+        self.path = path
+        self._bot_id: Optional[int] = None
+        self._file_ids: Dict[str, str] = {}
+        # Хэши файлов: путь -> (время изменения, размер, SHA-256), чтобы не читать файл на каждый клик
+        self._digests: Dict[str, Tuple[int, int, str]] = {}
+        # Одна запись файла кэша за раз
+        self._save_lock = asyncio.Lock()
+
+        self.hits = 0
+        self.uploads = 0
+
+    async def _digest(self, image_path: str) -> str:
+        stat = os.stat(image_path)
+        cached = self._digests.get(image_path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+
+        digest = await asyncio.to_thread(_hash_file, image_path)
+        self._digests[image_path] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def load(self, bot_id: int):
+        """
+        Чтение кэша из файла (до первой отправки изображений)
+
+        :param bot_id: ID бота - file_id из файла берутся, только если их получил этот бот
+        """
+        self._bot_id = bot_id
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать кэш изображений: {e}")
+            return
+        if data.get("bot_id") == bot_id:
+            self._file_ids = data.get("file_ids", {})
+
+    async def _save(self):
+        if self._bot_id is None:
+            # Кэш еще не загружен: запись затерла бы file_id из файла
+            return
+        async with self._save_lock:
+            try:
+                await asyncio.to_thread(self._write, {"bot_id": self._bot_id, "file_ids": dict(self._file_ids)})
+            except OSError as e:
+                logger.warning(f"Не удалось сохранить кэш изображений: {e}")
+
+    def _write(self, data: Dict[str, object]):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Файл общий для процессов-воркеров: у каждого свой временный файл
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    async def photo(self, image_path: str) -> Union[str, FSInputFile]:
+        """
+        Фото для отправки: file_id, если изображение уже загружено, иначе файл
+
+        :param image_path: Путь к изображению
+        """
+        file_id = self._file_ids.get(await self._digest(image_path))
+        if file_id:
+            self.hits += 1
+            return file_id
+        return FSInputFile(image_path)
+
+    async def remember(self, image_path: str, message: Union[Message, bool, None]):
+        """
+        Запоминает file_id из ответа Telegram на отправку или замену фото
+
+        :param image_path: Путь к отправленному изображению
+        :param message: Сообщение, которое вернул Telegram
+        """
+        if not isinstance(message, Message) or not message.photo:
+            return
+        digest = await self._digest(image_path)
+        file_id = message.photo[-1].file_id
+        if self._file_ids.get(digest) == file_id:
+            return
+
+        self._file_ids[digest] = file_id
+        self.uploads += 1
+        await self._save()
+
+    def memory_data(self) -> tuple:
+        """file_id и хэши файлов (для отчета о памяти)"""
+        return self._file_ids, self._digests
+
+    async def forget(self, image_path: str, error: Exception):
+        """
+        Забывает file_id изображения, если Telegram его не принял
+
+        :param image_path: Путь к изображению
+        :param error: Ошибка отправки (остальные ошибки, например «message is not modified», file_id не касаются)
+        """
+        if "file" not in str(error).lower():
+            return
+        if self._file_ids.pop(await self._digest(image_path), None):
+            await self._save()
+
+    async def start(self, bot: Bot, admin_chat_id: int, image_paths: Iterable[str]):
+        """
+        Предварительная загрузка изображений в чат администратора (кэш уже прочитан load)
+
+        :param bot: Бот
+        :param admin_chat_id: Чат для загрузки (0 - не загружать заранее)
+        :param image_paths: Изображения, которые нужно загрузить
+        """
+        if not admin_chat_id:
+            return
+
+        for image_path in dict.fromkeys(image_paths):
+            if not os.path.exists(image_path) or await self._digest(image_path) in self._file_ids:
+                continue
+            try:
+                message = await bot.send_photo(chat_id=admin_chat_id, photo=FSInputFile(image_path))
+                await self.remember(image_path, message)
+                await bot.delete_message(chat_id=admin_chat_id, message_id=message.message_id)
+                logger.info(f"Изображение {image_path} загружено в Telegram заранее")
+            except Exception as e:
+                logger.warning(f"Не удалось заранее загрузить {image_path}: {e}")
+
+
+def _hash_file(image_path: str) -> str:
+    with open(image_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+# Глобальный кэш изображений
+media_cache = MediaCache(MEDIA_CACHE_PATH)
\ No newline at end of file
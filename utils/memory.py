@@ -0,0 +1,265 @@
+# utils/memory.py
+
+import asyncio
+import gc
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from config import MEMORY_SAMPLE_LIMIT, MEMORY_STATS_INTERVAL, MEMORY_TRACE_FRAMES, MEMORY_TOP
+
+logger = logging.getLogger(__name__)
+
+# Объекты, которые не считаются частью данных: код, модули и классы общие для всего процесса
+SHARED_TYPES = (type, ModuleType, FunctionType, BuiltinFunctionType, MethodType)
+
+
+def deep_size(obj: Any, seen: Set[int]) -> int:
+    """
+    Размер объекта вместе со всем, на что он ссылается (байты)
+
+    :param obj: Объект
+    :param seen: id уже посчитанных объектов - общая память засчитывается один раз
+    """
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, SHARED_TYPES):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        stack.extend(gc.get_referents(item))
+    return total
+
+
+def rss_bytes() -> int:
+    """Резидентная память процесса (байты, 0 - недоступно на этой платформе)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError, IndexError):
+        return 0
+
+
+def _mb(size: float) -> str:
+    return f"{size / 1048576:.1f} МБ" if size >= 1048576 else f"{size / 1024:.1f} КБ"
+
+
+class MemoryInspector:
+    """
+    Разбор памяти процесса по подсистемам
+
+    Компоненты (кэши, буферы) регистрируются функцией, возвращающей их данные.
+    Размер считается обходом ссылок с общим множеством посчитанных объектов:
+    сначала кэши, потом FSM, поэтому в FSM попадает только то, что держит
+    лишь она (например, список пакетов, уже вытесненный из кэша). Записи FSM
+    в памяти процесса разбираются по состояниям и ключам данных; если записей
+    больше sample_limit, считается случайная выборка и результат масштабируется.
+
+    Замер долгий (обход всех данных), поэтому он не выполняется в цикле событий:
+    /memory вызывает report в отдельном потоке, а для /metrics фоновая задача
+    раз в stats_interval замеряет память в потоке, и stats() отдает последний замер.
+
+    Режим tracemalloc: start_tracing запоминает снимок, diff показывает рост
+    по строкам кода относительно предыдущего снимка.
+    """
+
+    def __init__(self, sample_limit: int = MEMORY_SAMPLE_LIMIT, stats_interval: float = MEMORY_STATS_INTERVAL,
+                 top: int = MEMORY_TOP):
+        """
+        :param sample_limit: Максимум записей FSM, размер которых считается
+        :param stats_interval: Период фонового замера для stats() (секунды, 0 - не замерять)
+        :param top: Строк в списках крупнейших пользователей и роста памяти
+        """
+        self.sample_limit = sample_limit
+        self.stats_interval = stats_interval
+        self.top = top
+        self.storage: Optional[BaseStorage] = None
+        self._components: Dict[str, Callable[[], Any]] = {}
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._last: Optional[Dict[str, Any]] = None
+        self._measure_task: Optional[asyncio.Task] = None
+
+    def register(self, component: str, data: Callable[[], Any]):
+        """
+        Компонент в отчете
+
+        :param component: Имя компонента
+        :param data: Функция без аргументов, возвращающая данные компонента (словарь или кортеж словарей)
+        """
+        self._components[component] = data
+
+    def measure(self) -> Dict[str, Any]:
+        """Замер: память процесса, компоненты и FSM (долгий - вызывать в отдельном потоке)"""
+        started = time.perf_counter()
+        seen: Set[int] = set()
+        components = {}
+        for name, data in self._components.items():
+            value = data()
+            parts = value if isinstance(value, tuple) else (value,)
+            components[name] = (sum(len(part) for part in parts), deep_size(value, seen))
+
+        fsm = self._measure_fsm(seen)
+        self._last = {
+            "rss": rss_bytes(),
+            "gc_objects": len(gc.get_objects()),
+            "components": components,
+            "fsm": fsm,
+            "seconds": time.perf_counter() - started
+        }
+        return self._last
+
+    def _measure_fsm(self, seen: Set[int]) -> Optional[Dict[str, Any]]:
+        if not isinstance(self.storage, MemoryStorage):
+            return None
+        records = list(self.storage.storage.items())
+        sample = records if len(records) <= self.sample_limit else random.sample(records, self.sample_limit)
+        scale = len(records) / len(sample) if sample else 1.0
+
+        states: Dict[str, List[int]] = {}
+        keys: Dict[str, int] = {}
+        users: List[Tuple[int, int, str]] = []
+        for storage_key, record in sample:
+            state = record.state or "-"
+            size = sys.getsizeof(record)
+            # Копия: замер идет в отдельном потоке, пока обработчики меняют данные
+            for key, value in list(record.data.items()):
+                key_size = deep_size(value, seen)
+                keys[key] = keys.get(key, 0) + key_size
+                size += key_size
+            count_size = states.setdefault(state, [0, 0])
+            count_size[0] += 1
+            count_size[1] += size
+            users.append((size, storage_key.user_id, state))
+        users.sort(reverse=True)
+
+        return {
+            "entries": len(records),
+            "sampled": len(sample),
+            "bytes": int(sum(size for _, size in states.values()) * scale),
+            "states": {state: (int(count * scale), int(size * scale)) for state, (count, size) in states.items()},
+            "keys": {key: int(size * scale) for key, size in keys.items()},
+            "largest": users[:self.top]
+        }
+
+    def report(self) -> str:
+        """Текстовый отчет по памяти процесса"""
+        data = self.measure()
+        lines = [f"Память процесса: {_mb(data['rss']) if data['rss'] else 'н/д'}, "
+                 f"объектов gc: {data['gc_objects']}, замер {data['seconds']:.2f} с"]
+
+        lines.append(f"\n{'компонент':<24}{'записей':>9}{'размер':>12}")
+        for name, (entries, size) in sorted(data["components"].items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:<24}{entries:>9}{_mb(size):>12}")
+
+        fsm = data["fsm"]
+        if fsm is None:
+            lines.append("\nFSM: хранилище не в памяти процесса")
+            return "\n".join(lines)
+
+        sampled = f", оценка по {fsm['sampled']}" if fsm["sampled"] < fsm["entries"] else ""
+        lines.append(f"\nFSM: записей {fsm['entries']}, {_mb(fsm['bytes'])}{sampled}")
+        lines.append(f"{'состояние':<36}{'записей':>9}{'на запись':>12}{'всего':>12}")
+        for state, (count, size) in sorted(fsm["states"].items(), key=lambda item: -item[1][1]):
+            lines.append(f"{state[-36:]:<36}{count:>9}{_mb(size / max(count, 1)):>12}{_mb(size):>12}")
+        lines.append("Ключи данных: " + ", ".join(
+            f"{key} {_mb(size)}" for key, size in sorted(fsm["keys"].items(), key=lambda item: -item[1])
+        ))
+        lines.append("Крупнейшие пользователи: " + ", ".join(
+            f"{user_id} {_mb(size)} ({state.rsplit(':', 1)[-1]})" for size, user_id, state in fsm["largest"]
+        ))
+        return "\n".join(lines)
+
+    # ---------- tracemalloc ----------
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start_tracing(self):
+        """Включение tracemalloc и первый снимок"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(MEMORY_TRACE_FRAMES)
+        self._snapshot = self._take_snapshot()
+        logger.info("tracemalloc включен")
+
+    def diff(self) -> str:
+        """Рост памяти по строкам кода с прошлого снимка; текущий снимок становится точкой отсчета"""
+        if not tracemalloc.is_tracing() or self._snapshot is None:
+            raise RuntimeError("tracemalloc не включен")
+        snapshot = self._take_snapshot()
+        changes = snapshot.compare_to(self._snapshot, "lineno")
+        self._snapshot = snapshot
+
+        traced, peak = tracemalloc.get_traced_memory()
+        lines = [f"tracemalloc: отслеживается {_mb(traced)}, пик {_mb(peak)}",
+                 f"{'рост':>10}{'блоков':>9} строка"]
+        for stat in changes[:self.top]:
+            frame = stat.traceback[0]
+            lines.append(f"{_mb(stat.size_diff):>10}{stat.count_diff:>+9} "
+                         f"{os.path.basename(frame.filename)}:{frame.lineno}")
+        return "\n".join(lines)
+
+    def stop_tracing(self):
+        """Выключение tracemalloc"""
+        tracemalloc.stop()
+        self._snapshot = None
+        logger.info("tracemalloc выключен")
+
+    @staticmethod
+    def _take_snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>")
+        ))
+
+    # ---------- Фоновый замер ----------
+
+    def start(self):
+        """Запуск периодического замера для stats()"""
+        if self.stats_interval and self._measure_task is None:
+            self._measure_task = asyncio.create_task(self._measure_loop())
+
+    async def close(self):
+        """Остановка периодического замера"""
+        if self._measure_task is not None:
+            self._measure_task.cancel()
+            await asyncio.gather(self._measure_task, return_exceptions=True)
+            self._measure_task = None
+
+    async def _measure_loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.measure)
+            except Exception as e:
+                logger.error(f"Ошибка замера памяти: {e}")
+            await asyncio.sleep(self.stats_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        """Размеры компонентов и FSM по последнему замеру (сам замер не выполняется)"""
+        result: Dict[str, Any] = {"rss_bytes": rss_bytes(), "tracing": int(self.tracing)}
+        data = self._last
+        if data is None:
+            return result
+        result["entries"] = {name: entries for name, (entries, _) in data["components"].items()}
+        result["bytes"] = {name: size for name, (_, size) in data["components"].items()}
+        result["measure_seconds"] = data["seconds"]
+        if data["fsm"] is not None:
+            result["fsm_entries"] = data["fsm"]["entries"]
+            result["fsm_bytes"] = data["fsm"]["bytes"]
+            result["fsm_state_bytes"] = {state: size for state, (_, size) in data["fsm"]["states"].items()}
+        return result
+
+
+# Глобальный разбор памяти процесса
+memory_inspector = MemoryInspector()
\ No newline at end of file
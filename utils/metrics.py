@@ -0,0 +1,266 @@
+# utils/metrics.py
+
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from aiohttp import web
+
+from config import METRICS_HOST, METRICS_PORT
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм времени (секунды)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Время внешних запросов текущего обработчика по сервисам (секунды)
+call_times: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("call_times", default=None)
+
+
+class Histogram:
+    """Гистограмма в формате Prometheus: счетчики корзин, сумма и количество"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+class MetricsRegistry:
+    """
+    Метрики бота в текстовом формате Prometheus
+
+    - время обработчиков с разбивкой на запросы к eSIM Access, курсу валют,
+      Telegram и остальное (локальная работа и ожидание цикла событий);
+    - количество, ошибки и время внешних запросов по сервисам и методам;
+    - числовые значения stats() компонентов бота (очереди, кэши и т.п.).
+    Запись - несколько сложений под блокировкой, поэтому метрики собираются всегда.
+    """
+
+    def __init__(self, namespace: str = "esim_bot"):
+        """
+        :param namespace: Префикс имен метрик
+        """
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._handlers: Dict[Tuple[str, str], Histogram] = {}
+        self._calls: Dict[Tuple[str, str], Histogram] = {}
+        self._errors: Dict[Tuple[str, str], int] = {}
+        self._histograms: Dict[str, Tuple[str, Dict[Tuple[Tuple[str, Any], ...], Histogram]]] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._runner: Optional[web.AppRunner] = None
+
+    # ---------- Запись ----------
+
+    def observe_handler(self, handler: str, seconds: float, parts: Dict[str, float]):
+        """
+        Время обработчика и его разбивка
+
+        :param handler: Имя обработчика
+        :param seconds: Полное время (секунды)
+        :param parts: Время внешних запросов по сервисам (секунды)
+        """
+        local = max(0.0, seconds - sum(parts.values()))
+        with self._lock:
+            self._handler(handler, "total").observe(seconds)
+            self._handler(handler, "local").observe(local)
+            for service, spent in parts.items():
+                self._handler(handler, service).observe(spent)
+
+    def _handler(self, handler: str, part: str) -> Histogram:
+        histogram = self._handlers.get((handler, part))
+        if histogram is None:
+            histogram = self._handlers[(handler, part)] = Histogram()
+        return histogram
+
+    def observe_call(self, service: str, endpoint: str, seconds: float, error: bool = False):
+        """
+        Внешний запрос: время, ошибка и вклад во время текущего обработчика
+
+        :param service: Сервис (esim, currency, telegram)
+        :param endpoint: Метод API
+        :param seconds: Время запроса (секунды)
+        :param error: Запрос завершился ошибкой
+        """
+        key = (service, endpoint)
+        with self._lock:
+            histogram = self._calls.get(key)
+            if histogram is None:
+                histogram = self._calls[key] = Histogram()
+                self._errors[key] = 0
+            histogram.observe(seconds)
+            if error:
+                self._errors[key] += 1
+            # Запросы из asyncio.to_thread видят тот же словарь: контекст копируется в поток
+            parts = call_times.get()
+            if parts is not None:
+                parts[service] = parts.get(service, 0.0) + seconds
+
+    @contextmanager
+    def outbound(self, service: str, endpoint: str) -> Iterator[None]:
+        """Замер внешнего запроса в блоке with (и спан трассировки); исключение из блока считается ошибкой"""
+        started = time.perf_counter()
+        error = True
+        try:
+            with tracer.span(f"{service} {endpoint}", kind="client", service=service, endpoint=endpoint):
+                yield
+            error = False
+        finally:
+            self.observe_call(service, endpoint, time.perf_counter() - started, error)
+
+    def histogram(self, name: str, documentation: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+                  **labels: Any):
+        """
+        Значение произвольной гистограммы
+
+        :param name: Имя метрики без префикса
+        :param documentation: Описание метрики
+        :param value: Значение
+        :param buckets: Границы корзин (при первом значении)
+        :param labels: Метки
+        """
+        key = tuple(labels.items())
+        with self._lock:
+            series = self._histograms.setdefault(name, (documentation, {}))[1]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def register(self, component: str, stats: Callable[[], Dict[str, Any]]):
+        """
+        Публикация stats() компонента: числа - gauge, словари чисел - gauge с меткой key
+
+        :param component: Имя компонента (часть имени метрики)
+        :param stats: Функция без аргументов, возвращающая словарь
+        """
+        self._collectors[component] = stats
+
+    # ---------- Вывод ----------
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        lines: List[str] = []
+        with self._lock:
+            self._render_histograms(
+                lines, "handler_seconds", "Время обработчика по частям: total, local и внешние сервисы",
+                {(("handler", handler), ("part", part)): h for (handler, part), h in self._handlers.items()}
+            )
+            self._render_histograms(
+                lines, "outbound_seconds", "Время внешних запросов",
+                {(("service", service), ("endpoint", endpoint)): h for (service, endpoint), h in self._calls.items()}
+            )
+            self._render_counter(
+                lines, "outbound_requests_total", "Количество внешних запросов",
+                {(("service", s), ("endpoint", e)): h.count for (s, e), h in self._calls.items()}
+            )
+            self._render_counter(
+                lines, "outbound_errors_total", "Внешние запросы, завершившиеся ошибкой",
+                {(("service", s), ("endpoint", e)): errors for (s, e), errors in self._errors.items()}
+            )
+            for name, (documentation, series) in self._histograms.items():
+                self._render_histograms(lines, name, documentation, series)
+
+        for component, stats in self._collectors.items():
+            try:
+                values = stats()
+            except Exception as e:
+                logger.warning(f"Ошибка получения статистики {component}: {e}")
+                continue
+            for key, value in values.items():
+                name = f"{self.namespace}_{component}_{key}"
+                if isinstance(value, dict):
+                    samples = [(f"{name}{_labels({'key': k})}", v) for k, v in value.items()]
+                elif isinstance(value, (list, tuple)):
+                    samples = [(f"{name}{_labels({'index': i})}", v) for i, v in enumerate(value)]
+                else:
+                    samples = [(name, value)]
+                samples = [(sample, float(v)) for sample, v in samples if isinstance(v, (int, float))]
+                if samples:
+                    lines.append(f"# TYPE {name} gauge")
+                    lines.extend(f"{sample} {v}" for sample, v in samples)
+
+        return "\n".join(lines) + "\n"
+
+    def _render_histograms(self, lines: List[str], name: str, documentation: str,
+                           series: Dict[Tuple[Tuple[str, Any], ...], Histogram]):
+        if not series:
+            return
+        name = f"{self.namespace}_{name}"
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in series.items():
+            labels = dict(labels)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_labels({**labels, 'le': le})} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+
+    def _render_counter(self, lines: List[str], name: str, documentation: str,
+                        series: Dict[Tuple[Tuple[str, Any], ...], int]):
+        if not series:
+            return
+        name = f"{self.namespace}_{name}"
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} counter")
+        lines.extend(f"{name}{_labels(dict(labels))} {value}" for labels, value in series.items())
+
+    # ---------- HTTP ----------
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    async def start(self, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        """
+        Запуск HTTP-сервера с /metrics
+
+        :param host: Адрес (по умолчанию только локальный)
+        :param port: Порт, 0 - не запускать
+        """
+        if not port:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        try:
+            await web.TCPSite(self._runner, host, port).start()
+        except OSError as e:
+            logger.error(f"Не удалось запустить /metrics на {host}:{port}: {e}")
+            await self.close()
+            return
+        logger.info(f"Метрики доступны на http://{host}:{port}/metrics")
+
+    async def close(self):
+        """Остановка HTTP-сервера"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+# Глобальный реестр метрик
+metrics = MetricsRegistry()
\ No newline at end of file
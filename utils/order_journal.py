@@ -0,0 +1,236 @@
+# utils/order_journal.py
+
+import asyncio
+import glob
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Any, Tuple
+
+from config import ORDER_JOURNAL_PATH, BOT_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Типы записей журнала
+INTENT = "intent"  # Оплата подтверждена, заказ отправляется в eSIM Access
+ORDERED = "ordered"  # eSIM Access вернул номер заказа
+FAILED = "failed"  # Заказ не удался, пользователь получил сообщение об ошибке
+CLOSED = "closed"  # Выдача eSIM завершена
+EXPIRED = "expired"  # eSIM не выпущена за отведенное время, выдача повторится при следующем запуске
+
+
+class OrderJournal:
+    """
+    Append-only журнал оформления заказов
+
+    Намерение заказать eSIM записывается до обращения к API, результат - после.
+    Записи от одновременных покупок объединяются в одну запись на диск с одним
+    fsync (group commit), поэтому ожидание журнала не растет с нагрузкой.
+
+    У каждого воркера свой файл: воркер 0 пишет в path, воркер N - в path.N.
+    Если воркеров стало меньше (или бот вернулся к одному процессу), файлы
+    воркеров, которых больше нет, передаются при запуске: файл path.K достается
+    воркеру K % workers, его незавершенные заказы переписываются в журнал этого
+    воркера, и только после fsync файл удаляется.
+    """
+
+    def __init__(self, path: str, workers: int = BOT_WORKERS):
+        """
+        :param path: Путь к файлу журнала
+        :param workers: Количество воркеров (файлы воркеров с номером не меньше передаются)
+        """
+        self.path = path
+        self.workers = max(workers, 1)
+        self.index = 0
+        self._file = None
+        self._queue: List[Tuple[bytes, asyncio.Future]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self.appended = 0
+        self.fsyncs = 0
+
+    def set_shard(self, index: int):
+        """Журнал воркера index (воркер 0 пишет в основной файл)"""
+        if index:
+            self.path = f"{self.path}.{index}"
+        self.index = index
+
+    # ---------- Восстановление ----------
+
+    def _orphans(self) -> List[str]:
+        """Файлы воркеров, которых больше нет, доставшиеся этому воркеру"""
+        base = self.path[:-len(f".{self.index}")] if self.index else self.path
+        orphans = []
+        for path in glob.glob(glob.escape(base) + ".*"):
+            suffix = path[len(base) + 1:]
+            if suffix.isdigit() and int(suffix) >= self.workers and int(suffix) % self.workers == self.index:
+                orphans.append(path)
+        return sorted(orphans)
+
+    @staticmethod
+    def _read_records(path: str) -> List[Dict[str, Any]]:
+        if not os.path.exists(path):
+            return []
+
+        records = []
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # Последняя строка могла быть записана не полностью
+                    logger.warning(f"Пропущена поврежденная запись журнала: {line[:100]!r}")
+        return records
+
+    @staticmethod
+    def _incomplete(records: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Записи заказов, оформление или выдача которых не завершены"""
+        entries: Dict[str, List[Dict[str, Any]]] = {}
+        order_ids: Dict[str, str] = {}
+
+        for record in records:
+            kind = record.get("t")
+            if kind == INTENT:
+                entries[record["id"]] = [record]
+            elif kind == ORDERED and record.get("id") in entries:
+                entries[record["id"]].append(record)
+                order_ids[record["order_no"]] = record["id"]
+            elif kind == FAILED:
+                entries.pop(record.get("id"), None)
+            elif kind == EXPIRED and order_ids.get(record.get("order_no")) in entries:
+                entries[order_ids[record["order_no"]]].append(record)
+            elif kind == CLOSED:
+                entries.pop(order_ids.get(record.get("order_no")), None)
+
+        return entries
+
+    def _rewrite(self, entries: Dict[str, List[Dict[str, Any]]]):
+        """Сжатие журнала: остаются только незавершенные заказы"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            for records in entries.values():
+                for record in records:
+                    f.write(_encode(record))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    # ---------- Жизненный цикл ----------
+
+    async def start(self) -> List[Dict[str, Any]]:
+        """
+        Чтение и сжатие журнала, открытие его на дозапись
+
+        :return: Незавершенные заказы (намерение, объединенное с номером заказа, если он есть,
+            и количеством истекших попыток выдачи в поле expired)
+        """
+        records = await asyncio.to_thread(self._read_records, self.path)
+        orphans = self._orphans()
+        for path in orphans:
+            records.extend(await asyncio.to_thread(self._read_records, path))
+        entries = self._incomplete(records)
+        await asyncio.to_thread(self._rewrite, entries)
+        # Заказы из чужих файлов уже сохранены в этом журнале
+        for path in orphans:
+            os.remove(path)
+            logger.warning(f"Журнал {path} передан журналу {self.path}")
+
+        self._file = open(self.path, "ab")
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._writer_task = asyncio.create_task(self._write_loop())
+
+        incomplete = []
+        for records in entries.values():
+            merged = {}
+            for record in records:
+                if record["t"] == EXPIRED:
+                    merged["expired"] = merged.get("expired", 0) + 1
+                else:
+                    merged.update(record)
+            merged.pop("t", None)
+            incomplete.append(merged)
+
+        if incomplete:
+            logger.warning(f"В журнале {len(incomplete)} незавершенных заказов")
+        return incomplete
+
+    async def close(self):
+        """Запись оставшихся записей и закрытие журнала"""
+        if self._writer_task:
+            self._closing = True
+            self._wakeup.set()
+            await self._writer_task
+            self._writer_task = None
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    # ---------- Запись ----------
+
+    def _write(self, data: bytes):
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    async def _write_loop(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            while self._queue:
+                batch, self._queue = self._queue, []
+                try:
+                    await asyncio.to_thread(self._write, b"".join(line for line, _ in batch))
+                    self.fsyncs += 1
+                    self.appended += len(batch)
+                except Exception as e:
+                    logger.error(f"Ошибка записи журнала заказов: {e}")
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                else:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_result(None)
+
+            if self._closing:
+                return
+
+    async def append(self, kind: str, **fields):
+        """
+        Добавление записи с ожиданием ее сохранения на диск
+
+        :param kind: Тип записи (INTENT, ORDERED, FAILED, CLOSED, EXPIRED)
+        :param fields: Поля записи
+        :raises RuntimeError: Журнал не открыт (start не вызывался) или уже закрыт
+        """
+        if self._writer_task is None or self._closing:
+            # Запись, принятая без фоновой записи, никогда не попала бы на диск
+            raise RuntimeError(f"Журнал заказов {self.path} не открыт")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((_encode({"t": kind, **fields}), future))
+        self._wakeup.set()
+        await future
+
+    def stats(self) -> Dict[str, Any]:
+        """Количество записей и fsync (записей на один fsync - эффективность группировки)"""
+        return {
+            "appended": self.appended,
+            "fsyncs": self.fsyncs,
+            "records_per_fsync": self.appended / self.fsyncs if self.fsyncs else 0.0
+        }
+
+
+def _encode(record: Dict[str, Any]) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+# Глобальный журнал заказов
+order_journal = OrderJournal(ORDER_JOURNAL_PATH)
\ No newline at end of file
@@ -0,0 +1,494 @@
+# utils/order_storage.py
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Tuple
+
+from config import ORDERS_DB_PATH
+from utils.shared_cache import redis_client
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    order_no TEXT NOT NULL UNIQUE,
+    iccid TEXT,
+    country TEXT NOT NULL DEFAULT '',
+    package_name TEXT NOT NULL DEFAULT '',
+    created_at INTEGER NOT NULL
+);
+DROP INDEX IF EXISTS idx_orders_user;
+CREATE INDEX IF NOT EXISTS idx_orders_user_page ON orders (user_id, created_at, order_no);
+CREATE INDEX IF NOT EXISTS idx_orders_iccid ON orders (iccid);
+"""
+
+_COLUMNS = "user_id, order_no, iccid, country, package_name, created_at"
+
+# Курсор страницы заказов: (created_at, order_no) крайнего заказа на странице
+Cursor = Tuple[int, str]
+
+
+class OrderRepository:
+    """
+    Хранилище заказов пользователей с отложенной записью
+
+    Запись идет через буфер (write-behind): save_order только добавляет заказ в память,
+    фоновая задача пачками сбрасывает его в хранилище. Чтение учитывает заказы,
+    которые еще не записаны. Само хранилище реализуют наследники.
+    """
+
+    def __init__(self, flush_interval: float = 0.5, batch_size: int = 100):
+        """
+        :param flush_interval: Максимальная задержка записи буфера (секунды)
+        :param batch_size: Размер буфера, при котором запись начинается сразу
+        """
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        # Заказы, ожидающие записи, и пачка, которая пишется прямо сейчас
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._flushing: Dict[str, Dict[str, Any]] = {}
+        # ICCID, полученные для уже записанных заказов
+        self._pending_iccids: Dict[str, str] = {}
+        self._flushing_iccids: Dict[str, str] = {}
+        self._flush_in_progress = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    # ---------- Операции хранилища (реализуют наследники) ----------
+
+    async def _open(self):
+        pass
+
+    async def _close(self):
+        pass
+
+    async def _write(self, orders: List[Dict[str, Any]], iccids: Dict[str, str]):
+        raise NotImplementedError
+
+    async def _fetch_user_orders(self, user_id: int) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def _fetch_user_orders_page(self, user_id: int, cursor: Optional[Cursor], newer: bool,
+                                      limit: int) -> List[Dict[str, Any]]:
+        """
+        Заказы пользователя по одну сторону от курсора
+
+        :return: До limit заказов, ближайших к курсору: от новых к старым для newer=False,
+                 от старых к новым для newer=True
+        """
+        raise NotImplementedError
+
+    async def _fetch_order(self, order_no: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def _fetch_order_by_iccid(self, iccid: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    # ---------- Жизненный цикл ----------
+
+    async def start(self):
+        """Подготовка хранилища и запуск фоновой записи"""
+        await self._open()
+        self._wakeup = asyncio.Event()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        """Остановка фоновой записи с сохранением буфера"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+        await self._close()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка записи заказов в хранилище: {e}")
+
+    async def flush(self):
+        """Запись накопленных заказов одной пачкой"""
+        if self._flush_in_progress or not (self._pending or self._pending_iccids):
+            return
+
+        batch, self._pending = self._pending, {}
+        iccids, self._pending_iccids = self._pending_iccids, {}
+        self._flushing, self._flushing_iccids = batch, iccids
+        self._flush_in_progress = True
+        try:
+            await self._write(list(batch.values()), iccids)
+        except BaseException:
+            # Возвращаем пачку в буфер, чтобы повторить запись позже (в том числе при отмене задачи)
+            batch.update(self._pending)
+            self._pending = batch
+            iccids.update(self._pending_iccids)
+            self._pending_iccids = iccids
+            raise
+        finally:
+            self._flushing, self._flushing_iccids = {}, {}
+            self._flush_in_progress = False
+
+    def memory_data(self) -> tuple:
+        """Заказы и ICCID, ожидающие записи и записываемые сейчас (для отчета о памяти)"""
+        return self._pending, self._flushing, self._pending_iccids, self._flushing_iccids
+
+    # ---------- Публичный интерфейс ----------
+
+    def save_order(self, user_id: int, order_no: str, country: str, package_name: str):
+        """
+        Сохраняет информацию о заказе пользователя (без ожидания записи)
+
+        :param user_id: ID пользователя Telegram
+        :param order_no: Номер заказа eSIM Access
+        :param country: Название страны
+        :param package_name: Название тарифа
+        """
+        self._pending[order_no] = {
+            "user_id": user_id,
+            "order_no": order_no,
+            "iccid": None,
+            "country": country,
+            "package_name": package_name,
+            "created_at": int(time.time() * 1000)
+        }
+        if self._wakeup and len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def set_iccid(self, order_no: str, iccid: str):
+        """
+        Запоминает ICCID выпущенной eSIM (без ожидания записи)
+
+        :param order_no: Номер заказа eSIM Access
+        :param iccid: ICCID профиля
+        """
+        order = self._pending.get(order_no)
+        if order is not None:
+            order["iccid"] = iccid
+        else:
+            self._pending_iccids[order_no] = iccid
+
+    def _unsaved_orders(self) -> List[Dict[str, Any]]:
+        """Заказы, которые еще не попали в хранилище"""
+        return list(self._flushing.values()) + list(self._pending.values())
+
+    def _with_unsaved_iccid(self, order: Dict[str, Any]) -> Dict[str, Any]:
+        """Заказ с ICCID, который еще не записан в хранилище"""
+        order_no = order["order_no"]
+        iccid = self._pending_iccids.get(order_no) or self._flushing_iccids.get(order_no)
+        if iccid:
+            order = dict(order, iccid=iccid)
+        return _with_date(order)
+
+    async def get_user_orders(self, user_id: int) -> List[Dict[str, Any]]:
+        """
+        Получение всех заказов пользователя в порядке оформления
+
+        :param user_id: ID пользователя Telegram
+        :return: Список заказов
+        """
+        # Буфер читаем до запроса: пачка может записаться, пока идет чтение
+        unsaved = [order for order in self._unsaved_orders() if order["user_id"] == user_id]
+        orders = await self._fetch_user_orders(user_id)
+        known = {order["order_no"] for order in orders}
+        orders.extend(order for order in unsaved if order["order_no"] not in known)
+        return [self._with_unsaved_iccid(order) for order in orders]
+
+    async def get_user_orders_page(self, user_id: int, cursor: Optional[Cursor] = None, newer: bool = False,
+                                   limit: int = 10) -> Tuple[List[Dict[str, Any]], bool, bool]:
+        """
+        Страница заказов пользователя (от новых к старым) с навигацией по курсору
+
+        Стоимость страницы зависит только от limit, а не от длины истории заказов.
+
+        :param user_id: ID пользователя Telegram
+        :param cursor: Курсор крайнего заказа предыдущей страницы (None - первая страница)
+        :param newer: True - заказы новее курсора, False - старше курсора
+        :param limit: Размер страницы
+        :return: Заказы страницы, есть ли заказы новее, есть ли заказы старше
+        """
+        unsaved = [order for order in self._unsaved_orders() if order["user_id"] == user_id]
+        orders = await self._fetch_user_orders_page(user_id, cursor, newer, limit + 1)
+
+        # Незаписанные заказы того же пользователя по нужную сторону от курсора
+        known = {order["order_no"] for order in orders}
+        for order in unsaved:
+            key = (order["created_at"], order["order_no"])
+            if order["order_no"] not in known and (cursor is None or (key > cursor if newer else key < cursor)):
+                orders.append(order)
+        orders.sort(key=lambda order: (order["created_at"], order["order_no"]), reverse=not newer)
+
+        has_more = len(orders) > limit
+        page = orders[:limit]
+        if newer:
+            page.reverse()
+            has_newer, has_older = has_more, True
+        else:
+            has_newer, has_older = cursor is not None, has_more
+        return [self._with_unsaved_iccid(order) for order in page], has_newer, has_older
+
+    async def get_order(self, order_no: str) -> Optional[Dict[str, Any]]:
+        """
+        Получение заказа по номеру
+
+        :param order_no: Номер заказа eSIM Access
+        :return: Заказ или None
+        """
+        order = self._pending.get(order_no) or self._flushing.get(order_no)
+        if order is None:
+            order = await self._fetch_order(order_no)
+        return self._with_unsaved_iccid(order) if order else None
+
+    async def get_order_by_iccid(self, iccid: str) -> Optional[Dict[str, Any]]:
+        """
+        Получение заказа по ICCID профиля
+
+        :param iccid: ICCID eSIM
+        :return: Заказ или None
+        """
+        for order in self._unsaved_orders():
+            if order["iccid"] == iccid:
+                return _with_date(order)
+        for iccids in (self._pending_iccids, self._flushing_iccids):
+            for order_no, order_iccid in list(iccids.items()):
+                if order_iccid == iccid:
+                    return await self.get_order(order_no)
+        order = await self._fetch_order_by_iccid(iccid)
+        return _with_date(order) if order else None
+
+
+class SQLiteOrderRepository(OrderRepository):
+    """
+    Хранилище заказов на SQLite
+
+    Запросы к базе выполняются в небольшом пуле потоков, у каждого потока свое соединение.
+    """
+
+    def __init__(self, db_path: str, max_workers: int = 2, **kwargs):
+        """
+        :param db_path: Путь к файлу базы данных
+        :param max_workers: Количество потоков для работы с SQLite
+        """
+        super().__init__(**kwargs)
+        self.db_path = db_path
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="orders-db")
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+    # ---------- Работа с SQLite (выполняется в пуле потоков) ----------
+
+    def _connection(self) -> sqlite3.Connection:
+        """Соединение текущего потока пула"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.executescript(_SCHEMA)
+        conn.commit()
+
+    def _write_batch(self, orders: List[Dict[str, Any]], iccids: Dict[str, str]):
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                f"INSERT OR IGNORE INTO orders ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (o["user_id"], o["order_no"], o["iccid"], o["country"], o["package_name"], o["created_at"])
+                    for o in orders
+                ]
+            )
+            conn.executemany(
+                "UPDATE orders SET iccid = ? WHERE order_no = ?",
+                [(iccid, order_no) for order_no, iccid in iccids.items()]
+            )
+
+    def _fetch_all(self, query: str, params: tuple) -> List[Dict[str, Any]]:
+        rows = self._connection().execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def _close_connections(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    # ---------- Операции хранилища ----------
+
+    async def _open(self):
+        await self._run(self._init_db)
+        logger.info(f"Хранилище заказов открыто: {self.db_path}")
+
+    async def _close(self):
+        await asyncio.to_thread(self._executor.shutdown, wait=True)
+        self._close_connections()
+
+    async def _write(self, orders: List[Dict[str, Any]], iccids: Dict[str, str]):
+        await self._run(self._write_batch, orders, iccids)
+
+    async def _fetch_user_orders(self, user_id: int) -> List[Dict[str, Any]]:
+        return await self._run(
+            self._fetch_all,
+            f"SELECT {_COLUMNS} FROM orders WHERE user_id = ? ORDER BY created_at",
+            (user_id,)
+        )
+
+    async def _fetch_user_orders_page(self, user_id: int, cursor: Optional[Cursor], newer: bool,
+                                      limit: int) -> List[Dict[str, Any]]:
+        # Ключ (created_at, order_no) совпадает с индексом, поэтому читается ровно limit строк
+        direction = "ASC" if newer else "DESC"
+        condition, params = "", (user_id,)
+        if cursor is not None:
+            condition = f"AND (created_at, order_no) {'>' if newer else '<'} (?, ?)"
+            params += tuple(cursor)
+        return await self._run(
+            self._fetch_all,
+            f"SELECT {_COLUMNS} FROM orders WHERE user_id = ? {condition} "
+            f"ORDER BY created_at {direction}, order_no {direction} LIMIT ?",
+            params + (limit,)
+        )
+
+    async def _fetch_order(self, order_no: str) -> Optional[Dict[str, Any]]:
+        rows = await self._run(self._fetch_all, f"SELECT {_COLUMNS} FROM orders WHERE order_no = ?", (order_no,))
+        return rows[0] if rows else None
+
+    async def _fetch_order_by_iccid(self, iccid: str) -> Optional[Dict[str, Any]]:
+        rows = await self._run(self._fetch_all, f"SELECT {_COLUMNS} FROM orders WHERE iccid = ?", (iccid,))
+        return rows[0] if rows else None
+
+
+class RedisOrderRepository(OrderRepository):
+    """
+    Хранилище заказов в Redis (общее для нескольких процессов бота)
+
+    Заказ хранится в JSON под своим ключом, индексы - сортированное множество заказов
+    пользователя по времени оформления и ключ ICCID -> номер заказа. Чтение списка
+    заказов - ZRANGE и один MGET, запись пачки - конвейер (pipeline).
+    """
+
+    def __init__(self, redis, prefix: str = "wws:", **kwargs):
+        """
+        :param redis: Клиент redis.asyncio.Redis (decode_responses=True)
+        :param prefix: Префикс ключей
+        """
+        super().__init__(**kwargs)
+        self.redis = redis
+        self.prefix = prefix
+
+    def _order_key(self, order_no: str) -> str:
+        return f"{self.prefix}order:{order_no}"
+
+    def _user_key(self, user_id: int) -> str:
+        return f"{self.prefix}user_orders:{user_id}"
+
+    def _iccid_key(self, iccid: str) -> str:
+        return f"{self.prefix}iccid:{iccid}"
+
+    async def _write(self, orders: List[Dict[str, Any]], iccids: Dict[str, str]):
+        iccids = dict(iccids)
+        if orders:
+            pipe = self.redis.pipeline(transaction=False)
+            for order in orders:
+                # Как INSERT OR IGNORE: уже записанный заказ не перезаписывается
+                pipe.set(self._order_key(order["order_no"]), json.dumps(order, ensure_ascii=False), nx=True)
+                pipe.zadd(self._user_key(order["user_id"]), {order["order_no"]: order["created_at"]}, nx=True)
+                if order["iccid"]:
+                    iccids.setdefault(order["order_no"], order["iccid"])
+            await pipe.execute()
+
+        if iccids:
+            pipe = self.redis.pipeline(transaction=False)
+            for order in await self._fetch_orders(list(iccids)):
+                iccid = iccids[order["order_no"]]
+                pipe.set(self._order_key(order["order_no"]), json.dumps(dict(order, iccid=iccid), ensure_ascii=False))
+                pipe.set(self._iccid_key(iccid), order["order_no"])
+            await pipe.execute()
+
+    async def _fetch_orders(self, order_nos: List[str]) -> List[Dict[str, Any]]:
+        if not order_nos:
+            return []
+        values = await self.redis.mget([self._order_key(order_no) for order_no in order_nos])
+        return [json.loads(value) for value in values if value is not None]
+
+    async def _fetch_user_orders(self, user_id: int) -> List[Dict[str, Any]]:
+        order_nos = await self.redis.zrange(self._user_key(user_id), 0, -1)
+        return await self._fetch_orders(order_nos)
+
+    async def _fetch_user_orders_page(self, user_id: int, cursor: Optional[Cursor], newer: bool,
+                                      limit: int) -> List[Dict[str, Any]]:
+        # В сортированном множестве заказы с одинаковым временем упорядочены по номеру,
+        # поэтому позиция курсора (ZREVRANK) однозначно задает начало страницы
+        key = self._user_key(user_id)
+        rank = -1
+        if cursor is not None:
+            rank = await self.redis.zrevrank(key, cursor[1])
+            if rank is None:
+                # Заказа курсора нет в индексе - ищем его место по времени
+                newer_count = await self.redis.zcount(key, f"({cursor[0]}", "+inf")
+                rank = newer_count if newer else newer_count - 1
+
+        if newer:
+            if rank <= 0:
+                return []
+            order_nos = await self.redis.zrevrange(key, max(0, rank - limit), rank - 1)
+            order_nos.reverse()
+        else:
+            order_nos = await self.redis.zrevrange(key, rank + 1, rank + limit)
+        return await self._fetch_orders(order_nos)
+
+    async def _fetch_order(self, order_no: str) -> Optional[Dict[str, Any]]:
+        orders = await self._fetch_orders([order_no])
+        return orders[0] if orders else None
+
+    async def _fetch_order_by_iccid(self, iccid: str) -> Optional[Dict[str, Any]]:
+        order_no = await self.redis.get(self._iccid_key(iccid))
+        return await self._fetch_order(order_no) if order_no else None
+
+
+def _with_date(order: Dict[str, Any]) -> Dict[str, Any]:
+    """Добавляет к заказу дату оформления в формате для отображения"""
+    order = dict(order)
+    order["date"] = datetime.fromtimestamp(order["created_at"] / 1000).strftime('%d.%m.%Y')
+    return order
+
+
+# Глобальное хранилище заказов: Redis, если он настроен, иначе локальная база SQLite
+if redis_client is not None:
+    order_repository = RedisOrderRepository(redis_client)
+else:
+    order_repository = SQLiteOrderRepository(ORDERS_DB_PATH)
\ No newline at end of file
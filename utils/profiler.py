@@ -0,0 +1,255 @@
+# utils/profiler.py
+
+import asyncio
+import cProfile
+import logging
+import os
+import pstats
+import selectors
+import sys
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import PROFILE_DIR, PROFILE_TOP, PROFILE_SAMPLE_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Режимы профилирования
+MODES = ("cprofile", "sample")
+
+# Каталог проекта (для коротких имен файлов в отчете)
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Файлы, которые не показываются в отчете: цикл событий и сам профилировщик
+SKIPPED_PATHS = (
+    os.path.dirname(asyncio.__file__),
+    selectors.__file__,
+    threading.__file__,
+    os.path.abspath(__file__)
+)
+# Встроенные функции цикла событий (запуск callback, ожидание в epoll/select)
+SKIPPED_BUILTINS = ("_contextvars.Context", "select.")
+
+# Функция: (файл, строка, имя)
+FunctionKey = Tuple[str, int, str]
+
+
+def _where(key: FunctionKey) -> str:
+    """Короткое имя функции для отчета"""
+    filename, line, name = key
+    if filename == "~":
+        return name
+    if filename.startswith(PROJECT_DIR):
+        filename = os.path.relpath(filename, PROJECT_DIR)
+    elif "site-packages" + os.sep in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f"{filename}:{line}({name})"
+
+
+def _skipped(key: FunctionKey) -> bool:
+    filename, _, name = key
+    if filename == "~":
+        return any(part in name for part in SKIPPED_BUILTINS)
+    return filename.startswith(SKIPPED_PATHS)
+
+
+class Profiler:
+    """
+    Профилирование работающего бота по команде администратора
+
+    Режим cprofile включает cProfile в потоке цикла событий: время считается только
+    пока корутина выполняется (ожидание await не входит), поэтому в отчете видно,
+    что занимает цикл. Режим sample - отдельный поток раз в interval снимает стек
+    потока цикла событий; накладные расходы меньше, точность ниже. Простой цикла
+    (ожидание в selectors) в выборки не попадает, его доля выводится отдельно.
+
+    Сессия завершается через заданное число секунд, после заданного числа
+    обработанных обновлений или командой остановки. Профиль сохраняется в каталог
+    directory (.prof для pstats/snakeviz, .folded для flamegraph/speedscope), отчет -
+    функции с наибольшим суммарным временем. Без сессии профилировщик ничего не
+    делает: middleware проверяет только признак active.
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, top: int = PROFILE_TOP,
+                 interval: float = PROFILE_SAMPLE_INTERVAL):
+        """
+        :param directory: Каталог файлов профилей
+        :param top: Строк в отчете
+        :param interval: Период выборки стека в режиме sample (секунды)
+        """
+        self.directory = directory
+        self.top = top
+        self.interval = interval
+
+        self.mode: Optional[str] = None
+        self.started = 0.0
+        self.update_limit = 0
+        self.handled = 0
+        self.sessions = 0
+
+        self._profile: Optional[cProfile.Profile] = None
+        self._samples: Dict[Tuple[FunctionKey, ...], int] = {}
+        self._idle = 0
+        self._loop_thread: Optional[int] = None
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._on_finish: Optional[Callable[[str], Awaitable[Any]]] = None
+        self._finish_task: Optional[asyncio.Task] = None
+
+    @property
+    def active(self) -> bool:
+        """Идет ли сессия профилирования"""
+        return self.mode is not None
+
+    def start(self, mode: str = "cprofile", seconds: float = 0, updates: int = 0,
+              on_finish: Optional[Callable[[str], Awaitable[Any]]] = None):
+        """
+        Начало сессии профилирования (вызывается из цикла событий)
+
+        :param mode: "cprofile" или "sample"
+        :param seconds: Завершить через столько секунд (0 - не ограничено)
+        :param updates: Завершить после стольких обработанных обновлений (0 - не ограничено)
+        :param on_finish: Корутина, которая получит отчет при автоматическом завершении
+        """
+        if self.active:
+            raise RuntimeError(f"Профилирование уже идет ({self.mode})")
+        if mode not in MODES:
+            raise ValueError(f"Неизвестный режим профилирования: {mode}")
+
+        self.mode = mode
+        self.started = time.perf_counter()
+        self.update_limit = updates
+        self.handled = 0
+        self.sessions += 1
+        self._on_finish = on_finish
+
+        if mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._samples = {}
+            self._idle = 0
+            self._loop_thread = threading.get_ident()
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample, name="profiler-sampler", daemon=True)
+            self._sampler.start()
+
+        if seconds:
+            self._timer = asyncio.get_running_loop().call_later(seconds, self._finish)
+        logger.info(f"Профилирование {mode} начато (секунд: {seconds or '-'}, обновлений: {updates or '-'})")
+
+    def handled_update(self):
+        """Обработано обновление (вызывается middleware только во время сессии)"""
+        self.handled += 1
+        if self.update_limit and self.handled >= self.update_limit:
+            self._finish()
+
+    def stop(self) -> str:
+        """
+        Завершение сессии: профиль сохраняется в файл, возвращается текст отчета
+
+        Сессия завершается и при ошибке сохранения профиля - тогда отчет содержит ошибку.
+        """
+        if not self.active:
+            raise RuntimeError("Профилирование не идет")
+        elapsed = time.perf_counter() - self.started
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        mode = self.mode
+        summary = f"Профиль {mode}: {elapsed:.1f} с, обновлений {self.handled}"
+        try:
+            if mode == "cprofile":
+                self._profile.disable()
+            else:
+                self._stop.set()
+                self._sampler.join()
+
+            os.makedirs(self.directory, exist_ok=True)
+            name = os.path.join(self.directory, time.strftime("profile-%Y%m%d-%H%M%S"))
+            if mode == "cprofile":
+                path = name + ".prof"
+                header, rows = self._cprofile_report(path)
+            else:
+                path = name + ".folded"
+                header, rows = self._sample_report(path)
+        except Exception as e:
+            logger.error(f"Не удалось сохранить профиль {mode}: {e}")
+            return f"{summary}\nОшибка сохранения профиля: {e}"
+        finally:
+            self.mode = None
+            self._profile = None
+            self._sampler = None
+
+        logger.info(f"Профилирование {mode} завершено, профиль: {path}")
+        return f"{summary}\nФайл: {path}\n{header}\n" + "\n".join(rows)
+
+    def _finish(self):
+        # Автоматическое завершение: отчет отправляется через on_finish
+        if not self.active:
+            return
+        report = self.stop()
+        if self._on_finish is not None:
+            self._finish_task = asyncio.get_running_loop().create_task(self._on_finish(report))
+
+    def _cprofile_report(self, path: str) -> Tuple[str, List[str]]:
+        stats = pstats.Stats(self._profile)
+        stats.dump_stats(path)
+
+        functions = []
+        for key, (_, calls, own, cumulative, _) in stats.stats.items():
+            if not _skipped(key):
+                functions.append((cumulative, own, calls, key))
+        functions.sort(reverse=True)
+
+        rows = [f"{cumulative:>8.3f}{own:>8.3f}{calls:>8} {_where(key)}"
+                for cumulative, own, calls, key in functions[:self.top]]
+        return f"{'cum, с':>8}{'own, с':>8}{'вызовы':>8} функция", rows
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            if frame.f_code.co_filename == selectors.__file__:
+                self._idle += 1
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            stack = tuple(reversed(stack))
+            self._samples[stack] = self._samples.get(stack, 0) + 1
+
+    def _sample_report(self, path: str) -> Tuple[str, List[str]]:
+        cumulative: Dict[FunctionKey, int] = {}
+        own: Dict[FunctionKey, int] = {}
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self._samples.items():
+                f.write(";".join(_where(key) for key in stack) + f" {count}\n")
+                for key in set(stack):
+                    cumulative[key] = cumulative.get(key, 0) + count
+                own[stack[-1]] = own.get(stack[-1], 0) + count
+
+        busy = sum(self._samples.values())
+        total = busy + self._idle
+        functions = sorted(((count, key) for key, count in cumulative.items() if not _skipped(key)),
+                           reverse=True)
+        rows = [f"{count / busy:>8.1%}{own.get(key, 0) / busy:>8.1%} {_where(key)}"
+                for count, key in functions[:self.top]]
+        header = (f"Выборок {total}, цикл занят {busy / total if total else 0:.0%}\n"
+                  f"{'cum':>8}{'own':>8} функция (доля занятых выборок)")
+        return header, rows
+
+    def stats(self) -> Dict[str, Any]:
+        """Идет ли профилирование и количество сессий"""
+        return {"active": int(self.active), "sessions": self.sessions}
+
+
+# Глобальный профилировщик
+profiler = Profiler()
\ No newline at end of file
@@ -0,0 +1,238 @@
+# utils/screen.py
+
+import logging
+import os
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, InputMediaPhoto, MaybeInaccessibleMessage, Message
+
+from utils.media_cache import media_cache
+
+logger = logging.getLogger(__name__)
+
+# Изображение экрана, которое бот не отправлял сам (например, до перезапуска)
+UNKNOWN_IMAGE = "?"
+
+
+def _markup_hash(reply_markup: Optional[InlineKeyboardMarkup]) -> int:
+    return hash(reply_markup.model_dump_json(exclude_none=True)) if reply_markup else 0
+
+
+class ScreenRenderer:
+    """
+    Переход между экранами бота самой дешевой операцией Bot API
+
+    Для каждого показанного сообщения запоминается, что на нем сейчас: изображение,
+    хэш текста и хэш клавиатуры. По ним выбирается операция:
+    - ничего не менялось - запрос не отправляется (Telegram ответил бы «message is not modified»);
+    - изменилась только клавиатура - editMessageReplyMarkup;
+    - то же изображение с другой подписью - editMessageCaption;
+    - другое изображение - editMessageMedia с file_id из кэша изображений;
+    - текст вместо текста - editMessageText;
+    - смена типа сообщения (текст <-> фото) - удаление и новое сообщение.
+    Экономия считается относительно прежнего подхода: правка текста или фото,
+    а при смене типа - удаление и отправка.
+    """
+
+    def __init__(self, max_screens: int = 10000):
+        """
+        :param max_screens: Сколько последних сообщений помнить
+        """
+        self.max_screens = max_screens
+        # (chat_id, message_id) -> (изображение, хэш текста, хэш клавиатуры)
+        self._screens: "OrderedDict[Tuple[int, int], Tuple[Optional[str], int, int]]" = OrderedDict()
+
+        self.transitions = 0
+        self.calls = 0
+        self.saved = 0
+        self.operations: Counter = Counter()
+
+    def _remember(self, message: Message, image: Optional[str], text_hash: int, markup_hash: int):
+        key = (message.chat.id, message.message_id)
+        self._screens[key] = (image, text_hash, markup_hash)
+        self._screens.move_to_end(key)
+        while len(self._screens) > self.max_screens:
+            self._screens.popitem(last=False)
+
+    def _current(self, message: Message) -> Tuple[Optional[str], int, int]:
+        """Что сейчас показано в сообщении: из памяти или по самому сообщению"""
+        screen = self._screens.get((message.chat.id, message.message_id))
+        if screen is not None:
+            return screen
+        return (
+            UNKNOWN_IMAGE if message.photo else None,
+            hash((message.html_text, None)),
+            _markup_hash(message.reply_markup)
+        )
+
+    async def send(
+        self,
+        message: MaybeInaccessibleMessage,
+        text: str,
+        reply_markup: Optional[InlineKeyboardMarkup] = None,
+        image: Optional[str] = None,
+        disable_web_page_preview: Optional[bool] = None
+    ) -> Message:
+        """
+        Новый экран отдельным сообщением в чат message
+
+        :param message: Любое сообщение чата
+        :param text: Текст (подпись) экрана
+        :param reply_markup: Клавиатура экрана
+        :param image: Путь к изображению экрана
+        :param disable_web_page_preview: Отключить предпросмотр ссылок (только для текста)
+        """
+        self.calls += 1
+        if image:
+            try:
+                sent = await message.answer_photo(
+                    photo=await media_cache.photo(image), caption=text, reply_markup=reply_markup
+                )
+            except TelegramBadRequest as e:
+                # file_id не принят - загружаем файл заново
+                if "file" not in str(e).lower():
+                    raise
+                logger.warning(f"Не удалось отправить изображение {image}: {e}")
+                await media_cache.forget(image, e)
+                self.calls += 1
+                sent = await message.answer_photo(
+                    photo=await media_cache.photo(image), caption=text, reply_markup=reply_markup
+                )
+            await media_cache.remember(image, sent)
+        else:
+            sent = await message.answer(
+                text=text, reply_markup=reply_markup, disable_web_page_preview=disable_web_page_preview
+            )
+        self._remember(sent, image, hash((text, disable_web_page_preview)), _markup_hash(reply_markup))
+        return sent
+
+    async def _replace(self, message: MaybeInaccessibleMessage, *args, **kwargs) -> Message:
+        """Удаление старого сообщения и отправка нового"""
+        if isinstance(message, Message):
+            self.calls += 1
+            try:
+                await message.delete()
+            except TelegramBadRequest as e:
+                # Сообщение старше 48 часов или уже удалено - оставляем как есть
+                logger.debug(f"Не удалось удалить сообщение {message.message_id}: {e}")
+        return await self.send(message, *args, **kwargs)
+
+    async def show(
+        self,
+        message: MaybeInaccessibleMessage,
+        text: str,
+        reply_markup: Optional[InlineKeyboardMarkup] = None,
+        image: Optional[str] = None,
+        disable_web_page_preview: Optional[bool] = None
+    ) -> Message:
+        """
+        Показ экрана на месте сообщения message
+
+        :param message: Текущее сообщение экрана (обычно callback.message)
+        :param text: Текст (подпись) экрана
+        :param reply_markup: Клавиатура экрана
+        :param image: Путь к изображению экрана (None - текстовый экран)
+        :param disable_web_page_preview: Отключить предпросмотр ссылок (только для текста)
+        :return: Сообщение, в котором теперь показан экран
+        """
+        self.transitions += 1
+        calls_before = self.calls
+        if image and not os.path.exists(image):
+            logger.warning(f"Изображение {image} не найдено, экран показан без него")
+            image = None
+
+        if not isinstance(message, Message):
+            # Сообщение недоступно для правки - только новое сообщение
+            operation = "send"
+            baseline = 1
+            result = await self.send(message, text, reply_markup, image, disable_web_page_preview)
+        else:
+            current_image, current_text, current_markup = self._current(message)
+            text_hash = hash((text, disable_web_page_preview))
+            markup_hash = _markup_hash(reply_markup)
+            same_type = (current_image is None) == (image is None)
+            baseline = 1 if same_type else 2
+
+            if not same_type:
+                operation = "replace"
+            elif image and current_image != image:
+                operation = "edit_media"
+            elif current_text != text_hash:
+                operation = "edit_caption" if image else "edit_text"
+            elif current_markup != markup_hash:
+                operation = "edit_reply_markup"
+            else:
+                operation = "skip"
+
+            try:
+                result = await self._apply(operation, message, text, reply_markup, image, disable_web_page_preview)
+            except TelegramBadRequest as e:
+                if "message is not modified" in str(e):
+                    result = message
+                else:
+                    # Сообщение нельзя править (удалено, слишком старое) или file_id не принят
+                    logger.warning(f"Не удалось выполнить {operation} для экрана: {e}")
+                    if image:
+                        await media_cache.forget(image, e)
+                    operation = "replace"
+                    result = await self._replace(message, text, reply_markup, image, disable_web_page_preview)
+            if operation != "replace":
+                self._remember(message, image, text_hash, markup_hash)
+                if isinstance(result, Message):
+                    if image:
+                        await media_cache.remember(image, result)
+                else:
+                    # Bot API вернул True вместо сообщения
+                    result = message
+
+        self.operations[operation] += 1
+        self.saved += baseline - (self.calls - calls_before)
+        return result
+
+    async def _apply(
+        self,
+        operation: str,
+        message: Message,
+        text: str,
+        reply_markup: Optional[InlineKeyboardMarkup],
+        image: Optional[str],
+        disable_web_page_preview: Optional[bool]
+    ) -> Any:
+        if operation == "skip":
+            return message
+        if operation == "replace":
+            return await self._replace(message, text, reply_markup, image, disable_web_page_preview)
+
+        self.calls += 1
+        if operation == "edit_reply_markup":
+            return await message.edit_reply_markup(reply_markup=reply_markup)
+        if operation == "edit_caption":
+            return await message.edit_caption(caption=text, reply_markup=reply_markup)
+        if operation == "edit_media":
+            return await message.edit_media(
+                media=InputMediaPhoto(media=await media_cache.photo(image), caption=text),
+                reply_markup=reply_markup
+            )
+        return await message.edit_text(
+            text=text, reply_markup=reply_markup, disable_web_page_preview=disable_web_page_preview
+        )
+
+    def memory_data(self) -> "OrderedDict[Tuple[int, int], Tuple[Optional[str], int, int]]":
+        """Запомненные экраны сообщений (для отчета о памяти)"""
+        return self._screens
+
+    def stats(self) -> Dict[str, Any]:
+        """Переходы между экранами, запросы к Bot API и сэкономленные запросы"""
+        return {
+            "transitions": self.transitions,
+            "api_calls": self.calls,
+            "saved_calls": self.saved,
+            "saved_per_transition": self.saved / self.transitions if self.transitions else 0.0,
+            "operations": dict(self.operations)
+        }
+
+
+# Глобальный отрисовщик экранов
+screen = ScreenRenderer()
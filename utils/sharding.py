@@ -0,0 +1,284 @@
+# utils/sharding.py
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import secrets
+import struct
+from typing import Any, Callable, Dict, List, Optional
+
+import aiohttp
+from aiogram import Bot, Dispatcher
+from aiohttp import web
+
+from config import (
+    WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT, MAX_PENDING_UPDATES
+)
+
+logger = logging.getLogger(__name__)
+
+# Приветствие воркера при подключении: номер воркера
+_FRAME = struct.Struct(">I")
+# Заголовок кадра обновления: длина обновления в байтах и флаги
+_UPDATE = struct.Struct(">IB")
+# Флаг кадра: обновление из очереди перезапуска (обрабатывается с backlog=True)
+BACKLOG_FLAG = 1
+
+
+def shard_key(update: Dict[str, Any]) -> int:
+    """
+    Ключ распределения обновления: id пользователя (в личных чатах совпадает с id чата)
+
+    :param update: Обновление Telegram (JSON)
+    :return: id пользователя или чата, 0 - если в обновлении их нет
+    """
+    for field, event in update.items():
+        if field == "update_id" or not isinstance(event, dict):
+            continue
+        user = event.get("from") or event.get("user")
+        if user:
+            return user["id"]
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+    return 0
+
+
+def shard_of(update: Dict[str, Any], workers: int) -> int:
+    """Номер воркера, который обрабатывает обновление"""
+    return shard_key(update) % workers
+
+
+class ShardRouter:
+    """
+    Пересылка обновлений из принимающего процесса воркерам
+
+    Воркеры подключаются к локальному TCP-порту и получают обновления своей доли
+    пользователей кадрами «длина + флаги + JSON». Все обновления пользователя идут
+    в одно соединение по порядку, поэтому порядок внутри чата сохраняется. Флаг
+    BACKLOG_FLAG отмечает обновления очереди перезапуска: воркер обрабатывает их
+    в отдельном лимите, как и один процесс.
+    """
+
+    def __init__(self, workers: int):
+        """
+        :param workers: Количество воркеров
+        """
+        self.workers = workers
+        self._writers: Dict[int, asyncio.StreamWriter] = {}
+        self._connected: Optional[asyncio.Event] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+        self.forwarded = [0] * workers
+        self.lost = 0
+
+    async def start(self) -> int:
+        """
+        Запуск приема подключений воркеров
+
+        :return: Порт, к которому должны подключиться воркеры
+        """
+        self._connected = asyncio.Event()
+        self._server = await asyncio.start_server(self._accept, "127.0.0.1", 0)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def _accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        (index,) = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+        self._writers[index] = writer
+        logger.info(f"Воркер {index} подключен")
+        if len(self._writers) == self.workers:
+            self._connected.set()
+
+        # Воркер ничего не пишет: EOF означает, что процесс завершился
+        await reader.read()
+        if self._writers.get(index) is writer:
+            del self._writers[index]
+            logger.error(f"Воркер {index} отключился, его обновления не будут обработаны")
+
+    async def wait_workers(self, timeout: float = 60):
+        """Ожидание подключения всех воркеров"""
+        await asyncio.wait_for(self._connected.wait(), timeout)
+
+    async def forward(self, update: Dict[str, Any], payload: Optional[bytes] = None, backlog: bool = False):
+        """
+        Отправка обновления воркеру его пользователя
+
+        :param update: Обновление Telegram
+        :param payload: Обновление в JSON, если уже есть (не сериализуется повторно)
+        :param backlog: Обновление из очереди перезапуска
+        """
+        index = shard_of(update, self.workers)
+        writer = self._writers.get(index)
+        if writer is None:
+            self.lost += 1
+            logger.warning(f"Обновление {update.get('update_id')} потеряно: воркер {index} недоступен")
+            return
+        if payload is None:
+            payload = json.dumps(update, ensure_ascii=False).encode()
+        writer.write(_UPDATE.pack(len(payload), BACKLOG_FLAG if backlog else 0) + payload)
+        self.forwarded[index] += 1
+        # Воркер не успевает - ждем, пока освободится буфер соединения
+        await writer.drain()
+
+    async def close(self):
+        """Закрытие соединений: воркеры дообрабатывают полученное и завершаются"""
+        for writer in list(self._writers.values()):
+            writer.close()
+        self._writers.clear()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def stats(self) -> Dict[str, Any]:
+        """Переслано обновлений каждому воркеру и потеряно из-за отключившихся воркеров"""
+        return {"forwarded": list(self.forwarded), "lost": self.lost, "connected": len(self._writers)}
+
+
+def start_workers(target: Callable, workers: int, port: int, *args) -> List[multiprocessing.Process]:
+    """
+    Запуск процессов-воркеров
+
+    :param target: Функция воркера target(index, port, *args) (должна импортироваться из модуля)
+    :param workers: Количество воркеров
+    :param port: Порт ShardRouter
+    """
+    # spawn одинаково работает на Linux и Windows и не копирует состояние цикла событий
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for index in range(workers):
+        process = context.Process(target=target, args=(index, port, *args), name=f"bot-worker-{index}", daemon=True)
+        process.start()
+        processes.append(process)
+    return processes
+
+
+async def run_worker(dp: Dispatcher, bot: Bot, index: int, port: int, concurrency: int = MAX_PENDING_UPDATES):
+    """
+    Обработка обновлений, пересланных принимающим процессом
+
+    :param dp: Диспетчер
+    :param bot: Бот
+    :param index: Номер воркера
+    :param port: Порт ShardRouter
+    :param concurrency: Максимум обновлений в обработке (включая ожидающие очереди своего чата)
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(_FRAME.pack(index))
+    await writer.drain()
+    logger.info(f"Воркер {index} запущен")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = set()
+
+    async def feed(update: Dict[str, Any], backlog: bool):
+        try:
+            await dp.feed_raw_update(bot, update, backlog=backlog)
+        except Exception as e:
+            logger.error(f"Ошибка обработки обновления {update.get('update_id')}: {e}")
+        finally:
+            semaphore.release()
+
+    try:
+        while True:
+            try:
+                length, flags = _UPDATE.unpack(await reader.readexactly(_UPDATE.size))
+                payload = await reader.readexactly(length)
+            except asyncio.IncompleteReadError:
+                break
+            # Задачи создаются в порядке получения - очередь чата сохраняет этот порядок
+            await semaphore.acquire()
+            task = asyncio.create_task(feed(json.loads(payload), bool(flags & BACKLOG_FLAG)))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    finally:
+        writer.close()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    logger.info(f"Воркер {index} остановлен")
+
+
+async def run_front_polling(bot: Bot, router: ShardRouter, timeout: int = 30, drop_pending_updates: bool = True):
+    """
+    Прием обновлений одним long polling и пересылка воркерам
+
+    Ответ getUpdates не разбирается в объекты aiogram: принимающему процессу
+    достаточно id пользователя, остальное делают воркеры.
+
+    :param bot: Бот
+    :param router: Пересылка воркерам
+    :param timeout: Таймаут long polling (секунды)
+    :param drop_pending_updates: Отбросить обновления, накопившиеся до запуска
+    """
+    await bot.delete_webhook(drop_pending_updates=drop_pending_updates)
+    url = bot.session.api.api_url(token=bot.token, method="getUpdates")
+    offset = 0
+
+    logger.info(f"Бот запущен: polling, воркеров {router.workers}")
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout + 10)) as http:
+        while True:
+            try:
+                async with http.post(url, data={"offset": str(offset), "timeout": str(timeout)}) as response:
+                    data = await response.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                logger.warning(f"Ошибка getUpdates: {e}")
+                await asyncio.sleep(1)
+                continue
+            if not data.get("ok"):
+                logger.warning(f"Ошибка getUpdates: {data.get('description')}")
+                await asyncio.sleep(data.get("parameters", {}).get("retry_after", 1))
+                continue
+
+            for update in data["result"]:
+                offset = update["update_id"] + 1
+                await router.forward(update)
+
+
+async def run_front_webhook(bot: Bot, router: ShardRouter, base_url: str = WEBHOOK_BASE_URL,
+                            path: str = WEBHOOK_PATH, host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT,
+                            secret_token: str = WEBHOOK_SECRET, stop: Optional[asyncio.Event] = None,
+                            drop_pending_updates: bool = True):
+    """
+    Прием обновлений через вебхук и пересылка воркерам
+
+    Тело запроса пересылается как есть, без повторной сериализации.
+
+    :param bot: Бот
+    :param router: Пересылка воркерам
+    :param base_url: Публичный адрес, на который Telegram отправляет обновления
+    :param path: Путь вебхука
+    :param host: Адрес HTTP-сервера
+    :param port: Порт HTTP-сервера
+    :param secret_token: Секрет вебхука (пустая строка - случайный на время запуска)
+    :param stop: Событие остановки (по умолчанию работает до отмены задачи)
+    :param drop_pending_updates: Отбросить обновления, накопившиеся до установки вебхука
+    """
+    if not base_url:
+        raise ValueError("Для режима webhook нужно указать WEBHOOK_BASE_URL")
+
+    secret_token = secret_token or secrets.token_urlsafe(32)
+
+    async def receive(request: web.Request) -> web.Response:
+        if not secrets.compare_digest(request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), secret_token):
+            return web.Response(status=401)
+        payload = await request.read()
+        await router.forward(json.loads(payload), payload)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(path, receive)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+        await bot.set_webhook(
+            url=base_url.rstrip("/") + path,
+            secret_token=secret_token,
+            drop_pending_updates=drop_pending_updates,
+            max_connections=100
+        )
+        logger.info(f"Бот запущен в режиме webhook на {host}:{port}{path}, воркеров {router.workers}")
+        await (stop or asyncio.Event()).wait()
+    finally:
+        await runner.cleanup()
\ No newline at end of file
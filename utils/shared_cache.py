@@ -0,0 +1,169 @@
+# utils/shared_cache.py
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Any
+
+from config import REDIS_URL, BOT_WORKERS, SHARED_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+
+class LocalCache:
+    """Кэш с ограниченным временем жизни в памяти процесса (бот запущен в одном процессе)"""
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        Получение нескольких значений
+
+        :param keys: Ключи
+        :return: Значения в порядке ключей (None для отсутствующих и устаревших)
+        """
+        now = time.monotonic()
+        values = []
+        for key in keys:
+            item = self._data.get(key)
+            if item is None or item[0] <= now:
+                self._data.pop(key, None)
+                values.append(None)
+            else:
+                values.append(item[1])
+        return values
+
+    async def set_many(self, mapping: Dict[str, Any], ttl: float):
+        """
+        Сохранение нескольких значений
+
+        :param mapping: Ключи и значения
+        :param ttl: Время жизни (секунды)
+        """
+        expires_at = time.monotonic() + ttl
+        for key, value in mapping.items():
+            self._data[key] = (expires_at, value)
+
+    async def get(self, key: str) -> Optional[Any]:
+        return (await self.get_many([key]))[0]
+
+    async def set(self, key: str, value: Any, ttl: float):
+        await self.set_many({key: value}, ttl)
+
+    def memory_data(self) -> Dict[str, tuple]:
+        """Значения, которые кэш держит в памяти процесса (для отчета о памяти)"""
+        return self._data
+
+
+class RedisCache(LocalCache):
+    """
+    Общий кэш нескольких процессов бота в Redis
+
+    Значения хранятся в JSON. Чтение нескольких ключей - один MGET,
+    запись - один конвейер (pipeline) из SET с временем жизни.
+    """
+
+    def __init__(self, redis, prefix: str = "wws:cache:"):
+        """
+        :param redis: Клиент redis.asyncio.Redis (decode_responses=True)
+        :param prefix: Префикс ключей
+        """
+        super().__init__()
+        self.redis = redis
+        self.prefix = prefix
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        if not keys:
+            return []
+        values = await self.redis.mget([self.prefix + key for key in keys])
+        return [json.loads(value) if value is not None else None for value in values]
+
+    async def set_many(self, mapping: Dict[str, Any], ttl: float):
+        pipe = self.redis.pipeline(transaction=False)
+        for key, value in mapping.items():
+            pipe.set(self.prefix + key, json.dumps(value, ensure_ascii=False), px=int(ttl * 1000))
+        await pipe.execute()
+
+
+class FileCache(LocalCache):
+    """
+    Общий кэш процессов бота на одной машине без Redis
+
+    Каждый ключ - отдельный JSON-файл, запись атомарная (через временный файл).
+    Разобранное значение хранится в памяти процесса, пока файл не изменится,
+    поэтому чтение общего каталога пакетов стоит одного stat. Работа с файлами
+    выполняется в отдельном потоке, чтобы не блокировать цикл событий.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: Каталог файлов кэша
+        """
+        super().__init__()
+        self.path = path
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, hashlib.sha1(key.encode()).hexdigest() + ".json")
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        if not keys:
+            return []
+        return await asyncio.to_thread(self._read_many, keys)
+
+    async def set_many(self, mapping: Dict[str, Any], ttl: float):
+        await asyncio.to_thread(self._write_many, mapping, ttl)
+
+    def _read_many(self, keys: List[str]) -> List[Optional[Any]]:
+        now = time.time()
+        values = []
+        for key in keys:
+            file = self._file(key)
+            try:
+                mtime = os.stat(file).st_mtime_ns
+                item = self._data.get(key)
+                if item is None or item[0] != mtime:
+                    with open(file, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                    item = self._data[key] = (mtime, data["expires_at"], data["value"])
+            except (OSError, ValueError, KeyError):
+                values.append(None)
+                continue
+            values.append(item[2] if item[1] > now else None)
+        return values
+
+    def _write_many(self, mapping: Dict[str, Any], ttl: float):
+        os.makedirs(self.path, exist_ok=True)
+        expires_at = time.time() + ttl
+        for key, value in mapping.items():
+            file = self._file(key)
+            tmp_file = f"{file}.{os.getpid()}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump({"key": key, "expires_at": expires_at, "value": value}, f, ensure_ascii=False)
+            os.replace(tmp_file, file)
+
+
+def create_redis(url: str):
+    """
+    Клиент Redis (или совместимого сервера) для общего состояния процессов бота
+
+    :param url: Адрес вида redis://host:6379/0
+    """
+    from redis.asyncio import Redis
+
+    return Redis.from_url(url, decode_responses=True)
+
+
+# Глобальный клиент Redis (None - бот работает в одном процессе без Redis)
+redis_client = create_redis(REDIS_URL) if REDIS_URL else None
+
+# Глобальный общий кэш: Redis, файлы (несколько воркеров на одной машине) или память процесса
+if redis_client is not None:
+    shared_cache = RedisCache(redis_client)
+elif BOT_WORKERS > 1:
+    shared_cache = FileCache(SHARED_CACHE_DIR)
+else:
+    shared_cache = LocalCache()
\ No newline at end of file
@@ -0,0 +1,285 @@
+# utils/tracing.py
+# Трассировка обновлений: спаны пишутся пачками в JSON Lines (поля как в OTLP)
+# Разбор самых медленных обновлений из корня проекта:
+#   python -m utils.tracing --slowest 5 --handler confirm_purchase
+#   python -m utils.tracing --trace <traceId>
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from config import (
+    TRACE_PATH, TRACE_SAMPLE_RATE, TRACE_FLUSH_INTERVAL, TRACE_BUFFER_LIMIT, TRACE_MAX_BYTES, TRACE_BACKUP_COUNT
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """Выполняемый участок трассировки"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start", "attributes", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, parent_id: Optional[str], name: str, kind: str,
+                 attributes: Dict[str, Any], sampled: bool = True):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start = time.time_ns()
+        self.attributes = attributes
+        self.sampled = sampled
+
+    def set(self, **attributes: Any):
+        """Добавление атрибутов спана"""
+        self.attributes.update(attributes)
+
+
+# Текущий спан задачи (копируется в задачи и asyncio.to_thread вместе с контекстом)
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+# Корень обновления, не попавшего в выборку: вложенные спаны тоже не пишутся
+UNSAMPLED = Span("", "", None, "", "internal", {}, sampled=False)
+
+
+class Tracer:
+    """
+    Спаны обработки обновлений
+
+    Корневой спан открывается на обновление (traceId - на все обновление),
+    вложенные - на обработчик и внешние запросы (eSIM Access, курсы валют,
+    Bot API). Родитель берется из contextvars, поэтому спаны запросов из
+    asyncio.to_thread и задач, запущенных обработчиком, попадают в ту же
+    трассировку. Завершенные спаны копятся в буфере и записываются фоновой
+    задачей раз в flush_interval; при переполнении буфера новые спаны
+    отбрасываются. Пустой path или нулевой sample_rate выключает трассировку.
+
+    Файл не растет без предела: когда очередная пачка не помещается в
+    max_bytes, файл переименовывается в path.old1 (старые сдвигаются до
+    path.old<backup_count>, самый старый удаляется) и запись начинается заново.
+    """
+
+    def __init__(self, path: str = TRACE_PATH, sample_rate: float = TRACE_SAMPLE_RATE,
+                 flush_interval: float = TRACE_FLUSH_INTERVAL, buffer_limit: int = TRACE_BUFFER_LIMIT,
+                 max_bytes: int = TRACE_MAX_BYTES, backup_count: int = TRACE_BACKUP_COUNT):
+        """
+        :param path: Файл спанов (JSON Lines), дописывается
+        :param sample_rate: Доля трассируемых обновлений (0..1)
+        :param flush_interval: Период записи буфера (секунды)
+        :param buffer_limit: Максимум спанов в буфере
+        :param max_bytes: Размер файла, после которого он переименовывается (байты, 0 - без предела)
+        :param backup_count: Сколько переименованных файлов хранить
+        """
+        self.path = path
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self.buffer_limit = buffer_limit
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+        self.finished = 0
+        self.dropped = 0
+        self.written = 0
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", **attributes: Any) -> Iterator[Optional[Span]]:
+        """
+        Спан на время блока with (None - трассировка выключена или обновление не в выборке)
+
+        :param name: Имя спана
+        :param kind: server - обновление, client - внешний запрос, internal - остальное
+        :param attributes: Атрибуты спана
+        """
+        parent = current_span.get()
+        if not self.path or not self.sample_rate or (parent is not None and not parent.sampled):
+            yield None
+            return
+        if parent is None:
+            if random.random() >= self.sample_rate:
+                token = current_span.set(UNSAMPLED)
+                try:
+                    yield None
+                finally:
+                    current_span.reset(token)
+                return
+            span = Span(f"{random.getrandbits(128):032x}", f"{random.getrandbits(64):016x}", None, name, kind,
+                        attributes)
+        else:
+            span = Span(parent.trace_id, f"{random.getrandbits(64):016x}", parent.span_id, name, kind, attributes)
+
+        token = current_span.set(span)
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"[:200]
+            raise
+        finally:
+            current_span.reset(token)
+            self._finish(span, error)
+
+    def _finish(self, span: Span, error: Optional[str]):
+        record = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "parentSpanId": span.parent_id,
+            "name": span.name,
+            "kind": span.kind,
+            "startTimeUnixNano": span.start,
+            "endTimeUnixNano": time.time_ns(),
+            "attributes": span.attributes,
+            "status": {"code": "ERROR", "message": error} if error else {"code": "OK"}
+        }
+        with self._lock:
+            if len(self._buffer) >= self.buffer_limit:
+                self.dropped += 1
+                return
+            self._buffer.append(record)
+            self.finished += 1
+
+    # ---------- Запись ----------
+
+    def start(self):
+        """Запуск фоновой записи спанов"""
+        if self.path and self.sample_rate and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        """Остановка фоновой записи и запись оставшихся спанов"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        """Запись накопленных спанов одной пачкой"""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        try:
+            await asyncio.to_thread(self._write, batch)
+            self.written += len(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            logger.error(f"Ошибка записи спанов трассировки: {e}")
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        data = "".join(json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str) + "\n"
+                       for record in batch)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.max_bytes:
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                size = 0
+            if size and size + len(data.encode("utf-8")) > self.max_bytes:
+                self._rotate()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(data)
+
+    def _rotate(self):
+        for index in range(self.backup_count, 0, -1):
+            source = f"{self.path}.old{index - 1}" if index > 1 else self.path
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.old{index}")
+        if not self.backup_count:
+            os.remove(self.path)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Завершенные, записанные и отброшенные спаны"""
+        return {"finished": self.finished, "written": self.written, "dropped": self.dropped,
+                "buffered": len(self._buffer)}
+
+
+# Глобальный трассировщик
+tracer = Tracer()
+
+
+# ---------- Разбор файла спанов ----------
+
+def load_traces(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Спаны из файла и его переименованных копий (path.old1, ...), сгруппированные по traceId"""
+    traces: Dict[str, List[Dict[str, Any]]] = {}
+    paths = [path]
+    while os.path.exists(f"{path}.old{len(paths)}"):
+        paths.append(f"{path}.old{len(paths)}")
+    for name in reversed(paths):
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    traces.setdefault(record["traceId"], []).append(record)
+    return traces
+
+
+def format_trace(spans: List[Dict[str, Any]]) -> str:
+    """Дерево спанов одной трассировки: смещение от начала, длительность, имя, атрибуты"""
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    ids = {span["spanId"] for span in spans}
+    for span in spans:
+        parent = span["parentSpanId"] if span["parentSpanId"] in ids else None
+        children.setdefault(parent, []).append(span)
+    for group in children.values():
+        group.sort(key=lambda s: s["startTimeUnixNano"])
+    origin = min(span["startTimeUnixNano"] for span in spans)
+
+    lines = [f"trace {spans[0]['traceId']}", f"{'начало, мс':>11}{'длит., мс':>11}  спан"]
+
+    def walk(parent: Optional[str], depth: int):
+        for span in children.get(parent, []):
+            offset = (span["startTimeUnixNano"] - origin) / 1e6
+            duration = (span["endTimeUnixNano"] - span["startTimeUnixNano"]) / 1e6
+            attributes = " ".join(f"{k}={v}" for k, v in span["attributes"].items())
+            status = " ОШИБКА " + (span["status"].get("message") or "") if span["status"]["code"] == "ERROR" else ""
+            lines.append(f"{offset:>11.1f}{duration:>11.1f}  {'  ' * depth}{span['name']} {attributes}{status}")
+            walk(span["spanId"], depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+def _duration(spans: List[Dict[str, Any]]) -> int:
+    return max(s["endTimeUnixNano"] for s in spans) - min(s["startTimeUnixNano"] for s in spans)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Самые медленные обновления по файлу спанов")
+    parser.add_argument("--path", default=TRACE_PATH, help="Файл спанов")
+    parser.add_argument("--slowest", type=int, default=5, help="Сколько самых медленных трассировок показать")
+    parser.add_argument("--handler", help="Только трассировки с этим обработчиком")
+    parser.add_argument("--trace", help="Показать одну трассировку по traceId")
+    args = parser.parse_args()
+
+    all_traces = load_traces(args.path)
+    if args.trace:
+        selected = [all_traces[args.trace]]
+    else:
+        selected = [spans for spans in all_traces.values()
+                    if not args.handler or any(s["attributes"].get("handler") == args.handler for s in spans)]
+        selected.sort(key=_duration, reverse=True)
+        selected = selected[:args.slowest]
+        print(f"Трассировок: {len(all_traces)}, подходящих показано: {len(selected)}\n")
+    print("\n\n".join(format_trace(spans) for spans in selected))
\ No newline at end of file
@@ -0,0 +1,97 @@
+# utils/webhook.py
+
+import asyncio
+import logging
+import secrets
+from typing import Dict, Optional, Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from config import (
+    WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT, MAX_PENDING_UPDATES
+)
+
+logger = logging.getLogger(__name__)
+
+
+class LimitedRequestHandler(SimpleRequestHandler):
+    """
+    Прием обновлений от Telegram через вебхук
+
+    Запрос с неверным секретом отклоняется (401), на остальные отвечаем 200,
+    а обновление обрабатывается в фоне. Фоновых задач одновременно не больше
+    concurrency: когда мест нет, ответ на запрос задерживается до освобождения
+    места, и Telegram не присылает новые обновления сверх max_connections.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token: str, concurrency: int, **data: Any):
+        """
+        :param secret_token: Секрет из заголовка X-Telegram-Bot-Api-Secret-Token
+        :param concurrency: Максимум обновлений в обработке (включая ожидающие очереди своего чата)
+        """
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        # Место занимается до создания задачи, поэтому задачи создаются в порядке
+        # получения и их число не превышает concurrency
+        await self._semaphore.acquire()
+        try:
+            return await super()._handle_request_background(bot, request)
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    async def _background_feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        try:
+            await super()._background_feed_update(bot, update)
+        except Exception as e:
+            logger.error(f"Ошибка обработки обновления {update.get('update_id')}: {e}")
+        finally:
+            self._semaphore.release()
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, base_url: str = WEBHOOK_BASE_URL, path: str = WEBHOOK_PATH,
+                      host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT, secret_token: str = WEBHOOK_SECRET,
+                      concurrency: int = MAX_PENDING_UPDATES, stop: Optional[asyncio.Event] = None,
+                      drop_pending_updates: bool = True):
+    """
+    Запуск бота в режиме вебхука на aiohttp
+
+    :param dp: Диспетчер
+    :param bot: Бот
+    :param base_url: Публичный адрес, на который Telegram отправляет обновления
+    :param path: Путь вебхука
+    :param host: Адрес HTTP-сервера
+    :param port: Порт HTTP-сервера
+    :param secret_token: Секрет вебхука (пустая строка - случайный на время запуска)
+    :param concurrency: Максимум обновлений в обработке (включая ожидающие очереди своего чата)
+    :param stop: Событие остановки (по умолчанию работает до отмены задачи)
+    :param drop_pending_updates: Отбросить обновления, накопившиеся до установки вебхука
+    """
+    if not base_url:
+        raise ValueError("Для режима webhook нужно указать WEBHOOK_BASE_URL")
+
+    # Новый секрет при каждом запуске: вебхук все равно устанавливается заново
+    secret_token = secret_token or secrets.token_urlsafe(32)
+
+    app = web.Application()
+    LimitedRequestHandler(dp, bot, secret_token=secret_token, concurrency=concurrency).register(app, path=path)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+        await bot.set_webhook(
+            url=base_url.rstrip("/") + path,
+            secret_token=secret_token,
+            drop_pending_updates=drop_pending_updates,
+            max_connections=min(100, concurrency)
+        )
+        logger.info(f"Бот запущен в режиме webhook на {host}:{port}{path}")
+        await (stop or asyncio.Event()).wait()
+    finally:
+        await runner.cleanup()
\ No newline at end of file